@@ -0,0 +1,15 @@
+-- Tablas de usuarios e hipotecas, tal como las creaban los controladores
+CREATE TABLE IF NOT EXISTS usuarios (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    age INT NOT NULL,
+    UNIQUE (name, age)
+);
+
+CREATE TABLE IF NOT EXISTS hipotecas (
+    id SERIAL PRIMARY KEY,
+    usuario_id INT REFERENCES usuarios(id) ON DELETE CASCADE,
+    monto_total FLOAT NOT NULL,
+    fecha_inicio DATE NOT NULL,
+    cuota_mensual FLOAT NOT NULL
+);
@@ -0,0 +1,10 @@
+-- Las bases creadas con los scripts anteriores guardaban la cuota como INTEGER
+ALTER TABLE hipotecas ALTER COLUMN cuota_mensual TYPE FLOAT;
+
+-- Los scripts anteriores también declaraban UNIQUE (usuario_id, monto_total, fecha_inicio), que las tablas creadas
+-- por los controladores nunca tuvieron: un usuario puede guardar dos cotizaciones iguales el mismo día (opción 5 de
+-- la consola). Se quita para que todas las bases queden con el mismo esquema.
+ALTER TABLE hipotecas DROP CONSTRAINT IF EXISTS hipotecas_usuario_id_monto_total_fecha_inicio_key;
+
+-- obtener_hipotecas y las demás consultas por usuario filtran por usuario_id
+CREATE INDEX IF NOT EXISTS hipotecas_usuario_id_idx ON hipotecas (usuario_id);
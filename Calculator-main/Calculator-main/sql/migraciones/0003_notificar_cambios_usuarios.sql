@@ -0,0 +1,12 @@
+-- Avisa por el canal usuarios_cambios cada sentencia que modifica la tabla usuarios, para que los procesos que
+-- guardan usuarios en caché (controller/cache_usuarios.py) la invaliden
+CREATE OR REPLACE FUNCTION notificar_cambio_usuarios() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('usuarios_cambios', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER usuarios_cambios
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON usuarios
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio_usuarios();
@@ -0,0 +1,76 @@
+-- Edad del usuario con la que se creó cada hipoteca; la completa un disparador, así la franja de edad de la hipoteca
+-- no depende de que el usuario siga existiendo
+ALTER TABLE hipotecas ADD COLUMN edad INT;
+UPDATE hipotecas h SET edad = u.age FROM usuarios u WHERE u.id = h.usuario_id;
+
+CREATE OR REPLACE FUNCTION completar_edad_hipoteca() RETURNS trigger AS $$
+BEGIN
+    IF NEW.edad IS NULL THEN
+        SELECT age INTO NEW.edad FROM usuarios WHERE id = NEW.usuario_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER hipotecas_edad
+    BEFORE INSERT ON hipotecas
+    FOR EACH ROW EXECUTE FUNCTION completar_edad_hipoteca();
+
+-- Franjas de edad de 10 años: 60 agrupa las edades de 60 a 69
+CREATE OR REPLACE FUNCTION rango_edad(edad INT) RETURNS INT AS $$
+    SELECT edad / 10 * 10
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Totales de la cartera por mes de inicio y franja de edad, mantenidos por los disparadores de abajo
+CREATE TABLE resumen_hipotecas (
+    mes DATE NOT NULL,
+    rango_edad INT NOT NULL,
+    cantidad BIGINT NOT NULL,
+    cuota_total FLOAT NOT NULL,
+    monto_total FLOAT NOT NULL,
+    PRIMARY KEY (mes, rango_edad)
+);
+
+INSERT INTO resumen_hipotecas (mes, rango_edad, cantidad, cuota_total, monto_total)
+SELECT date_trunc('month', fecha_inicio)::date, COALESCE(rango_edad(edad), -1), count(*), sum(cuota_mensual),
+       sum(monto_total)
+FROM hipotecas
+GROUP BY 1, 2;
+
+-- Suma las filas nuevas y resta las anteriores de cada sentencia, agrupadas, con un solo upsert por grupo. Las
+-- tablas de transición de cada operación son distintas, por eso la consulta se arma según TG_OP
+CREATE OR REPLACE FUNCTION actualizar_resumen_hipotecas() RETURNS trigger AS $$
+DECLARE
+    cambios TEXT;
+BEGIN
+    cambios := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT 1 AS signo, * FROM nuevas'
+        WHEN 'DELETE' THEN 'SELECT -1 AS signo, * FROM anteriores'
+        ELSE 'SELECT 1 AS signo, * FROM nuevas UNION ALL SELECT -1, * FROM anteriores'
+    END;
+    EXECUTE format($consulta$
+        INSERT INTO resumen_hipotecas AS r (mes, rango_edad, cantidad, cuota_total, monto_total)
+        SELECT date_trunc('month', fecha_inicio)::date, COALESCE(rango_edad(edad), -1), sum(signo),
+               sum(signo * cuota_mensual), sum(signo * monto_total)
+        FROM (%s) cambios
+        GROUP BY 1, 2
+        ON CONFLICT (mes, rango_edad) DO UPDATE
+            SET cantidad = r.cantidad + EXCLUDED.cantidad,
+                cuota_total = r.cuota_total + EXCLUDED.cuota_total,
+                monto_total = r.monto_total + EXCLUDED.monto_total
+    $consulta$, cambios);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER resumen_hipotecas_insertar
+    AFTER INSERT ON hipotecas REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_hipotecas();
+
+CREATE TRIGGER resumen_hipotecas_modificar
+    AFTER UPDATE ON hipotecas REFERENCING OLD TABLE AS anteriores NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_hipotecas();
+
+CREATE TRIGGER resumen_hipotecas_eliminar
+    AFTER DELETE ON hipotecas REFERENCING OLD TABLE AS anteriores
+    FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_hipotecas();
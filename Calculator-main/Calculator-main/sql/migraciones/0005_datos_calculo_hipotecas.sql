@@ -0,0 +1,10 @@
+-- Datos de entrada de Calculator con los que se calculó la cuota de cada hipoteca (la edad ya está en la columna
+-- edad), para recalcular solo las hipotecas de un usuario cuando se corrige su edad. Las hipotecas creadas antes de
+-- esta migración no los tienen y no se recalculan. sexo solo se guarda si la esperanza de vida se tomó de la tabla
+-- de vida; en ese caso se vuelve a derivar con la nueva edad.
+ALTER TABLE hipotecas
+    ADD COLUMN esperanza_vida FLOAT,
+    ADD COLUMN sexo CHAR(1),
+    ADD COLUMN periodo_pago INT,
+    ADD COLUMN porcentaje_propiedad FLOAT,
+    ADD COLUMN tipo_hipoteca INT;
@@ -0,0 +1,87 @@
+-- Particiona hipotecas por año de fecha_inicio, así las consultas por fecha solo recorren las particiones de esos
+-- años y los años cerrados se pueden archivar desprendiendo su partición (controller/particiones.py). La clave
+-- primaria debe incluir fecha_inicio, la columna de partición.
+ALTER TABLE hipotecas RENAME TO hipotecas_sin_particionar;
+ALTER INDEX IF EXISTS hipotecas_pkey RENAME TO hipotecas_sin_particionar_pkey;
+ALTER INDEX IF EXISTS hipotecas_usuario_id_idx RENAME TO hipotecas_sin_particionar_usuario_id_idx;
+
+CREATE TABLE hipotecas (
+    id INT NOT NULL DEFAULT nextval('hipotecas_id_seq'),
+    usuario_id INT REFERENCES usuarios(id) ON DELETE CASCADE,
+    monto_total FLOAT NOT NULL,
+    fecha_inicio DATE NOT NULL,
+    cuota_mensual FLOAT NOT NULL,
+    edad INT,
+    esperanza_vida FLOAT,
+    sexo CHAR(1),
+    periodo_pago INT,
+    porcentaje_propiedad FLOAT,
+    tipo_hipoteca INT,
+    PRIMARY KEY (id, fecha_inicio)
+) PARTITION BY RANGE (fecha_inicio);
+ALTER SEQUENCE hipotecas_id_seq OWNED BY hipotecas.id;
+
+CREATE INDEX hipotecas_usuario_id_idx ON hipotecas (usuario_id);
+
+-- Recibe las hipotecas de los años que todavía no tienen partición, así ninguna inserción falla;
+-- crear_particion_hipotecas las mueve a su partición cuando se crea
+CREATE TABLE hipotecas_default PARTITION OF hipotecas DEFAULT;
+
+-- Crea la partición hipotecas_AAAA del año, moviendo antes las filas de ese año que estén en hipotecas_default. Las
+-- filas se mueven con sentencias sobre las particiones y no sobre hipotecas, por eso no pasan por los disparadores
+-- del resumen. Devuelve false si la partición ya existía.
+CREATE OR REPLACE FUNCTION crear_particion_hipotecas(anio INT) RETURNS BOOLEAN AS $$
+DECLARE
+    particion TEXT := format('hipotecas_%s', anio);
+    desde DATE := make_date(anio, 1, 1);
+    hasta DATE := make_date(anio + 1, 1, 1);
+BEGIN
+    -- Serializa las creaciones simultáneas de la misma partición
+    PERFORM pg_advisory_xact_lock(4872302, anio);
+    IF to_regclass(particion) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE hipotecas INCLUDING DEFAULTS)', particion);
+    EXECUTE format($mover$
+        WITH movidas AS (
+            DELETE FROM hipotecas_default WHERE fecha_inicio >= %L AND fecha_inicio < %L RETURNING *
+        )
+        INSERT INTO %I SELECT * FROM movidas
+    $mover$, desde, hasta, particion);
+    EXECUTE format('ALTER TABLE hipotecas ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', particion, desde, hasta);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Una partición por cada año con hipotecas, más el año actual y el siguiente
+SELECT crear_particion_hipotecas(anio)
+FROM (SELECT DISTINCT extract(year FROM fecha_inicio)::int AS anio FROM hipotecas_sin_particionar
+      UNION SELECT extract(year FROM current_date)::int
+      UNION SELECT extract(year FROM current_date)::int + 1) anios
+ORDER BY anio;
+
+-- Las filas se copian antes de crear los disparadores: la edad ya está completa y el resumen ya las cuenta
+INSERT INTO hipotecas (id, usuario_id, monto_total, fecha_inicio, cuota_mensual, edad, esperanza_vida, sexo,
+                       periodo_pago, porcentaje_propiedad, tipo_hipoteca)
+SELECT id, usuario_id, monto_total, fecha_inicio, cuota_mensual, edad, esperanza_vida, sexo, periodo_pago,
+       porcentaje_propiedad, tipo_hipoteca
+FROM hipotecas_sin_particionar;
+
+DROP TABLE hipotecas_sin_particionar;
+
+-- Los mismos disparadores de 0004, ahora sobre la tabla particionada
+CREATE TRIGGER hipotecas_edad
+    BEFORE INSERT ON hipotecas
+    FOR EACH ROW EXECUTE FUNCTION completar_edad_hipoteca();
+
+CREATE TRIGGER resumen_hipotecas_insertar
+    AFTER INSERT ON hipotecas REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_hipotecas();
+
+CREATE TRIGGER resumen_hipotecas_modificar
+    AFTER UPDATE ON hipotecas REFERENCING OLD TABLE AS anteriores NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_hipotecas();
+
+CREATE TRIGGER resumen_hipotecas_eliminar
+    AFTER DELETE ON hipotecas REFERENCING OLD TABLE AS anteriores
+    FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_hipotecas();
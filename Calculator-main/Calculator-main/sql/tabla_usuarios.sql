@@ -1,7 +0,0 @@
--- Crear tabla de usuarios
-CREATE TABLE usuarios (
-    id SERIAL PRIMARY KEY,
-    name TEXT NOT NULL,
-    age INTEGER NOT NULL,
-    UNIQUE (name, age)
-);
\ No newline at end of file
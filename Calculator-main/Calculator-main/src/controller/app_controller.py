@@ -1,33 +1,152 @@
-import psycopg2
+import base64
+import binascii
+import functools
+import numbers
 import sys
+import threading
 sys.path.append("src")
 sys.path.append( "." )
-from psycopg2 import sql
-from psycopg2.extras import RealDictCursor
+import numpy as np
 from model.user import Usuario
-import secret_config
+from model.calculator import Calculator, ErrorCode, ValidationResult, VALIDATION_RESULTS
+from model.life_table import default_life_table
+from controller.repositorio import (Repositorio, ErrorRepositorio, UsuarioDuplicado, AGRUPACIONES_RESUMEN,
+                                    COLUMNAS_HIPOTECAS, DATOS_CALCULO, obtener_repositorio)
+from controller.exportacion import codificar, validar_formato
 
-class ControladorUsuarios:
-    def __init__(self):
-        self.conexion = psycopg2.connect(database=secret_config.PGDATABASE, user=secret_config.PGUSER,
-                                         password=secret_config.PGPASSWORD, host=secret_config.PGHOST)
-        self._crear_tabla_usuarios()
+TAMANO_LOTE = 1000
+TAMANO_PAGINA = 50
+CONFLICTOS = ("omitir", "actualizar")
 
-    def _crear_tabla_usuarios(self):
+def _codificar_token(ultimo_id: int) -> str:
+    return base64.urlsafe_b64encode(str(ultimo_id).encode()).decode()
+
+def _decodificar_token(token: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(token.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Token de página no válido: '{token}'")
+
+def _usuario(fila) -> Usuario:
+    usuario = Usuario(fila[1], fila[2])
+    usuario.id = fila[0]
+    return usuario
+
+def _datos_calculo(calculo: dict | None) -> tuple:
+    calculo = calculo or {}
+    return tuple(calculo.get(clave) for clave in DATOS_CALCULO)
+
+def recalcular_cuotas(edad, hipotecas: list[dict]) -> list[tuple[int, float]]:
+    """
+    Recalcula con Calculator la cuota mensual de las hipotecas de un usuario para su nueva edad, con los datos de
+    cálculo guardados en cada una. Si la esperanza de vida se tomó de la tabla de vida, se vuelve a derivar.
+
+    Args:
+        edad (int | np.ndarray): La nueva edad del usuario, o la edad de cada hipoteca.
+        hipotecas (list[dict]): Las hipotecas, con id, monto_total y las claves de DATOS_CALCULO.
+
+    Returns:
+        list[tuple[int, float]]: Pares (id, cuota_mensual) de las hipotecas que siguen siendo válidas con la nueva
+        edad; las demás conservan su cuota.
+
+    Raises:
+        MissingLifeTable: Si alguna hipoteca tomó la esperanza de vida de la tabla de vida y no hay una configurada.
+    """
+    columnas = {clave: [hipoteca[clave] for hipoteca in hipotecas] for clave in ("monto_total", *DATOS_CALCULO)}
+    esperanzas = np.array(columnas["esperanza_vida"], dtype=np.float64)
+    sexos = np.array(columnas["sexo"], dtype=object)
+    con_sexo = sexos != None
+    if con_sexo.any():
+        derivadas = default_life_table().expected_lives(np.broadcast_to(edad, len(hipotecas)), sexos)
+        esperanzas = np.where(con_sexo & ~np.isnan(derivadas), derivadas, esperanzas)
+
+    cuotas, errores = Calculator.calculate_monthly_fees(columnas["monto_total"], edad, esperanzas,
+                                                        columnas["periodo_pago"], columnas["porcentaje_propiedad"],
+                                                        columnas["tipo_hipoteca"])
+    return [(hipoteca["id"], float(cuota)) for hipoteca, cuota, error in zip(hipotecas, cuotas, errores)
+            if error == ErrorCode.VALID]
+
+def _agrupacion(agrupar_por) -> list[str]:
+    agrupar_por = [agrupar_por] if isinstance(agrupar_por, str) else list(agrupar_por)
+    invalidas = [columna for columna in agrupar_por if columna not in AGRUPACIONES_RESUMEN]
+    if invalidas or not agrupar_por:
+        raise ValueError(f"Agrupación no válida: {invalidas or agrupar_por}. Use 'mes' y/o 'rango_edad'.")
+    return agrupar_por
+
+def _lotes(filas, tamano_lote):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) == tamano_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def _contar_viajes(metodo):
+    """
+    Suma a viajes_red del controlador los viajes a la base de datos que hizo el repositorio durante la llamada.
+    """
+    @functools.wraps(metodo)
+    def contado(self, *args, **kwargs):
+        antes = self.repositorio.viajes_hilo()
+        try:
+            return metodo(self, *args, **kwargs)
+        finally:
+            viajes = self.repositorio.viajes_hilo() - antes
+            with self._candado_viajes:
+                self.viajes_red += viajes
+    return contado
+
+class ControladorBase:
+    def __init__(self, repositorio: Repositorio | None = None):
+        """
+        Args:
+            repositorio (Repositorio | None): Almacenamiento a usar, por defecto el compartido del proceso (ver
+                crear_repositorio).
+        """
+        self.repositorio = repositorio or obtener_repositorio()
+        # Viajes a la base de datos de las operaciones de este controlador (no se cuentan los de iterar_* y
+        # exportar_*, que leen a medida que se recorre el resultado)
+        self.viajes_red = 0
+        self._candado_viajes = threading.Lock()
+
+class ControladorUsuarios(ControladorBase):
+    def __init__(self, repositorio: Repositorio | None = None, cache=None):
         """
-        Crea la tabla de usuarios si no existe.
+        Args:
+            repositorio (Repositorio | None): Almacenamiento a usar, por defecto el compartido del proceso.
+            cache (CacheUsuarios | None): Caché de lectura de usuarios, por defecto la que indica el repositorio
+                (ninguna para los almacenamientos locales).
         """
-        with self.conexion.cursor() as cursor:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(100) NOT NULL,
-                    age INT NOT NULL,
-                    UNIQUE(name, age)
-                )
-            """)
-            self.conexion.commit()
+        super().__init__(repositorio)
+        self.cache = cache or self.repositorio.cache_usuarios()
 
+    def _leer(self, clave, cargar):
+        return self.cache.obtener(clave, cargar) if self.cache is not None else cargar()
+
+    def _invalidar(self):
+        if self.cache is not None:
+            self.cache.invalidar()
+
+    @staticmethod
+    def validar_usuario(nombre, edad) -> ValidationResult:
+        """
+        Valida los datos de un usuario sin lanzar excepciones.
+
+        Args:
+            nombre (str): El nombre del usuario.
+            edad (int): La edad del usuario.
+
+        Returns:
+            ValidationResult: El resultado de la validación.
+        """
+        # numbers.Integral acepta también los enteros de numpy de las rutas vectorizadas; bool es un int, pero no una edad
+        if not nombre or not isinstance(edad, numbers.Integral) or isinstance(edad, bool) or edad < 0:
+            return VALIDATION_RESULTS[ErrorCode.INVALID_USER_DATA]
+        return VALIDATION_RESULTS[ErrorCode.VALID]
+
+    @_contar_viajes
     def crear_usuario(self, nombre, edad):
         """
         Crea un nuevo usuario en la base de datos.
@@ -42,26 +161,77 @@ class ControladorUsuarios:
         Raises:
             Exception: Si ocurre algún error al crear el usuario.
         """
-        if not nombre or edad < 0:
-            raise Exception("Datos inválidos para crear usuario")
+        self.validar_usuario(nombre, edad).raise_for_error()
 
         usuario = Usuario(nombre, edad)
-        with self.conexion.cursor() as cursor:
-            try:
-                cursor.execute("""INSERT INTO usuarios (name, age)
-                                  VALUES (%s, %s) RETURNING id""",
-                               (usuario.name, usuario.age))
-                usuario_id = cursor.fetchone()[0]
-                usuario.id = usuario_id
-                self.conexion.commit()
-            except psycopg2.IntegrityError as e:
-                self.conexion.rollback()
-                if 'unique constraint' in str(e):
-                    raise Exception(f"Usuario con el nombre '{nombre}' y edad '{edad}' ya existe.")
-                else:
-                    raise Exception(f"Error al crear usuario: {e}")
+        try:
+            usuario.id = self.repositorio.insertar_usuario(usuario.name, usuario.age)
+        except UsuarioDuplicado:
+            raise Exception(f"Usuario con el nombre '{nombre}' y edad '{edad}' ya existe.")
+        except ErrorRepositorio as e:
+            raise Exception(f"Error al crear usuario: {e}")
+        self._invalidar()
         return usuario
 
+    @_contar_viajes
+    def crear_usuarios_masivo(self, usuarios, conflicto: str = "omitir", tamano_lote: int = TAMANO_LOTE) -> list[dict]:
+        """
+        Crea muchos usuarios con inserciones de varias filas, un viaje a la base de datos por lote.
+
+        Args:
+            usuarios (Iterable[tuple[str, int]]): Pares (nombre, edad) de los usuarios a crear.
+            conflicto (str): Qué hacer con los usuarios cuyo nombre y edad ya existen: "omitir" los deja sin id y
+                "actualizar" devuelve el id del usuario existente.
+            tamano_lote (int): Cantidad de usuarios por inserción.
+
+        Returns:
+            list[dict]: Un reporte por fila, en el orden de entrada, con fila, nombre, edad, id y resultado
+            ("creado", "existente", "omitido", "duplicado", "invalido" o "error") y, si corresponde, el error.
+
+        Raises:
+            ValueError: Si el modo de conflicto no es válido.
+        """
+        if conflicto not in CONFLICTOS:
+            raise ValueError(f"Modo de conflicto no válido: '{conflicto}'. Use 'omitir' o 'actualizar'.")
+
+        reporte = []
+        for lote in _lotes(enumerate(usuarios), tamano_lote):
+            vistos = {}
+            valores = []
+            for fila, (nombre, edad) in lote:
+                resultado = {"fila": fila, "nombre": nombre, "edad": edad, "id": None}
+                reporte.append(resultado)
+                validacion = self.validar_usuario(nombre, edad)
+                if not validacion:
+                    resultado.update(resultado="invalido", error=validacion.message)
+                elif (nombre, edad) in vistos:
+                    resultado["resultado"] = "duplicado"
+                    vistos[(nombre, edad)].append(resultado)
+                else:
+                    vistos[(nombre, edad)] = [resultado]
+                    valores.append((nombre, edad))
+            if not valores:
+                continue
+
+            try:
+                filas = self.repositorio.insertar_usuarios(valores, actualizar=conflicto == "actualizar")
+            except ErrorRepositorio as e:
+                for resultados in vistos.values():
+                    for resultado in resultados:
+                        resultado.update(resultado="error", error=str(e))
+                continue
+
+            for usuario_id, nombre, edad, insertado in filas:
+                primero, *duplicados = vistos.pop((nombre, edad))
+                primero.update(id=usuario_id, resultado="creado" if insertado else "existente")
+                for duplicado in duplicados:
+                    duplicado["id"] = usuario_id
+            for resultados in vistos.values():
+                resultados[0]["resultado"] = "omitido"
+        self._invalidar()
+        return reporte
+
+    @_contar_viajes
     def obtener_usuarios(self) -> list[Usuario]:
         """
         Obtiene todos los usuarios de la base de datos.
@@ -69,15 +239,117 @@ class ControladorUsuarios:
         Returns:
             list[Usuario]: Una lista de objetos Usuario.
         """
+        filas = self._leer(("usuarios",), self.repositorio.listar_usuarios)
+        return [_usuario(fila) for fila in filas]
+
+    @_contar_viajes
+    def obtener_usuarios_con_hipotecas(self, edad_minima: int | None = None, edad_maxima: int | None = None,
+                                       fecha_desde=None, fecha_hasta=None,
+                                       solo_con_hipotecas: bool = False) -> list[Usuario]:
+        """
+        Obtiene los usuarios con sus hipotecas en una sola consulta (un LEFT JOIN), en lugar de llamar a
+        obtener_hipotecas una vez por usuario.
+
+        Los filtros se aplican en el almacenamiento; los que quedan en None no filtran.
+
+        Args:
+            edad_minima (int | None): Edad mínima de los usuarios, incluida.
+            edad_maxima (int | None): Edad máxima de los usuarios, incluida.
+            fecha_desde (date | None): Fecha de inicio mínima de las hipotecas, incluida.
+            fecha_hasta (date | None): Fecha de inicio máxima de las hipotecas, incluida.
+            solo_con_hipotecas (bool): Si es True se omiten los usuarios sin hipotecas en el rango de fechas.
+
+        Returns:
+            list[Usuario]: Los usuarios ordenados por ID; cada uno tiene en el atributo hipotecas la lista de sus
+            hipotecas, con las mismas claves que obtener_hipotecas.
+        """
         usuarios = []
-        with self.conexion.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute("""SELECT id, name, age FROM usuarios""")
-            for fila in cursor.fetchall():
+        for fila in self.repositorio.usuarios_con_hipotecas(edad_minima, edad_maxima, fecha_desde, fecha_hasta,
+                                                            solo_con_hipotecas):
+            if not usuarios or usuarios[-1].id != fila['usuario_id']:
                 usuario = Usuario(fila['name'], fila['age'])
-                usuario.id = fila['id']
+                usuario.id = fila['usuario_id']
+                usuario.hipotecas = []
                 usuarios.append(usuario)
+            if fila['id'] is not None:
+                usuarios[-1].hipotecas.append({clave: fila[clave] for clave in
+                                               ('id', 'monto_total', 'fecha_inicio', 'cuota_mensual')})
         return usuarios
 
+    @_contar_viajes
+    def obtener_usuario(self, usuario_id: int) -> Usuario | None:
+        """
+        Obtiene un usuario por su ID.
+
+        Args:
+            usuario_id (int): El ID del usuario.
+
+        Returns:
+            Usuario | None: El usuario, o None si no existe.
+        """
+        fila = self._leer(("usuario", usuario_id), lambda: self.repositorio.obtener_usuario(usuario_id))
+        return _usuario(fila) if fila else None
+
+    @_contar_viajes
+    def obtener_usuarios_pagina(self, limite: int = TAMANO_PAGINA,
+                                token: str | None = None) -> tuple[list[Usuario], str | None]:
+        """
+        Obtiene una página de usuarios ordenados por ID, paginando por clave (WHERE id > último id) para que el costo
+        de cada página no dependa de cuántas se hayan leído antes.
+
+        Args:
+            limite (int): Cantidad máxima de usuarios de la página.
+            token (str | None): Token devuelto con la página anterior, None para la primera página.
+
+        Returns:
+            tuple[list[Usuario], str | None]: Los usuarios de la página y el token de la siguiente, None si es la
+            última.
+
+        Raises:
+            ValueError: Si el token no es válido.
+        """
+        ultimo_id = _decodificar_token(token) if token else 0
+        filas = self._leer(("pagina", limite, ultimo_id),
+                           lambda: self.repositorio.usuarios_desde(ultimo_id, limite + 1))
+        usuarios = [_usuario(fila) for fila in filas]
+
+        if len(usuarios) <= limite:
+            return usuarios, None
+        usuarios.pop()
+        return usuarios, _codificar_token(usuarios[-1].id)
+
+    def iterar_usuarios(self, tamano_lote: int = TAMANO_LOTE):
+        """
+        Recorre todos los usuarios ordenados por ID trayendo tamano_lote filas por vez (en PostgreSQL con un cursor
+        del lado del servidor), así la memoria usada no depende del tamaño de la tabla.
+
+        La conexión queda prestada hasta que se termina de recorrer (o se cierra) el generador.
+
+        Yields:
+            Usuario: Cada usuario.
+        """
+        for fila in self.repositorio.iterar_usuarios(tamano_lote):
+            yield _usuario(fila)
+
+    def exportar_usuarios(self, formato: str = "csv", tamano_lote: int = TAMANO_LOTE):
+        """
+        Exporta todos los usuarios (id, name, age) leyéndolos con iterar_usuarios, así la memoria usada no depende
+        del tamaño de la tabla.
+
+        Args:
+            formato (str): "csv", "ndjson" o "arrow" (requiere pyarrow).
+            tamano_lote (int): Cantidad de usuarios que se leen y se convierten a la vez.
+
+        Returns:
+            Iterator[bytes]: Los bloques del archivo exportado, uno por lote.
+
+        Raises:
+            ValueError: Si el formato no es válido.
+        """
+        validar_formato(formato)
+        return codificar(self.repositorio.iterar_usuarios(tamano_lote), ("id", "name", "age"), formato, tamano_lote)
+
+    @_contar_viajes
     def eliminar_usuario(self, usuario_id: int) -> None:
         """
         Elimina un usuario y sus hipotecas asociadas de la base de datos.
@@ -88,22 +360,19 @@ class ControladorUsuarios:
         Raises:
             Exception: Si ocurre algún error al eliminar el usuario.
         """
-        with self.conexion.cursor() as cursor:
-            cursor.execute("SELECT COUNT(*) FROM usuarios WHERE id = %s", (usuario_id,))
-            if cursor.fetchone()[0] == 0:
-                raise Exception("El usuario no existe")
-            try:
-                with self.conexion:
-                    cursor.execute("DELETE FROM hipotecas WHERE usuario_id = %s", (usuario_id,))
-                    cursor.execute("DELETE FROM usuarios WHERE id = %s", (usuario_id,))
-                    self.conexion.commit()
-            except psycopg2.Error as e:
-                self.conexion.rollback()
-                raise Exception(f"Error al eliminar usuario: {e}")
+        try:
+            eliminado = self.repositorio.eliminar_usuario(usuario_id)
+        except ErrorRepositorio as e:
+            raise Exception(f"Error al eliminar usuario: {e}")
+        if not eliminado:
+            raise Exception("El usuario no existe")
+        self._invalidar()
 
+    @_contar_viajes
     def modificar_usuario(self, usuario_id: int, nombre: str, edad: int) -> None:
         """
-        Modifica los datos de un usuario existente.
+        Modifica los datos de un usuario existente. Si cambia la edad, en la misma transacción se recalcula la cuota
+        de las hipotecas del usuario que se crearon con sus datos de cálculo (ver recalcular_cuotas).
 
         Args:
             usuario_id (int): El ID del usuario a modificar.
@@ -113,43 +382,18 @@ class ControladorUsuarios:
         Raises:
             Exception: Si ocurre algún error al modificar el usuario.
         """
-        with self.conexion.cursor() as cursor:
-            cursor.execute("SELECT COUNT(*) FROM usuarios WHERE id = %s", (usuario_id,))
-            if cursor.fetchone()[0] == 0:
-                raise Exception("El usuario no existe")
+        try:
+            modificado = self.repositorio.modificar_usuario(usuario_id, nombre, edad, recalcular_cuotas)
+        except ErrorRepositorio as e:
+            raise Exception(f"Error al modificar usuario: {e}")
+        if not modificado:
+            raise Exception("El usuario no existe")
+        self._invalidar()
 
-            try:
-                with self.conexion:
-                    cursor.execute("""UPDATE usuarios SET name = %s, age = %s WHERE id = %s""",
-                                   (nombre, edad, usuario_id))
-                    self.conexion.commit()
-            except psycopg2.Error as e:
-                self.conexion.rollback()
-                raise Exception(f"Error al modificar usuario: {e}")
-
-class ControladorHipotecas:
-    def __init__(self):
-        self.conexion = psycopg2.connect(database=secret_config.PGDATABASE, user=secret_config.PGUSER,
-                                         password=secret_config.PGPASSWORD, host=secret_config.PGHOST)
-        self._crear_tabla_hipotecas()
-
-    def _crear_tabla_hipotecas(self):
-        """
-        Crea la tabla de hipotecas si no existe.
-        """
-        with self.conexion.cursor() as cursor:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS hipotecas (
-                    id SERIAL PRIMARY KEY,
-                    usuario_id INT REFERENCES usuarios(id) ON DELETE CASCADE,
-                    monto_total FLOAT NOT NULL,
-                    fecha_inicio DATE NOT NULL,
-                    cuota_mensual FLOAT NOT NULL
-                )
-            """)
-            self.conexion.commit()
-
-    def crear_hipoteca(self, usuario_id: int, monto_total: float, fecha_inicio: str, cuota_mensual: float) -> None:
+class ControladorHipotecas(ControladorBase):
+    @_contar_viajes
+    def crear_hipoteca(self, usuario_id: int, monto_total: float, fecha_inicio: str, cuota_mensual: float,
+                       calculo: dict | None = None) -> None:
         """
         Crea una nueva hipoteca para un usuario en la base de datos.
 
@@ -158,25 +402,61 @@ class ControladorHipotecas:
             monto_total (float): El monto total de la hipoteca.
             fecha_inicio (str): La fecha de inicio de la hipoteca.
             cuota_mensual (float): La cuota mensual de la hipoteca.
+            calculo (dict | None): Datos de entrada de Calculator con los que se calculó la cuota (esperanza_vida,
+                sexo si la esperanza de vida salió de la tabla de vida, periodo_pago, porcentaje_propiedad y
+                tipo_hipoteca). Sin ellos la cuota no se recalcula al cambiar la edad del usuario.
 
         Raises:
             Exception: Si ocurre algún error al crear la hipoteca.
         """
-        with self.conexion.cursor() as cursor:
-            cursor.execute("SELECT COUNT(*) FROM usuarios WHERE id = %s", (usuario_id,))
-            if cursor.fetchone()[0] == 0:
-                raise Exception("El usuario no existe")
+        try:
+            creada = self.repositorio.insertar_hipoteca(usuario_id, monto_total, fecha_inicio, cuota_mensual,
+                                                        _datos_calculo(calculo))
+        except ErrorRepositorio as e:
+            raise Exception(f"Error al crear hipoteca: {e}")
+        if not creada:
+            raise Exception("El usuario no existe")
+
+    @_contar_viajes
+    def crear_hipotecas_masivo(self, hipotecas, tamano_lote: int = TAMANO_LOTE) -> list[dict]:
+        """
+        Crea muchas hipotecas con inserciones de varias filas, un viaje a la base de datos por lote.
+
+        Las hipotecas de usuarios que no existen no se insertan y se informan en el reporte.
+
+        Args:
+            hipotecas (Iterable[tuple]): Tuplas (usuario_id, monto_total, fecha_inicio, cuota_mensual) de las
+                hipotecas a crear, opcionalmente con un quinto elemento con los datos de cálculo (ver crear_hipoteca).
+            tamano_lote (int): Cantidad de hipotecas por inserción.
 
+        Returns:
+            list[dict]: Un reporte por fila, en el orden de entrada, con fila, usuario_id, id y resultado ("creada",
+            "usuario_inexistente" o "error") y, si corresponde, el error.
+        """
+        reporte = []
+        for lote in _lotes(enumerate(hipotecas), tamano_lote):
+            resultados = {}
+            valores = []
+            for fila, (usuario_id, monto_total, fecha_inicio, cuota_mensual, *calculo) in lote:
+                resultados[fila] = {"fila": fila, "usuario_id": usuario_id, "id": None}
+                reporte.append(resultados[fila])
+                valores.append((fila, usuario_id, monto_total, fecha_inicio, cuota_mensual,
+                                *_datos_calculo(calculo[0] if calculo else None)))
             try:
-                with self.conexion:
-                    cursor.execute("""INSERT INTO hipotecas (usuario_id, monto_total, fecha_inicio, cuota_mensual)
-                                      VALUES (%s, %s, %s, %s)""",
-                                   (usuario_id, monto_total, fecha_inicio, cuota_mensual))
-                    self.conexion.commit()
-            except psycopg2.IntegrityError as e:
-                self.conexion.rollback()
-                raise Exception(f"Error al crear hipoteca: {e}")
+                filas = self.repositorio.insertar_hipotecas(valores)
+            except ErrorRepositorio as e:
+                for resultado in resultados.values():
+                    resultado.update(resultado="error", error=str(e))
+                continue
+
+            for fila, hipoteca_id in filas:
+                if hipoteca_id is not None:
+                    resultados[fila].update(id=hipoteca_id, resultado="creada")
+                else:
+                    resultados[fila]["resultado"] = "usuario_inexistente"
+        return reporte
 
+    @_contar_viajes
     def obtener_hipotecas(self, usuario_id: int) -> list[dict]:
         """
         Obtiene todas las hipotecas de un usuario.
@@ -187,14 +467,61 @@ class ControladorHipotecas:
         Returns:
             list[dict]: Una lista de diccionarios, donde cada diccionario representa una hipoteca.
         """
-        hipotecas = []
-        with self.conexion.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute("""SELECT id, monto_total, fecha_inicio, cuota_mensual
-                              FROM hipotecas
-                              WHERE usuario_id = %s""", (usuario_id,))
-            hipotecas = cursor.fetchall()
-        return hipotecas
+        return self.repositorio.hipotecas_de_usuario(usuario_id)
     
+    @_contar_viajes
+    def obtener_hipotecas_de_usuarios(self, usuario_ids, fecha_desde=None, fecha_hasta=None) -> dict[int, list[dict]]:
+        """
+        Obtiene las hipotecas de varios usuarios con una sola consulta (usuario_id = ANY(...)).
+
+        Args:
+            usuario_ids: Los IDs de los usuarios.
+            fecha_desde (date | None): Fecha de inicio mínima de las hipotecas, incluida.
+            fecha_hasta (date | None): Fecha de inicio máxima de las hipotecas, incluida.
+
+        Returns:
+            dict[int, list[dict]]: Las hipotecas de cada usuario pedido, con las mismas claves que obtener_hipotecas;
+            los usuarios sin hipotecas quedan con una lista vacía.
+        """
+        usuario_ids = list(usuario_ids)
+        hipotecas = {usuario_id: [] for usuario_id in usuario_ids}
+        if not usuario_ids:
+            return hipotecas
+        for fila in self.repositorio.hipotecas_de_usuarios(usuario_ids, fecha_desde, fecha_hasta):
+            hipotecas[fila.pop('usuario_id')].append(fila)
+        return hipotecas
+
+    def iterar_hipotecas(self, tamano_lote: int = TAMANO_LOTE):
+        """
+        Recorre todas las hipotecas ordenadas por ID, con sus datos de cálculo, trayendo tamano_lote filas por vez (en
+        PostgreSQL con un cursor del lado del servidor), así la memoria usada no depende del tamaño de la tabla.
+
+        Yields:
+            dict: Cada hipoteca, con las claves de COLUMNAS_HIPOTECAS.
+        """
+        for fila in self.repositorio.iterar_hipotecas(tamano_lote):
+            yield dict(zip(COLUMNAS_HIPOTECAS, fila))
+
+    def exportar_hipotecas(self, formato: str = "csv", tamano_lote: int = TAMANO_LOTE):
+        """
+        Exporta todas las hipotecas con sus datos de cálculo (las columnas de COLUMNAS_HIPOTECAS), leyéndolas por
+        lotes (en PostgreSQL con un cursor del lado del servidor), así la memoria usada no depende del tamaño de la
+        tabla.
+
+        Args:
+            formato (str): "csv", "ndjson" o "arrow" (requiere pyarrow).
+            tamano_lote (int): Cantidad de hipotecas que se leen y se convierten a la vez.
+
+        Returns:
+            Iterator[bytes]: Los bloques del archivo exportado, uno por lote.
+
+        Raises:
+            ValueError: Si el formato no es válido.
+        """
+        validar_formato(formato)
+        return codificar(self.repositorio.iterar_hipotecas(tamano_lote), COLUMNAS_HIPOTECAS, formato, tamano_lote)
+
+    @_contar_viajes
     def modificar_hipoteca(self, hipoteca_id: int, nueva_cuota_mensual: float) -> None:
         """
         Modifica una hipoteca existente.
@@ -206,16 +533,39 @@ class ControladorHipotecas:
         Raises:
             Exception: Si ocurre algún error al modificar la hipoteca.
         """
-        with self.conexion.cursor() as cursor:
-            cursor.execute("SELECT COUNT(*) FROM hipotecas WHERE id = %s", (hipoteca_id,))
-            if cursor.fetchone()[0] == 0:
-                raise Exception("La hipoteca no existe")
+        try:
+            modificada = self.repositorio.modificar_hipoteca(hipoteca_id, nueva_cuota_mensual)
+        except ErrorRepositorio as e:
+            raise Exception(f"Error al modificar hipoteca: {e}")
+        if not modificada:
+            raise Exception("La hipoteca no existe")
 
-            try:
-                with self.conexion:
-                    cursor.execute("""UPDATE hipotecas SET cuota_mensual = %s WHERE id = %s""",
-                                   (nueva_cuota_mensual, hipoteca_id))
-                    self.conexion.commit()
-            except psycopg2.Error as e:
-                self.conexion.rollback()
-                raise Exception(f"Error al modificar hipoteca: {e}")
+    @_contar_viajes
+    def resumen_cartera(self, agrupar_por=AGRUPACIONES_RESUMEN, fecha_desde=None, fecha_hasta=None) -> list[dict]:
+        """
+        Totales de la cartera por mes de inicio y/o franja de edad de 10 años (60 agrupa las edades de 60 a 69).
+
+        En PostgreSQL se leen de la tabla resumen_hipotecas, que los disparadores de la migración 0004 mantienen al
+        día con cada inserción, modificación o eliminación de hipotecas, así nunca se recorre la tabla hipotecas.
+
+        Args:
+            agrupar_por (Iterable[str]): Columnas por las que agrupar: "mes", "rango_edad" o ambas.
+            fecha_desde (date | None): Primer mes incluido.
+            fecha_hasta (date | None): Último mes incluido.
+
+        Returns:
+            list[dict]: Una fila por grupo, ordenadas, con las columnas de agrupación, cantidad, cuota_total
+            (suma de las cuotas mensuales) y monto_promedio.
+
+        Raises:
+            ValueError: Si alguna columna de agrupación no es válida.
+        """
+        return self.repositorio.resumen_cartera(_agrupacion(agrupar_por), fecha_desde, fecha_hasta)
+
+    @_contar_viajes
+    def reconstruir_resumen(self) -> None:
+        """
+        Vuelve a calcular resumen_hipotecas desde la tabla hipotecas. Los disparadores lo mantienen al día; esto solo
+        hace falta si se cargaron datos sin pasar por ellos (por ejemplo con TRUNCATE o desactivándolos).
+        """
+        self.repositorio.reconstruir_resumen()
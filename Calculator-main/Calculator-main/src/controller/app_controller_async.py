@@ -0,0 +1,441 @@
+import asyncio
+import sys
+import weakref
+sys.path.append("src")
+sys.path.append(".")
+
+import asyncpg
+
+import secret_config
+from model.user import Usuario
+from controller.app_controller import (ControladorUsuarios, CONFLICTOS, TAMANO_LOTE, TAMANO_PAGINA, _agrupacion,
+                                       _codificar_token, _decodificar_token, _datos_calculo, _lotes, _usuario,
+                                       recalcular_cuotas)
+from controller.exportacion import codificar_lotes_async, validar_formato
+from controller.repositorio import AGRUPACIONES_RESUMEN, COLUMNAS_HIPOTECAS, fecha
+from controller.repositorio_postgres import (CONSULTAS_PREPARADAS, INSERTAR_HIPOTECAS, INSERTAR_USUARIOS,
+                                             ITERAR_HIPOTECAS, ITERAR_USUARIOS, RECALCULAR_CUOTAS,
+                                             RECONSTRUIR_RESUMEN, columnas_hipotecas, consulta_hipotecas_de_usuarios,
+                                             consulta_resumen_cartera, consulta_usuarios_con_hipotecas)
+from controller.pool_conexiones import MINIMO_CONEXIONES, MAXIMO_CONEXIONES, TIEMPO_ESPERA, PoolAgotado
+
+
+async def crear_pool(minimo: int = MINIMO_CONEXIONES, maximo: int = MAXIMO_CONEXIONES) -> asyncpg.Pool:
+    """
+    Crea un pool asíncrono de conexiones a la base de datos configurada en secret_config.
+
+    Args:
+        minimo (int): Conexiones que se abren al crear el pool.
+        maximo (int): Conexiones abiertas como máximo.
+    """
+    return await asyncpg.create_pool(database=secret_config.PGDATABASE, user=secret_config.PGUSER,
+                                     password=secret_config.PGPASSWORD, host=secret_config.PGHOST,
+                                     min_size=minimo, max_size=maximo)
+
+
+# Un pool de asyncpg solo se puede usar desde el bucle de eventos que lo creó
+_pools = weakref.WeakKeyDictionary()
+
+
+async def obtener_pool_async() -> asyncpg.Pool:
+    """
+    Devuelve el pool compartido por los controladores asíncronos del bucle de eventos actual, creándolo la primera vez.
+    """
+    bucle = asyncio.get_running_loop()
+    if bucle not in _pools:
+        _pools[bucle] = asyncio.ensure_future(crear_pool())
+    return await _pools[bucle]
+
+
+def _consulta(nombre: str) -> str:
+    # asyncpg prepara y guarda por conexión cada consulta que ejecuta, como RepositorioPostgres con PREPARE
+    return CONSULTAS_PREPARADAS[nombre][1]
+
+
+class ControladorBaseAsync:
+    def __init__(self, pool: asyncpg.Pool | None = None, tiempo_espera: float = TIEMPO_ESPERA):
+        """
+        Args:
+            pool (asyncpg.Pool | None): Pool asíncrono a usar, por defecto el compartido del bucle de eventos.
+            tiempo_espera (float): Segundos que se espera por una conexión libre antes de lanzar PoolAgotado.
+        """
+        self.pool = pool
+        self.tiempo_espera = tiempo_espera
+        self.viajes_red = 0
+
+    async def _obtener_pool(self) -> asyncpg.Pool:
+        if self.pool is None:
+            self.pool = await obtener_pool_async()
+        return self.pool
+
+    async def _conexion(self):
+        pool = await self._obtener_pool()
+        try:
+            return await pool.acquire(timeout=self.tiempo_espera)
+        except asyncio.TimeoutError:
+            raise PoolAgotado(self.tiempo_espera)
+
+    async def _ejecutar(self, metodo: str, consulta: str, *parametros):
+        """
+        Ejecuta una consulta con una conexión del pool contando el viaje de ida y vuelta a la base de datos.
+
+        Args:
+            metodo (str): Método de la conexión de asyncpg: execute, fetch, fetchrow o fetchval.
+        """
+        conexion = await self._conexion()
+        try:
+            self.viajes_red += 1
+            return await getattr(conexion, metodo)(consulta, *parametros)
+        finally:
+            await self.pool.release(conexion)
+
+    async def _iterar(self, consulta: str, tamano_lote: int):
+        """
+        Recorre el resultado de la consulta con un cursor del lado del servidor, devolviendo listas de hasta
+        tamano_lote filas. La conexión queda prestada hasta que se termina de recorrer (o se cierra) el generador.
+        """
+        conexion = await self._conexion()
+        try:
+            async with conexion.transaction():
+                self.viajes_red += 1
+                cursor = await conexion.cursor(consulta)
+                while True:
+                    self.viajes_red += 1
+                    lote = await cursor.fetch(tamano_lote)
+                    if not lote:
+                        break
+                    yield lote
+        finally:
+            await self.pool.release(conexion)
+
+
+def _filas_afectadas(estado: str) -> int:
+    # execute devuelve la etiqueta del comando, por ejemplo "UPDATE 1"
+    return int(estado.rsplit(" ", 1)[-1])
+
+
+class ControladorUsuariosAsync(ControladorBaseAsync):
+    """
+    Versión asíncrona de ControladorUsuarios sobre PostgreSQL, con los mismos métodos y errores y el mismo SQL que
+    RepositorioPostgres, pero sin la caché de usuarios.
+    """
+
+    validar_usuario = staticmethod(ControladorUsuarios.validar_usuario)
+
+    async def crear_usuario(self, nombre, edad):
+        """
+        Crea un nuevo usuario en la base de datos.
+
+        Returns:
+            Usuario: El objeto Usuario creado.
+
+        Raises:
+            Exception: Si ocurre algún error al crear el usuario.
+        """
+        self.validar_usuario(nombre, edad).raise_for_error()
+
+        usuario = Usuario(nombre, edad)
+        try:
+            usuario.id = await self._ejecutar("fetchval", _consulta("insertar_usuario"), nombre, edad)
+        except asyncpg.UniqueViolationError:
+            raise Exception(f"Usuario con el nombre '{nombre}' y edad '{edad}' ya existe.")
+        except asyncpg.IntegrityConstraintViolationError as e:
+            raise Exception(f"Error al crear usuario: {e}")
+        return usuario
+
+    async def crear_usuarios_masivo(self, usuarios, conflicto: str = "omitir",
+                                    tamano_lote: int = TAMANO_LOTE) -> list[dict]:
+        """
+        Crea muchos usuarios, un viaje a la base de datos por lote. El reporte es el mismo que el de
+        ControladorUsuarios.crear_usuarios_masivo.
+
+        Raises:
+            ValueError: Si el modo de conflicto no es válido.
+        """
+        if conflicto not in CONFLICTOS:
+            raise ValueError(f"Modo de conflicto no válido: '{conflicto}'. Use 'omitir' o 'actualizar'.")
+        consulta = INSERTAR_USUARIOS[conflicto == "actualizar"]
+
+        reporte = []
+        for lote in _lotes(enumerate(usuarios), tamano_lote):
+            vistos = {}
+            for fila, (nombre, edad) in lote:
+                resultado = {"fila": fila, "nombre": nombre, "edad": edad, "id": None}
+                reporte.append(resultado)
+                validacion = self.validar_usuario(nombre, edad)
+                if not validacion:
+                    resultado.update(resultado="invalido", error=validacion.message)
+                elif (nombre, edad) in vistos:
+                    resultado["resultado"] = "duplicado"
+                    vistos[(nombre, edad)].append(resultado)
+                else:
+                    vistos[(nombre, edad)] = [resultado]
+            if not vistos:
+                continue
+
+            try:
+                filas = await self._ejecutar("fetch", consulta, [nombre for nombre, _ in vistos],
+                                             [edad for _, edad in vistos])
+            except asyncpg.PostgresError as e:
+                for resultados in vistos.values():
+                    for resultado in resultados:
+                        resultado.update(resultado="error", error=str(e))
+                continue
+
+            for usuario_id, nombre, edad, insertado in filas:
+                primero, *duplicados = vistos.pop((nombre, edad))
+                primero.update(id=usuario_id, resultado="creado" if insertado else "existente")
+                for duplicado in duplicados:
+                    duplicado["id"] = usuario_id
+            for resultados in vistos.values():
+                resultados[0]["resultado"] = "omitido"
+        return reporte
+
+    async def obtener_usuarios(self) -> list[Usuario]:
+        """
+        Obtiene todos los usuarios de la base de datos.
+        """
+        return [_usuario(fila) for fila in await self._ejecutar("fetch", _consulta("obtener_usuarios"))]
+
+    async def obtener_usuarios_con_hipotecas(self, edad_minima: int | None = None, edad_maxima: int | None = None,
+                                             fecha_desde=None, fecha_hasta=None,
+                                             solo_con_hipotecas: bool = False) -> list[Usuario]:
+        """
+        Obtiene los usuarios con sus hipotecas en una sola consulta, como
+        ControladorUsuarios.obtener_usuarios_con_hipotecas.
+        """
+        consulta, parametros = consulta_usuarios_con_hipotecas(edad_minima, edad_maxima, fecha_desde, fecha_hasta,
+                                                               solo_con_hipotecas)
+        usuarios = []
+        for fila in await self._ejecutar("fetch", consulta, *parametros):
+            if not usuarios or usuarios[-1].id != fila['usuario_id']:
+                usuario = Usuario(fila['name'], fila['age'])
+                usuario.id = fila['usuario_id']
+                usuario.hipotecas = []
+                usuarios.append(usuario)
+            if fila['id'] is not None:
+                usuarios[-1].hipotecas.append({clave: fila[clave] for clave in
+                                               ('id', 'monto_total', 'fecha_inicio', 'cuota_mensual')})
+        return usuarios
+
+    async def obtener_usuario(self, usuario_id: int) -> Usuario | None:
+        """
+        Obtiene un usuario por su ID, o None si no existe.
+        """
+        fila = await self._ejecutar("fetchrow", _consulta("obtener_usuario"), usuario_id)
+        return _usuario(fila) if fila else None
+
+    async def obtener_usuarios_pagina(self, limite: int = TAMANO_PAGINA,
+                                      token: str | None = None) -> tuple[list[Usuario], str | None]:
+        """
+        Obtiene una página de usuarios ordenados por ID y el token de la siguiente, como
+        ControladorUsuarios.obtener_usuarios_pagina.
+
+        Raises:
+            ValueError: Si el token no es válido.
+        """
+        ultimo_id = _decodificar_token(token) if token else 0
+        usuarios = [_usuario(fila) for fila in await self._ejecutar("fetch", _consulta("obtener_usuarios_pagina"),
+                                                                     ultimo_id, limite + 1)]
+
+        if len(usuarios) <= limite:
+            return usuarios, None
+        usuarios.pop()
+        return usuarios, _codificar_token(usuarios[-1].id)
+
+    async def iterar_usuarios(self, tamano_lote: int = TAMANO_LOTE):
+        """
+        Recorre todos los usuarios ordenados por ID con un cursor del lado del servidor (async for).
+
+        La conexión queda prestada hasta que se termina de recorrer (o se cierra) el generador.
+        """
+        async for lote in self._iterar(ITERAR_USUARIOS, tamano_lote):
+            for fila in lote:
+                yield _usuario(fila)
+
+    def exportar_usuarios(self, formato: str = "csv", tamano_lote: int = TAMANO_LOTE):
+        """
+        Exporta todos los usuarios (id, name, age) como ControladorUsuarios.exportar_usuarios, leyéndolos por lotes
+        con un cursor del lado del servidor (async for).
+
+        Raises:
+            ValueError: Si el formato no es válido.
+        """
+        validar_formato(formato)
+        return codificar_lotes_async(self._iterar(ITERAR_USUARIOS, tamano_lote), ("id", "name", "age"), formato)
+
+    async def eliminar_usuario(self, usuario_id: int) -> None:
+        """
+        Elimina un usuario y sus hipotecas asociadas de la base de datos.
+
+        Raises:
+            Exception: Si ocurre algún error al eliminar el usuario.
+        """
+        try:
+            estado = await self._ejecutar("execute", _consulta("eliminar_usuario"), usuario_id)
+        except asyncpg.PostgresError as e:
+            raise Exception(f"Error al eliminar usuario: {e}")
+        if _filas_afectadas(estado) == 0:
+            raise Exception("El usuario no existe")
+
+    async def modificar_usuario(self, usuario_id: int, nombre: str, edad: int) -> None:
+        """
+        Modifica los datos de un usuario existente y, si cambia la edad, recalcula en la misma transacción la cuota
+        de sus hipotecas con datos de cálculo.
+
+        Raises:
+            Exception: Si ocurre algún error al modificar el usuario.
+        """
+        conexion = await self._conexion()
+        try:
+            async with conexion.transaction():
+                self.viajes_red += 1
+                filas = await conexion.fetch(_consulta("modificar_usuario"), nombre, edad, usuario_id)
+                afectadas = [dict(fila) for fila in filas if fila['id'] is not None]
+                cuotas = recalcular_cuotas(edad, afectadas) if afectadas else []
+                if cuotas:
+                    self.viajes_red += 1
+                    ids, nuevas = zip(*cuotas)
+                    await conexion.execute(RECALCULAR_CUOTAS, list(ids), list(nuevas), edad)
+        except asyncpg.PostgresError as e:
+            raise Exception(f"Error al modificar usuario: {e}")
+        finally:
+            await self.pool.release(conexion)
+        if not filas:
+            raise Exception("El usuario no existe")
+
+
+class ControladorHipotecasAsync(ControladorBaseAsync):
+    """
+    Versión asíncrona de ControladorHipotecas sobre PostgreSQL, con los mismos métodos y errores y el mismo SQL que
+    RepositorioPostgres.
+    """
+
+    async def crear_hipoteca(self, usuario_id: int, monto_total: float, fecha_inicio, cuota_mensual: float,
+                             calculo: dict | None = None) -> None:
+        """
+        Crea una nueva hipoteca para un usuario en la base de datos.
+
+        Raises:
+            Exception: Si ocurre algún error al crear la hipoteca.
+        """
+        try:
+            estado = await self._ejecutar("execute", _consulta("insertar_hipoteca"),
+                                          monto_total, fecha(fecha_inicio), cuota_mensual, usuario_id,
+                                          *_datos_calculo(calculo))
+        except asyncpg.ForeignKeyViolationError:
+            raise Exception("El usuario no existe")
+        except asyncpg.IntegrityConstraintViolationError as e:
+            raise Exception(f"Error al crear hipoteca: {e}")
+        if _filas_afectadas(estado) == 0:
+            raise Exception("El usuario no existe")
+
+    async def crear_hipotecas_masivo(self, hipotecas, tamano_lote: int = TAMANO_LOTE) -> list[dict]:
+        """
+        Crea muchas hipotecas, un viaje a la base de datos por lote. El reporte es el mismo que el de
+        ControladorHipotecas.crear_hipotecas_masivo.
+        """
+        reporte = []
+        for lote in _lotes(enumerate(hipotecas), tamano_lote):
+            resultados = {}
+            valores = []
+            for fila, (usuario_id, monto_total, fecha_inicio, cuota_mensual, *calculo) in lote:
+                resultados[fila] = {"fila": fila, "usuario_id": usuario_id, "id": None}
+                reporte.append(resultados[fila])
+                valores.append((fila, usuario_id, monto_total, fecha_inicio, cuota_mensual,
+                                *_datos_calculo(calculo[0] if calculo else None)))
+            try:
+                filas = await self._ejecutar("fetch", INSERTAR_HIPOTECAS, *columnas_hipotecas(valores))
+            except (asyncpg.PostgresError, asyncpg.InterfaceError, ValueError) as e:
+                for resultado in resultados.values():
+                    resultado.update(resultado="error", error=str(e))
+                continue
+
+            for fila, hipoteca_id in filas:
+                if hipoteca_id is not None:
+                    resultados[fila].update(id=hipoteca_id, resultado="creada")
+                else:
+                    resultados[fila]["resultado"] = "usuario_inexistente"
+        return reporte
+
+    async def obtener_hipotecas(self, usuario_id: int) -> list[dict]:
+        """
+        Obtiene todas las hipotecas de un usuario como una lista de diccionarios.
+        """
+        filas = await self._ejecutar("fetch", _consulta("obtener_hipotecas"), usuario_id)
+        return [dict(fila) for fila in filas]
+
+    async def obtener_hipotecas_de_usuarios(self, usuario_ids, fecha_desde=None,
+                                            fecha_hasta=None) -> dict[int, list[dict]]:
+        """
+        Obtiene las hipotecas de varios usuarios con una sola consulta, como
+        ControladorHipotecas.obtener_hipotecas_de_usuarios.
+        """
+        usuario_ids = list(usuario_ids)
+        hipotecas = {usuario_id: [] for usuario_id in usuario_ids}
+        if not usuario_ids:
+            return hipotecas
+        consulta, parametros = consulta_hipotecas_de_usuarios(usuario_ids, fecha_desde, fecha_hasta)
+        for fila in await self._ejecutar("fetch", consulta, *parametros):
+            hipoteca = dict(fila)
+            hipotecas[hipoteca.pop('usuario_id')].append(hipoteca)
+        return hipotecas
+
+    async def iterar_hipotecas(self, tamano_lote: int = TAMANO_LOTE):
+        """
+        Recorre todas las hipotecas ordenadas por ID con sus datos de cálculo, como
+        ControladorHipotecas.iterar_hipotecas, con un cursor del lado del servidor (async for).
+        """
+        async for lote in self._iterar(ITERAR_HIPOTECAS, tamano_lote):
+            for fila in lote:
+                yield dict(fila)
+
+    def exportar_hipotecas(self, formato: str = "csv", tamano_lote: int = TAMANO_LOTE):
+        """
+        Exporta todas las hipotecas con sus datos de cálculo como ControladorHipotecas.exportar_hipotecas, leyéndolas
+        por lotes con un cursor del lado del servidor (async for).
+
+        Raises:
+            ValueError: Si el formato no es válido.
+        """
+        validar_formato(formato)
+        return codificar_lotes_async(self._iterar(ITERAR_HIPOTECAS, tamano_lote), COLUMNAS_HIPOTECAS, formato)
+
+    async def modificar_hipoteca(self, hipoteca_id: int, nueva_cuota_mensual: float) -> None:
+        """
+        Modifica la cuota mensual de una hipoteca existente.
+
+        Raises:
+            Exception: Si ocurre algún error al modificar la hipoteca.
+        """
+        try:
+            estado = await self._ejecutar("execute", _consulta("modificar_hipoteca"), nueva_cuota_mensual, hipoteca_id)
+        except asyncpg.PostgresError as e:
+            raise Exception(f"Error al modificar hipoteca: {e}")
+        if _filas_afectadas(estado) == 0:
+            raise Exception("La hipoteca no existe")
+
+    async def resumen_cartera(self, agrupar_por=AGRUPACIONES_RESUMEN, fecha_desde=None,
+                              fecha_hasta=None) -> list[dict]:
+        """
+        Totales de la cartera por mes de inicio y/o franja de edad, leídos de resumen_hipotecas, como
+        ControladorHipotecas.resumen_cartera.
+
+        Raises:
+            ValueError: Si alguna columna de agrupación no es válida.
+        """
+        consulta, parametros = consulta_resumen_cartera(_agrupacion(agrupar_por), fecha_desde, fecha_hasta)
+        return [dict(fila) for fila in await self._ejecutar("fetch", consulta, *parametros)]
+
+    async def reconstruir_resumen(self) -> None:
+        """
+        Vuelve a calcular resumen_hipotecas desde la tabla hipotecas, como ControladorHipotecas.reconstruir_resumen.
+        """
+        conexion = await self._conexion()
+        try:
+            async with conexion.transaction():
+                for consulta in RECONSTRUIR_RESUMEN:
+                    self.viajes_red += 1
+                    await conexion.execute(consulta)
+        finally:
+            await self.pool.release(conexion)
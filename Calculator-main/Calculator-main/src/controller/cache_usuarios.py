@@ -0,0 +1,151 @@
+import select
+import threading
+import time
+
+import psycopg2
+
+import secret_config
+from controller.pool_conexiones import conectar
+
+TTL = getattr(secret_config, "CACHE_USUARIOS_TTL", 300.0)
+# Canal en el que el disparador de la migración 0003 avisa cada cambio en la tabla usuarios
+CANAL = "usuarios_cambios"
+REINTENTO_MAXIMO = 30.0
+
+
+class CacheUsuarios:
+    def __init__(self, fabrica=conectar, ttl: float | None = TTL, escuchar: bool = True, reloj=time.monotonic):
+        """
+        Caché de lectura de usuarios, por ID y por consulta, compartida por los controladores del proceso.
+
+        Los controladores la invalidan después de cada escritura. Los cambios hechos por otros procesos llegan por
+        LISTEN/NOTIFY a un hilo que escucha el canal CANAL con una conexión propia; mientras ese hilo no está
+        conectado no se guarda nada, así nunca se sirven datos que otro proceso ya cambió.
+
+        Args:
+            fabrica (callable): Función que abre la conexión con la que se escuchan los cambios.
+            ttl (float | None): Segundos que se conserva cada entrada, None para no vencerlas.
+            escuchar (bool): Si es False no se escuchan los cambios de otros procesos (un único proceso escribe).
+            reloj (callable): Función que devuelve el tiempo actual en segundos.
+        """
+        self._fabrica = fabrica
+        self.ttl = ttl
+        self.escuchar = escuchar
+        self._reloj = reloj
+        self._datos = {}
+        self._generacion = 0
+        self._candado = threading.Lock()
+        self._conectado = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._estadisticas = {"aciertos": 0, "fallos": 0, "invalidaciones": 0, "notificaciones": 0}
+
+    def obtener(self, clave, cargar):
+        """
+        Devuelve el valor guardado para la clave o, si no está o venció, lo carga con cargar() y lo guarda.
+        """
+        self._iniciar_escucha()
+        with self._candado:
+            entrada = self._datos.get(clave)
+            if entrada is not None and (entrada[0] is None or entrada[0] > self._reloj()):
+                self._estadisticas["aciertos"] += 1
+                return entrada[1]
+            self._estadisticas["fallos"] += 1
+            generacion = self._generacion
+
+        valor = cargar()
+        with self._candado:
+            # Si hubo una invalidación mientras se cargaba, el valor leído puede estar desactualizado
+            if generacion == self._generacion and (not self.escuchar or self._conectado.is_set()):
+                expira = self._reloj() + self.ttl if self.ttl is not None else None
+                self._datos[clave] = (expira, valor)
+        return valor
+
+    def invalidar(self):
+        """
+        Descarta todas las entradas.
+        """
+        with self._candado:
+            self._datos.clear()
+            self._generacion += 1
+            self._estadisticas["invalidaciones"] += 1
+
+    def estadisticas(self) -> dict:
+        """
+        Aciertos, fallos, invalidaciones, notificaciones recibidas, entradas guardadas y si se están escuchando los
+        cambios de otros procesos.
+        """
+        with self._candado:
+            estadisticas = dict(self._estadisticas)
+            estadisticas["entradas"] = len(self._datos)
+        estadisticas["escuchando"] = self._conectado.is_set()
+        return estadisticas
+
+    def esperar_escucha(self, tiempo_espera: float | None = None) -> bool:
+        """
+        Espera a que el hilo que escucha los cambios esté conectado; devuelve False si no lo logra a tiempo.
+        """
+        self._iniciar_escucha()
+        return self._conectado.wait(tiempo_espera)
+
+    def cerrar(self):
+        """
+        Detiene el hilo que escucha los cambios.
+        """
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+
+    def _iniciar_escucha(self):
+        if not self.escuchar or self._hilo is not None:
+            return
+        with self._candado:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._escuchar, name="cache_usuarios", daemon=True)
+                self._hilo.start()
+
+    def _escuchar(self):
+        espera = 1.0
+        while not self._detener.is_set():
+            conexion = None
+            try:
+                conexion = self._fabrica()
+                conexion.autocommit = True
+                with conexion.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CANAL}")
+                # Lo que se guardó antes de escuchar pudo perderse un aviso
+                self.invalidar()
+                self._conectado.set()
+                espera = 1.0
+                while not self._detener.is_set():
+                    if select.select([conexion], [], [], 1.0)[0]:
+                        conexion.poll()
+                        if conexion.notifies:
+                            with self._candado:
+                                self._estadisticas["notificaciones"] += len(conexion.notifies)
+                            conexion.notifies.clear()
+                            self.invalidar()
+            except (psycopg2.Error, OSError):
+                self._detener.wait(espera)
+                espera = min(espera * 2, REINTENTO_MAXIMO)
+            finally:
+                # Sin conexión no llegan los avisos de otros procesos
+                self._conectado.clear()
+                self.invalidar()
+                if conexion is not None:
+                    conexion.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache_usuarios() -> CacheUsuarios:
+    """
+    Devuelve la caché de usuarios compartida por todos los controladores del proceso, creándola la primera vez.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheUsuarios()
+        return _cache
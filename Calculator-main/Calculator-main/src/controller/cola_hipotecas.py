@@ -0,0 +1,174 @@
+import atexit
+import queue
+import sys
+import threading
+import time
+
+from controller.app_controller import ControladorHipotecas, TAMANO_LOTE
+from controller.repositorio import secret_config
+
+CAPACIDAD = getattr(secret_config, "COLA_HIPOTECAS_CAPACIDAD", 10000)
+ESPERA_LOTE = getattr(secret_config, "COLA_HIPOTECAS_ESPERA", 0.05)
+
+# Marca que se encola al cerrar para que el hilo termine después de guardar lo pendiente
+_FIN = object()
+
+
+class ColaLlena(Exception):
+    """
+    Excepción para cuando la cola de hipotecas sigue llena después del tiempo de espera.
+    """
+
+    def __init__(self, tiempo_espera):
+        super().__init__(f"La cola de hipotecas sigue llena después de esperar {tiempo_espera} segundos.")
+
+
+def informar_fallo(resultado: dict) -> None:
+    """
+    Escribe en la salida de errores la hipoteca que no se pudo guardar.
+    """
+    print(f"No se pudo guardar la hipoteca del usuario {resultado['usuario_id']} por {resultado['monto_total']}: "
+          f"{resultado.get('error', resultado['resultado'])}", file=sys.stderr)
+
+
+class ColaHipotecas:
+    def __init__(self, controlador_hipotecas: ControladorHipotecas | None = None, capacidad: int = CAPACIDAD,
+                 tamano_lote: int = TAMANO_LOTE, espera_lote: float = ESPERA_LOTE, al_fallar=informar_fallo):
+        """
+        Escritura diferida de hipotecas: crear_hipoteca encola la hipoteca y vuelve enseguida, y un hilo las guarda
+        por lotes con crear_hipotecas_masivo, una sola confirmación por lote en lugar de una por hipoteca.
+
+        Lo pendiente se guarda al cerrar la cola, y también al terminar el proceso si no se cerró antes.
+
+        Args:
+            controlador_hipotecas (ControladorHipotecas | None): Controlador con el que se guardan los lotes.
+            capacidad (int): Hipotecas pendientes como máximo; al llegar a la capacidad crear_hipoteca espera.
+            tamano_lote (int): Hipotecas guardadas como máximo en cada lote.
+            espera_lote (float): Segundos que el hilo espera a que lleguen más hipotecas antes de guardar un lote
+                incompleto.
+            al_fallar (callable): Función que recibe el resultado (el del reporte de crear_hipotecas_masivo, con
+                monto_total, fecha_inicio y cuota_mensual) de cada hipoteca que no se pudo guardar.
+        """
+        self.controlador_hipotecas = controlador_hipotecas or ControladorHipotecas()
+        self.tamano_lote = tamano_lote
+        self.espera_lote = espera_lote
+        self.al_fallar = al_fallar
+        self._cola = queue.Queue(capacidad)
+        self._cerrada = False
+        self._candado = threading.Lock()
+        # Cubre la comprobación de _cerrada y el encolado, así ninguna hipoteca queda detrás de _FIN
+        self._candado_cierre = threading.Lock()
+        self._estadisticas = {"encoladas": 0, "guardadas": 0, "fallidas": 0, "lotes": 0, "esperas": 0}
+        self._hilo = threading.Thread(target=self._trabajar, name="cola_hipotecas", daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    def crear_hipoteca(self, usuario_id: int, monto_total: float, fecha_inicio, cuota_mensual: float,
+                       calculo: dict | None = None, tiempo_espera: float | None = None) -> None:
+        """
+        Encola una hipoteca para guardarla en segundo plano. Los errores se informan después a al_fallar.
+
+        Args:
+            usuario_id (int): El ID del usuario.
+            monto_total (float): El monto total de la hipoteca.
+            fecha_inicio (date | str): La fecha de inicio de la hipoteca.
+            cuota_mensual (float): La cuota mensual de la hipoteca.
+            calculo (dict | None): Datos de entrada de Calculator, como en ControladorHipotecas.crear_hipoteca.
+            tiempo_espera (float | None): Segundos que se espera si la cola está llena, None para esperar sin límite.
+
+        Raises:
+            ColaLlena: Si la cola sigue llena después del tiempo de espera.
+            Exception: Si la cola ya está cerrada.
+        """
+        hipoteca = (usuario_id, monto_total, fecha_inicio, cuota_mensual, calculo)
+        with self._candado_cierre:
+            if self._cerrada:
+                raise Exception("La cola de hipotecas está cerrada")
+            try:
+                self._cola.put_nowait(hipoteca)
+            except queue.Full:
+                # Contrapresión: quien encola espera a que el hilo libere lugar. El hilo no toma _candado_cierre,
+                # así que sigue guardando mientras tanto
+                with self._candado:
+                    self._estadisticas["esperas"] += 1
+                try:
+                    self._cola.put(hipoteca, timeout=tiempo_espera)
+                except queue.Full:
+                    raise ColaLlena(tiempo_espera)
+            with self._candado:
+                self._estadisticas["encoladas"] += 1
+
+    def vaciar(self) -> None:
+        """
+        Espera a que se guarden (o fallen) todas las hipotecas encoladas hasta ahora.
+        """
+        self._cola.join()
+
+    def cerrar(self) -> None:
+        """
+        Deja de aceptar hipotecas, guarda las pendientes y detiene el hilo.
+        """
+        with self._candado_cierre:
+            if self._cerrada:
+                return
+            self._cerrada = True
+        atexit.unregister(self.cerrar)
+        self._cola.put(_FIN)
+        self._hilo.join()
+
+    def estadisticas(self) -> dict:
+        """
+        Hipotecas encoladas, guardadas y fallidas, lotes guardados, veces que se esperó por la cola llena y
+        hipotecas pendientes.
+        """
+        with self._candado:
+            estadisticas = dict(self._estadisticas)
+        estadisticas["pendientes"] = self._cola.qsize()
+        return estadisticas
+
+    def _trabajar(self):
+        while True:
+            hipoteca = self._cola.get()
+            if hipoteca is _FIN:
+                self._cola.task_done()
+                return
+
+            # Junta las hipotecas que llegan mientras tanto para guardarlas en una sola confirmación
+            lote = [hipoteca]
+            limite = time.monotonic() + self.espera_lote
+            fin = False
+            while len(lote) < self.tamano_lote:
+                try:
+                    hipoteca = self._cola.get(timeout=max(limite - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if hipoteca is _FIN:
+                    fin = True
+                    break
+                lote.append(hipoteca)
+
+            self._guardar(lote)
+            for _ in range(len(lote) + fin):
+                self._cola.task_done()
+            if fin:
+                return
+
+    def _guardar(self, lote):
+        try:
+            reporte = self.controlador_hipotecas.crear_hipotecas_masivo(lote, tamano_lote=len(lote))
+        except Exception as e:
+            reporte = [{"fila": fila, "usuario_id": hipoteca[0], "id": None, "resultado": "error", "error": str(e)}
+                       for fila, hipoteca in enumerate(lote)]
+
+        fallidas = [resultado for resultado in reporte if resultado["resultado"] != "creada"]
+        with self._candado:
+            self._estadisticas["lotes"] += 1
+            self._estadisticas["guardadas"] += len(reporte) - len(fallidas)
+            self._estadisticas["fallidas"] += len(fallidas)
+        for resultado in fallidas:
+            _, monto_total, fecha_inicio, cuota_mensual, _ = lote[resultado["fila"]]
+            resultado.update(monto_total=monto_total, fecha_inicio=fecha_inicio, cuota_mensual=cuota_mensual)
+            try:
+                self.al_fallar(resultado)
+            except Exception as e:
+                print(f"Error al informar la hipoteca no guardada: {e}", file=sys.stderr)
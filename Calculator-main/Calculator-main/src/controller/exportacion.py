@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+
+# Formato -> (tipo MIME, extensión del archivo)
+FORMATOS_EXPORTACION = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+# Tipo de Arrow de cada columna exportada, así todos los lotes tienen el mismo esquema aunque alguno traiga solo None
+TIPOS_ARROW = {
+    "id": "int32", "usuario_id": "int32", "name": "string", "age": "int32", "edad": "int32",
+    "monto_total": "float64", "cuota_mensual": "float64", "fecha_inicio": "date32", "esperanza_vida": "float64",
+    "sexo": "string", "periodo_pago": "int32", "porcentaje_propiedad": "float64", "tipo_hipoteca": "int32",
+}
+
+
+def validar_formato(formato: str) -> None:
+    """
+    Verifica que el formato de exportación exista y, si es arrow, que pyarrow esté instalado.
+
+    Raises:
+        ValueError: Si el formato no es válido o falta pyarrow.
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato de exportación '{formato}' inválido, debe ser uno de "
+                         f"{tuple(FORMATOS_EXPORTACION)}.")
+    if formato == "arrow":
+        _importar_pyarrow()
+
+
+def _importar_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise ValueError("El formato arrow requiere instalar pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def _lotes(filas, tamano_lote):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) == tamano_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+class _Csv:
+    def __init__(self, columnas):
+        self.texto = io.StringIO()
+        self.escritor = csv.writer(self.texto)
+        self.escritor.writerow(columnas)
+
+    def _vaciar(self) -> bytes:
+        contenido = self.texto.getvalue().encode("utf-8")
+        self.texto.seek(0)
+        self.texto.truncate()
+        return contenido
+
+    def lote(self, filas) -> bytes:
+        self.escritor.writerows(filas)
+        return self._vaciar()
+
+    def fin(self) -> bytes:
+        # El encabezado, si no hubo filas
+        return self._vaciar()
+
+
+class _Ndjson:
+    def __init__(self, columnas):
+        self.columnas = columnas
+
+    def lote(self, filas) -> bytes:
+        return "".join(json.dumps(dict(zip(self.columnas, fila)), ensure_ascii=False, default=str) + "\n"
+                       for fila in filas).encode("utf-8")
+
+    def fin(self) -> bytes:
+        return b""
+
+
+class _Arrow:
+    def __init__(self, columnas):
+        self.pyarrow = _importar_pyarrow()
+        self.columnas = columnas
+        self.esquema = self.pyarrow.schema([(columna, getattr(self.pyarrow, TIPOS_ARROW[columna])())
+                                            for columna in columnas])
+        self.salida = io.BytesIO()
+        self.escritor = self.pyarrow.ipc.new_stream(self.salida, self.esquema)
+
+    def _vaciar(self) -> bytes:
+        contenido = self.salida.getvalue()
+        self.salida.seek(0)
+        self.salida.truncate()
+        return contenido
+
+    def lote(self, filas) -> bytes:
+        self.escritor.write_batch(self.pyarrow.record_batch(
+            [[fila[i] for fila in filas] for i in range(len(self.columnas))], schema=self.esquema))
+        return self._vaciar()
+
+    def fin(self) -> bytes:
+        # El esquema (si no hubo filas) y la marca de fin del flujo
+        self.escritor.close()
+        return self._vaciar()
+
+
+CODIFICADORES = {"csv": _Csv, "ndjson": _Ndjson, "arrow": _Arrow}
+
+
+def codificar(filas, columnas: tuple[str, ...], formato: str, tamano_lote: int):
+    """
+    Convierte las filas en bloques de bytes del formato pedido, un bloque cada tamano_lote filas, sin juntar todas
+    las filas en memoria.
+
+    Args:
+        filas (iterable): Tuplas con los valores de las columnas, en orden.
+        columnas (tuple[str, ...]): Nombres de las columnas.
+        formato (str): Uno de FORMATOS_EXPORTACION (validado antes con validar_formato).
+        tamano_lote (int): Cantidad de filas por bloque.
+
+    Yields:
+        bytes: Cada bloque del archivo exportado.
+    """
+    codificador = CODIFICADORES[formato](columnas)
+    for lote in _lotes(filas, tamano_lote):
+        yield codificador.lote(lote)
+    if final := codificador.fin():
+        yield final
+
+
+async def codificar_lotes_async(lotes, columnas: tuple[str, ...], formato: str):
+    """
+    Versión de codificar para los controladores asíncronos: convierte cada lote de filas que llega de lotes (un
+    iterable asíncrono) en un bloque de bytes del formato pedido.
+
+    Yields:
+        bytes: Cada bloque del archivo exportado.
+    """
+    codificador = CODIFICADORES[formato](columnas)
+    async for lote in lotes:
+        yield codificador.lote(lote)
+    if final := codificador.fin():
+        yield final
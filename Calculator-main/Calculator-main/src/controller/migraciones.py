@@ -0,0 +1,118 @@
+import sys
+sys.path.append("src")
+sys.path.append(".")
+
+import argparse
+import os
+import re
+
+from controller.pool_conexiones import conectar
+
+DIRECTORIO_MIGRACIONES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                      "sql", "migraciones")
+# Clave del candado consultivo que serializa las ejecuciones simultáneas (por ejemplo, varios workers que arrancan)
+CANDADO_MIGRACIONES = 4872301
+
+
+def listar_migraciones(directorio: str = DIRECTORIO_MIGRACIONES) -> list[tuple[int, str, str]]:
+    """
+    Lista los scripts de migración del directorio, cuyos nombres tienen la forma NNNN_descripcion.sql.
+
+    Returns:
+        list[tuple[int, str, str]]: Tuplas (versión, nombre, ruta) ordenadas por versión.
+    """
+    migraciones = []
+    for archivo in os.listdir(directorio):
+        coincidencia = re.fullmatch(r"(\d+)_(.+)\.sql", archivo)
+        if coincidencia:
+            migraciones.append((int(coincidencia.group(1)), coincidencia.group(2), os.path.join(directorio, archivo)))
+    migraciones.sort()
+    versiones = [version for version, _, _ in migraciones]
+    if len(versiones) != len(set(versiones)):
+        raise ValueError(f"Hay migraciones con la misma versión en '{directorio}'.")
+    return migraciones
+
+
+def _crear_tabla_versiones(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS versiones_esquema (
+                          version INT PRIMARY KEY,
+                          nombre TEXT NOT NULL,
+                          aplicada_en TIMESTAMPTZ NOT NULL DEFAULT now()
+                      )""")
+
+
+def version_actual(conexion) -> int:
+    """
+    Devuelve la versión de esquema aplicada en la base de datos, 0 si no se aplicó ninguna migración.
+    """
+    with conexion.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('versiones_esquema') IS NOT NULL")
+        if not cursor.fetchone()[0]:
+            return 0
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM versiones_esquema")
+        return cursor.fetchone()[0]
+
+
+def aplicar_migraciones(hasta: int | None = None, directorio: str = DIRECTORIO_MIGRACIONES,
+                        reportar=print) -> list[int]:
+    """
+    Aplica en orden las migraciones pendientes y anota cada versión en la tabla versiones_esquema.
+
+    Cada migración se aplica en su propia transacción junto con su registro de versión, así una migración fallida no
+    deja el esquema a medias. Un candado consultivo evita que dos procesos migren a la vez.
+
+    Args:
+        hasta (int | None): Última versión a aplicar, por defecto todas.
+        directorio (str): Directorio con los scripts de migración.
+        reportar (callable): Función que recibe una línea por cada migración aplicada.
+
+    Returns:
+        list[int]: Las versiones aplicadas en esta ejecución.
+    """
+    pendientes = listar_migraciones(directorio)
+    aplicadas = []
+    conexion = conectar()
+    try:
+        with conexion:
+            with conexion.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_lock(%s)", (CANDADO_MIGRACIONES,))
+                _crear_tabla_versiones(cursor)
+        try:
+            actual = version_actual(conexion)
+            for version, nombre, ruta in pendientes:
+                if version <= actual or (hasta is not None and version > hasta):
+                    continue
+                with open(ruta, encoding="utf-8") as archivo:
+                    script = archivo.read()
+                with conexion:
+                    with conexion.cursor() as cursor:
+                        cursor.execute(script)
+                        cursor.execute("INSERT INTO versiones_esquema (version, nombre) VALUES (%s, %s)",
+                                       (version, nombre))
+                aplicadas.append(version)
+                reportar(f"Migración {version:04d} aplicada: {nombre}")
+        finally:
+            with conexion:
+                with conexion.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", (CANDADO_MIGRACIONES,))
+    finally:
+        conexion.close()
+    return aplicadas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aplica las migraciones pendientes del esquema de la base de datos.")
+    parser.add_argument("--hasta", type=int, help="Última versión a aplicar")
+    args = parser.parse_args(argv)
+
+    aplicadas = aplicar_migraciones(args.hasta)
+    if not aplicadas:
+        conexion = conectar()
+        try:
+            print(f"El esquema ya está actualizado (versión {version_actual(conexion)}).")
+        finally:
+            conexion.close()
+
+
+if __name__ == "__main__":
+    main()
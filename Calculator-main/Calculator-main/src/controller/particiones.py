@@ -0,0 +1,295 @@
+import sys
+sys.path.append("src")
+sys.path.append(".")
+
+import argparse
+import csv
+import datetime
+import gzip
+import os
+import re
+
+from psycopg2 import sql
+
+from controller.pool_conexiones import conectar
+from controller.repositorio import COLUMNAS_HIPOTECAS
+
+ANIOS_ADELANTE = 1
+DIRECTORIO_ARCHIVO = "archivo"
+FORMATOS_ARCHIVO = ("parquet", "csv")
+TAMANO_LOTE = 5000
+
+
+def _nombre_particion(anio: int) -> str:
+    return f"hipotecas_{anio}"
+
+
+def listar_particiones() -> list[int]:
+    """
+    Devuelve los años que tienen partición en la tabla hipotecas, ordenados.
+    """
+    conexion = conectar()
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("""SELECT c.relname
+                              FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                              WHERE i.inhparent = 'hipotecas'::regclass""")
+            nombres = [nombre for nombre, in cursor.fetchall()]
+    finally:
+        conexion.close()
+    return sorted(int(nombre.rsplit("_", 1)[1]) for nombre in nombres if re.fullmatch(r"hipotecas_\d+", nombre))
+
+
+def crear_particiones(anios_adelante: int = ANIOS_ADELANTE) -> list[int]:
+    """
+    Crea las particiones que faltan: la del año actual, las de los próximos años y las de los años que tienen
+    hipotecas en la partición por defecto, que se mueven a su partición. Conviene ejecutarla periódicamente (por
+    ejemplo, una vez al año); mientras tanto las hipotecas de años sin partición se guardan en hipotecas_default.
+
+    Args:
+        anios_adelante (int): Cantidad de años siguientes al actual cuya partición se crea por adelantado.
+
+    Returns:
+        list[int]: Los años cuya partición se creó en esta ejecución.
+    """
+    actual = datetime.date.today().year
+    conexion = conectar()
+    try:
+        with conexion:
+            with conexion.cursor() as cursor:
+                cursor.execute("SELECT DISTINCT extract(year FROM fecha_inicio)::int FROM hipotecas_default")
+                anios = {anio for anio, in cursor.fetchall()} | set(range(actual, actual + anios_adelante + 1))
+                creadas = []
+                for anio in sorted(anios):
+                    cursor.execute("SELECT crear_particion_hipotecas(%s)", (anio,))
+                    if cursor.fetchone()[0]:
+                        creadas.append(anio)
+    finally:
+        conexion.close()
+    return creadas
+
+
+class _ArchivoParquet:
+    def __init__(self, ruta):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("El formato Parquet requiere instalar pyarrow: pip install pyarrow; o use el formato csv")
+        self.pyarrow = pyarrow
+        self.esquema = pyarrow.schema([("id", pyarrow.int32()), ("usuario_id", pyarrow.int32()),
+                                       ("monto_total", pyarrow.float64()), ("fecha_inicio", pyarrow.date32()),
+                                       ("cuota_mensual", pyarrow.float64()), ("edad", pyarrow.int32()),
+                                       ("esperanza_vida", pyarrow.float64()), ("sexo", pyarrow.string()),
+                                       ("periodo_pago", pyarrow.int32()), ("porcentaje_propiedad", pyarrow.float64()),
+                                       ("tipo_hipoteca", pyarrow.int32())])
+        self.escritor = pyarrow.parquet.ParquetWriter(ruta, self.esquema, compression="zstd")
+
+    def escribir(self, filas):
+        columnas = {columna: [fila[i] for fila in filas] for i, columna in enumerate(COLUMNAS_HIPOTECAS)}
+        self.escritor.write_table(self.pyarrow.table(columnas, schema=self.esquema))
+
+    def cerrar(self):
+        self.escritor.close()
+
+
+class _ArchivoCsv:
+    def __init__(self, ruta):
+        self.archivo = gzip.open(ruta, "wt", encoding="utf-8", newline="")
+        self.escritor = csv.writer(self.archivo)
+        self.escritor.writerow(COLUMNAS_HIPOTECAS)
+
+    def escribir(self, filas):
+        self.escritor.writerows(filas)
+
+    def cerrar(self):
+        self.archivo.close()
+
+
+ARCHIVOS = {"parquet": (_ArchivoParquet, "parquet"), "csv": (_ArchivoCsv, "csv.gz")}
+
+
+# Hipotecas cuyo último pago (el del mes número de pagos - 1, contado desde fecha_inicio, como en model.schedule) ya
+# pasó. Las hipotecas sin datos de cálculo no tienen plazo conocido y nunca se consideran terminadas
+_TERMINADA = """fecha_inicio + make_interval(months => (CASE tipo_hipoteca
+                                                    WHEN 1 THEN round((esperanza_vida - edad) * 12)
+                                                    WHEN 2 THEN periodo_pago * 12
+                                                    WHEN 3 THEN 1
+                                                 END)::int - 1) < %(hasta)s"""
+
+
+def _reservar_ruta(directorio: str, particion: str, extension: str) -> str:
+    """
+    Crea vacío el primer archivo libre entre particion.extension, particion_2.extension, particion_3.extension...,
+    así nunca se sobrescribe un archivo anterior, tampoco si otro proceso archiva al mismo tiempo.
+    """
+    numero = 1
+    while True:
+        ruta = os.path.join(directorio, f"{particion}.{extension}" if numero == 1 else
+                            f"{particion}_{numero}.{extension}")
+        try:
+            with open(ruta, "xb"):
+                return ruta
+        except FileExistsError:
+            numero += 1
+
+
+def _sincronizar(ruta: str) -> None:
+    with open(ruta, "r+b") as archivo:
+        os.fsync(archivo.fileno())
+
+
+def _sincronizar_directorio(directorio: str) -> None:
+    # En Windows no se puede abrir un directorio; ahí el renombrado ya queda en disco al volver os.replace
+    if hasattr(os, "O_DIRECTORY"):
+        descriptor = os.open(directorio, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+
+def archivar_particion(anio: int, directorio: str = DIRECTORIO_ARCHIVO, formato: str = "parquet",
+                       tamano_lote: int = TAMANO_LOTE) -> dict:
+    """
+    Archiva las hipotecas terminadas de un año en un archivo comprimido y las elimina de la tabla hipotecas. Las
+    hipotecas que siguen vigentes (o sin datos de cálculo, cuyo plazo no se conoce) quedan en su partición; si no
+    queda ninguna, la partición se desprende y se elimina.
+
+    Todo ocurre en una sola transacción, y el archivo queda escrito en disco con su nombre final antes de
+    confirmarla: si algo falla antes, las hipotecas quedan como estaban. Las hipotecas se eliminan de a lotes con
+    DELETE ... RETURNING desde la tabla hipotecas, así el disparador las descuenta de resumen_hipotecas. Nunca se
+    sobrescribe un archivo anterior: si ya existe hipotecas_AAAA se usa hipotecas_AAAA_2, hipotecas_AAAA_3...
+
+    Args:
+        anio (int): Año de fecha_inicio de las hipotecas a archivar.
+        directorio (str): Directorio donde se guarda el archivo hipotecas_AAAA.parquet (o .csv.gz).
+        formato (str): "parquet" (requiere pyarrow) o "csv".
+        tamano_lote (int): Cantidad de hipotecas que se eliminan y escriben a la vez.
+
+    Returns:
+        dict: Reporte con el año, las hipotecas archivadas, las vigentes que quedaron, si se eliminó la partición y
+        la ruta del archivo (None si no había ninguna hipoteca terminada).
+
+    Raises:
+        ValueError: Si el formato no es válido o no existe la partición del año.
+    """
+    if formato not in ARCHIVOS:
+        raise ValueError(f"Formato de archivo '{formato}' inválido, debe ser uno de {FORMATOS_ARCHIVO}.")
+    clase, extension = ARCHIVOS[formato]
+    particion = _nombre_particion(anio)
+    parametros = {"desde": datetime.date(anio, 1, 1), "hasta_anio": datetime.date(anio + 1, 1, 1),
+                  "hasta": datetime.date.today(), "tamano_lote": tamano_lote}
+    eliminar_lote = sql.SQL("""DELETE FROM hipotecas
+                               WHERE fecha_inicio >= %(desde)s AND fecha_inicio < %(hasta_anio)s
+                                 AND id IN (SELECT id FROM hipotecas
+                                            WHERE fecha_inicio >= %(desde)s AND fecha_inicio < %(hasta_anio)s
+                                              AND id > %(ultimo)s AND {}
+                                            ORDER BY id LIMIT %(tamano_lote)s)
+                               RETURNING {}""").format(sql.SQL(_TERMINADA),
+                                                       sql.SQL(", ").join(map(sql.Identifier, COLUMNAS_HIPOTECAS)))
+    os.makedirs(directorio, exist_ok=True)
+    ruta = temporal = None
+    renombrado = False
+    filas = 0
+    conexion = conectar()
+    try:
+        with conexion:
+            with conexion.cursor() as cursor:
+                cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (particion,))
+                if not cursor.fetchone()[0]:
+                    raise ValueError(f"No existe la partición de hipotecas del año {anio}.")
+
+                archivo = None
+                ultimo = 0
+                try:
+                    while True:
+                        cursor.execute(eliminar_lote, {**parametros, "ultimo": ultimo})
+                        lote = sorted(cursor.fetchall())
+                        if not lote:
+                            break
+                        if archivo is None:
+                            ruta = _reservar_ruta(directorio, particion, extension)
+                            temporal = f"{ruta}.tmp"
+                            archivo = clase(temporal)
+                        archivo.escribir(lote)
+                        filas += len(lote)
+                        ultimo = lote[-1][0]
+                finally:
+                    if archivo is not None:
+                        archivo.cerrar()
+
+                cursor.execute(sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(particion)))
+                vigentes = cursor.fetchone()[0]
+                if not vigentes:
+                    cursor.execute(sql.SQL("ALTER TABLE hipotecas DETACH PARTITION {}").format(
+                        sql.Identifier(particion)))
+                    cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(particion)))
+                # El disparador deja en cero los grupos que se vaciaron
+                cursor.execute("DELETE FROM resumen_hipotecas WHERE mes >= %(desde)s AND mes < %(hasta_anio)s "
+                               "AND cantidad = 0", parametros)
+
+                # El archivo queda en disco con su nombre final antes de confirmar: si la confirmación falla
+                # después, las hipotecas siguen en la tabla y a lo sumo quedan también en el archivo
+                if temporal is not None:
+                    _sincronizar(temporal)
+                    os.replace(temporal, ruta)
+                    renombrado = True
+                    _sincronizar_directorio(directorio)
+    except BaseException:
+        if not renombrado:
+            for resto in (temporal, ruta):
+                if resto is not None and os.path.exists(resto):
+                    os.remove(resto)
+        raise
+    finally:
+        conexion.close()
+    return {"anio": anio, "filas": filas, "vigentes": vigentes, "particion_eliminada": not vigentes, "archivo": ruta}
+
+
+def archivar_anteriores(anio: int, directorio: str = DIRECTORIO_ARCHIVO, formato: str = "parquet",
+                        tamano_lote: int = TAMANO_LOTE, reportar=print) -> list[dict]:
+    """
+    Archiva con archivar_particion las hipotecas terminadas de los años anteriores al indicado, una transacción por
+    año. Las particiones que todavía tienen hipotecas vigentes se conservan con ellas.
+
+    Returns:
+        list[dict]: El reporte de cada partición archivada.
+    """
+    reportes = []
+    for anterior in listar_particiones():
+        if anterior >= anio:
+            break
+        reporte = archivar_particion(anterior, directorio, formato, tamano_lote)
+        reportes.append(reporte)
+        destino = f" en {reporte['archivo']}" if reporte["archivo"] else ""
+        reportar(f"Año {anterior}: {reporte['filas']} hipotecas archivadas{destino}, {reporte['vigentes']} vigentes")
+    return reportes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Administra las particiones anuales de la tabla hipotecas.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    crear = subcomandos.add_parser("crear", help="Crea las particiones que faltan")
+    crear.add_argument("--anios-adelante", type=int, default=ANIOS_ADELANTE)
+    subcomandos.add_parser("listar", help="Lista los años con partición")
+    archivar = subcomandos.add_parser("archivar",
+                                      help="Archiva las hipotecas terminadas de los años anteriores a --antes-de")
+    archivar.add_argument("--antes-de", type=int, required=True)
+    archivar.add_argument("--directorio", default=DIRECTORIO_ARCHIVO)
+    archivar.add_argument("--formato", choices=FORMATOS_ARCHIVO, default="parquet")
+    archivar.add_argument("--tamano-lote", type=int, default=TAMANO_LOTE)
+    args = parser.parse_args(argv)
+
+    if args.comando == "crear":
+        creadas = crear_particiones(args.anios_adelante)
+        print(f"Particiones creadas: {', '.join(map(str, creadas))}" if creadas else "No faltaba ninguna partición.")
+    elif args.comando == "listar":
+        print(", ".join(map(str, listar_particiones())))
+    else:
+        reportes = archivar_anteriores(args.antes_de, args.directorio, args.formato, args.tamano_lote)
+        print(f"Total: {sum(reporte['filas'] for reporte in reportes)} hipotecas archivadas de {len(reportes)} años")
+
+
+if __name__ == "__main__":
+    main()
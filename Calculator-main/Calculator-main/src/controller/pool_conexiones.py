@@ -0,0 +1,215 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+import secret_config
+
+MINIMO_CONEXIONES = getattr(secret_config, "PGPOOL_MIN", 1)
+MAXIMO_CONEXIONES = getattr(secret_config, "PGPOOL_MAX", 10)
+TIEMPO_ESPERA = getattr(secret_config, "PGPOOL_TIMEOUT", 30.0)
+VERIFICAR_DESPUES = getattr(secret_config, "PGPOOL_HEALTHCHECK", 30.0)
+
+
+def conectar():
+    """
+    Abre una conexión nueva a la base de datos configurada en secret_config.
+    """
+    return psycopg2.connect(database=secret_config.PGDATABASE, user=secret_config.PGUSER,
+                            password=secret_config.PGPASSWORD, host=secret_config.PGHOST)
+
+
+class PoolAgotado(Exception):
+    """
+    Excepción para cuando no se libera ninguna conexión del pool antes del tiempo de espera.
+    """
+
+    def __init__(self, tiempo_espera):
+        super().__init__(f"No hay conexiones disponibles en la base de datos después de esperar {tiempo_espera} "
+                         f"segundos.")
+
+
+class PoolConexiones:
+    def __init__(self, fabrica=conectar, minimo: int = MINIMO_CONEXIONES, maximo: int = MAXIMO_CONEXIONES,
+                 tiempo_espera: float = TIEMPO_ESPERA, verificar_despues: float = VERIFICAR_DESPUES):
+        """
+        Pool de conexiones compartido por los controladores. Las conexiones se abren recién cuando se necesitan.
+
+        Args:
+            fabrica (callable): Función que abre una conexión nueva.
+            minimo (int): Conexiones que se mantienen abiertas una vez que el pool se usa por primera vez.
+            maximo (int): Conexiones abiertas como máximo; al llegar al máximo las peticiones esperan.
+            tiempo_espera (float): Segundos que se espera por una conexión libre antes de lanzar PoolAgotado.
+            verificar_despues (float): Segundos sin uso tras los cuales una conexión se verifica con SELECT 1 antes
+                de entregarla.
+        """
+        self._fabrica = fabrica
+        self.minimo = minimo
+        self.maximo = maximo
+        self.tiempo_espera = tiempo_espera
+        self.verificar_despues = verificar_despues
+        self._libres = []
+        self._abiertas = 0
+        self._condicion = threading.Condition()
+        self._estadisticas = {"prestamos": 0, "esperas": 0, "espera_total": 0.0, "espera_maxima": 0.0,
+                              "creadas": 0, "descartadas": 0, "agotado": 0}
+
+    def _abrir(self):
+        try:
+            conexion = self._fabrica()
+            # Cada sentencia se confirma sola, así una operación de una sentencia es un único viaje a la base de
+            # datos; las operaciones de varias sentencias abren su transacción con "with conexion".
+            conexion.autocommit = True
+        except Exception:
+            with self._condicion:
+                self._abiertas -= 1
+                self._condicion.notify()
+            raise
+        with self._condicion:
+            self._estadisticas["creadas"] += 1
+        return conexion
+
+    def _calentar(self):
+        while True:
+            with self._condicion:
+                if self._abiertas >= self.minimo:
+                    return
+                self._abiertas += 1
+            conexion = self._abrir()
+            with self._condicion:
+                self._libres.append((conexion, time.monotonic()))
+                self._condicion.notify()
+
+    def _esta_sana(self, conexion, liberada_en):
+        if conexion.closed:
+            return False
+        if time.monotonic() - liberada_en < self.verificar_despues:
+            return True
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _descartar(self, conexion):
+        try:
+            conexion.close()
+        except psycopg2.Error:
+            pass
+        with self._condicion:
+            self._abiertas -= 1
+            self._estadisticas["descartadas"] += 1
+            self._condicion.notify()
+
+    def obtener(self):
+        """
+        Toma una conexión del pool, abriendo una nueva si no hay libres y no se llegó al máximo.
+
+        Raises:
+            PoolAgotado: Si no se libera ninguna conexión antes del tiempo de espera.
+        """
+        if self._abiertas < self.minimo:
+            self._calentar()
+
+        inicio = time.monotonic()
+        while True:
+            with self._condicion:
+                while not self._libres and self._abiertas >= self.maximo:
+                    restante = self.tiempo_espera - (time.monotonic() - inicio)
+                    if restante <= 0:
+                        self._estadisticas["agotado"] += 1
+                        raise PoolAgotado(self.tiempo_espera)
+                    self._condicion.wait(restante)
+                espera = time.monotonic() - inicio
+                self._estadisticas["prestamos"] += 1
+                self._estadisticas["espera_total"] += espera
+                self._estadisticas["espera_maxima"] = max(self._estadisticas["espera_maxima"], espera)
+                if espera > 0.001:
+                    self._estadisticas["esperas"] += 1
+                if self._libres:
+                    conexion, liberada_en = self._libres.pop()
+                else:
+                    conexion, liberada_en = None, None
+                    self._abiertas += 1
+
+            if conexion is None:
+                return self._abrir()
+            if self._esta_sana(conexion, liberada_en):
+                return conexion
+            self._descartar(conexion)
+
+    def devolver(self, conexion):
+        """
+        Devuelve una conexión al pool, deshaciendo cualquier transacción que haya quedado abierta.
+        """
+        estado = conexion.get_transaction_status() if not conexion.closed else extensions.TRANSACTION_STATUS_UNKNOWN
+        if estado == extensions.TRANSACTION_STATUS_UNKNOWN:
+            self._descartar(conexion)
+            return
+        if estado != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                if conexion.autocommit:
+                    # En autocommit rollback() no envía nada, la transacción se abrió con un BEGIN explícito
+                    with conexion.cursor() as cursor:
+                        cursor.execute("ROLLBACK")
+                else:
+                    conexion.rollback()
+            except psycopg2.Error:
+                self._descartar(conexion)
+                return
+        with self._condicion:
+            self._libres.append((conexion, time.monotonic()))
+            self._condicion.notify()
+
+    @contextmanager
+    def conexion(self):
+        """
+        Presta una conexión durante el bloque with y la devuelve al pool al salir.
+        """
+        conexion = self.obtener()
+        try:
+            yield conexion
+        finally:
+            self.devolver(conexion)
+
+    def estadisticas(self) -> dict:
+        """
+        Estadísticas del pool: préstamos, esperas y tiempos de espera (en segundos), conexiones creadas, descartadas,
+        abiertas y libres.
+        """
+        with self._condicion:
+            estadisticas = dict(self._estadisticas)
+            estadisticas["abiertas"] = self._abiertas
+            estadisticas["libres"] = len(self._libres)
+            estadisticas["en_uso"] = self._abiertas - len(self._libres)
+            prestamos = estadisticas["prestamos"]
+            estadisticas["espera_promedio"] = estadisticas["espera_total"] / prestamos if prestamos else 0.0
+        return estadisticas
+
+    def cerrar(self):
+        """
+        Cierra las conexiones libres del pool.
+        """
+        with self._condicion:
+            libres, self._libres = self._libres, []
+            self._abiertas -= len(libres)
+        for conexion, _ in libres:
+            conexion.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool() -> PoolConexiones:
+    """
+    Devuelve el pool compartido por todos los controladores del proceso, creándolo la primera vez.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolConexiones()
+        return _pool
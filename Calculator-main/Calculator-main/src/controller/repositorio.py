@@ -0,0 +1,241 @@
+import datetime
+import os
+import threading
+from abc import ABC, abstractmethod
+
+try:
+    import secret_config
+except ImportError:
+    # Un quiosco con almacenamiento local no necesita credenciales de la base de datos
+    secret_config = None
+
+ALMACENAMIENTOS = ("postgres", "sqlite", "memoria")
+AGRUPACIONES_RESUMEN = ("mes", "rango_edad")
+# Datos de entrada de Calculator que se guardan con cada hipoteca (además de la edad), en este orden
+DATOS_CALCULO = ("esperanza_vida", "sexo", "periodo_pago", "porcentaje_propiedad", "tipo_hipoteca")
+# Columnas de las filas de iterar_hipotecas, en este orden
+COLUMNAS_HIPOTECAS = ("id", "usuario_id", "monto_total", "fecha_inicio", "cuota_mensual", "edad", *DATOS_CALCULO)
+
+
+class ErrorRepositorio(Exception):
+    """
+    Error del almacenamiento al leer o escribir datos; el mensaje es el del almacenamiento.
+    """
+
+
+class UsuarioDuplicado(ErrorRepositorio):
+    """
+    Ya existe un usuario con el mismo nombre y edad.
+    """
+
+
+def fecha(valor) -> datetime.date:
+    """
+    Convierte una fecha en texto ISO (como las acepta psycopg2) en un objeto date.
+    """
+    return datetime.date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def rango_edad(edad: int | None) -> int:
+    """
+    Franja de edad de 10 años de una hipoteca (60 agrupa las edades de 60 a 69), -1 si la edad no se conoce.
+    """
+    return -1 if edad is None else edad // 10 * 10
+
+
+class Repositorio(ABC):
+    """
+    Almacenamiento de usuarios e hipotecas que usan ControladorUsuarios y ControladorHipotecas.
+
+    Los usuarios se representan como tuplas (id, nombre, edad) y las hipotecas como diccionarios con id, monto_total,
+    fecha_inicio y cuota_mensual. Los datos de cálculo de una hipoteca son una tupla con los valores de DATOS_CALCULO
+    (None si no se conocen). Los errores del almacenamiento se lanzan como ErrorRepositorio.
+    """
+
+    @abstractmethod
+    def insertar_usuario(self, nombre: str, edad: int) -> int:
+        """
+        Inserta un usuario y devuelve su ID.
+
+        Raises:
+            UsuarioDuplicado: Si ya existe un usuario con el mismo nombre y edad.
+        """
+
+    @abstractmethod
+    def insertar_usuarios(self, usuarios: list[tuple[str, int]], actualizar: bool) -> list[tuple[int, str, int, bool]]:
+        """
+        Inserta varios usuarios (sin repetidos) de una vez.
+
+        Args:
+            usuarios (list[tuple[str, int]]): Pares (nombre, edad).
+            actualizar (bool): Si es True también se devuelven los usuarios que ya existían.
+
+        Returns:
+            list[tuple[int, str, int, bool]]: (id, nombre, edad, insertado) de cada usuario insertado o, con
+            actualizar, ya existente.
+        """
+
+    @abstractmethod
+    def listar_usuarios(self) -> list[tuple]:
+        """
+        Devuelve todos los usuarios.
+        """
+
+    @abstractmethod
+    def obtener_usuario(self, usuario_id: int) -> tuple | None:
+        """
+        Devuelve un usuario, o None si no existe.
+        """
+
+    @abstractmethod
+    def usuarios_desde(self, ultimo_id: int, limite: int) -> list[tuple]:
+        """
+        Devuelve hasta limite usuarios con ID mayor que ultimo_id, ordenados por ID.
+        """
+
+    @abstractmethod
+    def iterar_usuarios(self, tamano_lote: int):
+        """
+        Recorre todos los usuarios ordenados por ID sin cargarlos todos en memoria.
+        """
+
+    @abstractmethod
+    def usuarios_con_hipotecas(self, edad_minima, edad_maxima, fecha_desde, fecha_hasta,
+                               solo_con_hipotecas: bool) -> list[dict]:
+        """
+        Devuelve una fila por usuario e hipoteca (o una por usuario sin hipotecas, salvo con solo_con_hipotecas),
+        ordenadas por usuario e hipoteca, con usuario_id, name, age, id, monto_total, fecha_inicio y cuota_mensual.
+        Los filtros en None no filtran.
+        """
+
+    @abstractmethod
+    def eliminar_usuario(self, usuario_id: int) -> bool:
+        """
+        Elimina un usuario y sus hipotecas; devuelve False si el usuario no existe.
+        """
+
+    @abstractmethod
+    def modificar_usuario(self, usuario_id: int, nombre: str, edad: int, recalcular) -> bool:
+        """
+        Modifica un usuario; devuelve False si no existe.
+
+        Si cambia la edad, en la misma transacción se recalculan las hipotecas del usuario que tienen datos de
+        cálculo: recalcular(edad, hipotecas) recibe diccionarios con id, monto_total y DATOS_CALCULO y devuelve pares
+        (id, cuota_mensual), que se guardan junto con la nueva edad de cada hipoteca.
+        """
+
+    @abstractmethod
+    def insertar_hipoteca(self, usuario_id: int, monto_total: float, fecha_inicio, cuota_mensual: float,
+                          datos_calculo: tuple) -> bool:
+        """
+        Inserta una hipoteca; devuelve False si el usuario no existe.
+        """
+
+    @abstractmethod
+    def insertar_hipotecas(self, hipotecas: list[tuple]) -> list[tuple[int, int | None]]:
+        """
+        Inserta varias hipotecas de una vez, omitiendo las de usuarios que no existen.
+
+        Args:
+            hipotecas (list[tuple]): Tuplas (fila, usuario_id, monto_total, fecha_inicio, cuota_mensual) seguidas
+                de los datos de cálculo.
+
+        Returns:
+            list[tuple[int, int | None]]: (fila, id de la hipoteca creada o None si el usuario no existe).
+        """
+
+    @abstractmethod
+    def hipotecas_de_usuario(self, usuario_id: int) -> list[dict]:
+        """
+        Devuelve las hipotecas de un usuario.
+        """
+
+    @abstractmethod
+    def hipotecas_de_usuarios(self, usuario_ids: list[int], fecha_desde, fecha_hasta) -> list[dict]:
+        """
+        Devuelve las hipotecas de varios usuarios, ordenadas por usuario e hipoteca, con la clave usuario_id.
+        """
+
+    @abstractmethod
+    def iterar_hipotecas(self, tamano_lote: int):
+        """
+        Recorre todas las hipotecas ordenadas por ID sin cargarlas todas en memoria, como tuplas con los valores de
+        COLUMNAS_HIPOTECAS.
+        """
+
+    @abstractmethod
+    def modificar_hipoteca(self, hipoteca_id: int, cuota_mensual: float) -> bool:
+        """
+        Modifica la cuota mensual de una hipoteca; devuelve False si no existe.
+        """
+
+    @abstractmethod
+    def resumen_cartera(self, agrupar_por: list[str], fecha_desde, fecha_hasta) -> list[dict]:
+        """
+        Devuelve cantidad, cuota_total y monto_promedio de las hipotecas agrupadas por las columnas pedidas ("mes" de
+        inicio y/o "rango_edad"), ordenadas por esas columnas.
+        """
+
+    def reconstruir_resumen(self) -> None:
+        """
+        Vuelve a calcular los totales de resumen_cartera si el almacenamiento los guarda.
+        """
+
+    def viajes_hilo(self) -> int:
+        """
+        Viajes de ida y vuelta a la base de datos que hizo el hilo actual desde que se creó el repositorio, así cada
+        controlador puede contar los suyos aunque compartan el repositorio. Los almacenamientos locales no hacen viajes.
+        """
+        return 0
+
+    def cache_usuarios(self):
+        """
+        Caché de lectura de usuarios adecuada para este almacenamiento, o None si no conviene usar una.
+        """
+        return None
+
+    def cerrar(self) -> None:
+        """
+        Libera las conexiones del almacenamiento.
+        """
+
+
+def crear_repositorio(almacenamiento: str | None = None, **opciones) -> Repositorio:
+    """
+    Crea el repositorio del almacenamiento pedido.
+
+    Args:
+        almacenamiento (str | None): "postgres", "sqlite" o "memoria"; por defecto el de la variable de entorno
+            ALMACENAMIENTO o, si no está, el de secret_config.ALMACENAMIENTO ("postgres" si tampoco está).
+        opciones: Argumentos del repositorio, por ejemplo ruta para SQLite o pool para PostgreSQL.
+
+    Raises:
+        ValueError: Si el almacenamiento no es válido.
+    """
+    almacenamiento = (almacenamiento or os.environ.get("ALMACENAMIENTO")
+                      or getattr(secret_config, "ALMACENAMIENTO", "postgres"))
+    if almacenamiento == "postgres":
+        from controller.repositorio_postgres import RepositorioPostgres
+        return RepositorioPostgres(**opciones)
+    if almacenamiento == "sqlite":
+        from controller.repositorio_sqlite import RepositorioSQLite
+        return RepositorioSQLite(**opciones)
+    if almacenamiento == "memoria":
+        from controller.repositorio_memoria import RepositorioMemoria
+        return RepositorioMemoria(**opciones)
+    raise ValueError(f"Almacenamiento no válido: '{almacenamiento}'. Use {', '.join(ALMACENAMIENTOS)}.")
+
+
+_repositorio = None
+_repositorio_lock = threading.Lock()
+
+
+def obtener_repositorio() -> Repositorio:
+    """
+    Devuelve el repositorio compartido por todos los controladores del proceso, creándolo la primera vez.
+    """
+    global _repositorio
+    with _repositorio_lock:
+        if _repositorio is None:
+            _repositorio = crear_repositorio()
+        return _repositorio
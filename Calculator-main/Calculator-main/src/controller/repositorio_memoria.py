@@ -0,0 +1,196 @@
+import itertools
+import threading
+
+from controller.repositorio import (Repositorio, ErrorRepositorio, UsuarioDuplicado, COLUMNAS_HIPOTECAS, DATOS_CALCULO,
+                                    fecha, rango_edad)
+
+
+class RepositorioMemoria(Repositorio):
+    def __init__(self):
+        """
+        Repositorio en diccionarios de Python, sin persistencia; los datos se pierden al terminar el proceso.
+        """
+        self._usuarios = {}
+        self._hipotecas = {}
+        self._ids_usuarios = itertools.count(1)
+        self._ids_hipotecas = itertools.count(1)
+        self._candado = threading.RLock()
+
+    def _buscar_usuario(self, nombre: str, edad: int) -> int | None:
+        return next((usuario_id for usuario_id, usuario in self._usuarios.items() if usuario == (nombre, edad)),
+                    None)
+
+    def _insertar_hipoteca(self, usuario_id, monto_total, fecha_inicio, cuota_mensual, datos_calculo) -> int:
+        hipoteca_id = next(self._ids_hipotecas)
+        self._hipotecas[hipoteca_id] = {"id": hipoteca_id, "usuario_id": usuario_id, "monto_total": monto_total,
+                                        "fecha_inicio": fecha(fecha_inicio), "cuota_mensual": cuota_mensual,
+                                        "edad": self._usuarios[usuario_id][1], **dict(zip(DATOS_CALCULO, datos_calculo))}
+        return hipoteca_id
+
+    @staticmethod
+    def _publica(hipoteca: dict) -> dict:
+        return {clave: hipoteca[clave] for clave in ("id", "monto_total", "fecha_inicio", "cuota_mensual")}
+
+    def insertar_usuario(self, nombre: str, edad: int) -> int:
+        with self._candado:
+            if self._buscar_usuario(nombre, edad) is not None:
+                raise UsuarioDuplicado(f"Ya existe el usuario ({nombre}, {edad})")
+            usuario_id = next(self._ids_usuarios)
+            self._usuarios[usuario_id] = (nombre, edad)
+            return usuario_id
+
+    def insertar_usuarios(self, usuarios, actualizar: bool) -> list[tuple[int, str, int, bool]]:
+        filas = []
+        with self._candado:
+            for nombre, edad in usuarios:
+                usuario_id = self._buscar_usuario(nombre, edad)
+                if usuario_id is None:
+                    usuario_id = next(self._ids_usuarios)
+                    self._usuarios[usuario_id] = (nombre, edad)
+                    filas.append((usuario_id, nombre, edad, True))
+                elif actualizar:
+                    filas.append((usuario_id, nombre, edad, False))
+        return filas
+
+    def listar_usuarios(self) -> list[tuple]:
+        with self._candado:
+            return [(usuario_id, *usuario) for usuario_id, usuario in self._usuarios.items()]
+
+    def obtener_usuario(self, usuario_id: int) -> tuple | None:
+        with self._candado:
+            usuario = self._usuarios.get(usuario_id)
+        return (usuario_id, *usuario) if usuario else None
+
+    def usuarios_desde(self, ultimo_id: int, limite: int) -> list[tuple]:
+        with self._candado:
+            ids = sorted(usuario_id for usuario_id in self._usuarios if usuario_id > ultimo_id)[:limite]
+            return [(usuario_id, *self._usuarios[usuario_id]) for usuario_id in ids]
+
+    def iterar_usuarios(self, tamano_lote: int):
+        ultimo_id = 0
+        while True:
+            lote = self.usuarios_desde(ultimo_id, tamano_lote)
+            yield from lote
+            if len(lote) < tamano_lote:
+                return
+            ultimo_id = lote[-1][0]
+
+    def usuarios_con_hipotecas(self, edad_minima, edad_maxima, fecha_desde, fecha_hasta,
+                               solo_con_hipotecas: bool) -> list[dict]:
+        fecha_desde, fecha_hasta = fecha(fecha_desde), fecha(fecha_hasta)
+        with self._candado:
+            por_usuario = {}
+            for hipoteca in sorted(self._hipotecas.values(), key=lambda hipoteca: hipoteca["id"]):
+                if ((fecha_desde is None or hipoteca["fecha_inicio"] >= fecha_desde)
+                        and (fecha_hasta is None or hipoteca["fecha_inicio"] <= fecha_hasta)):
+                    por_usuario.setdefault(hipoteca["usuario_id"], []).append(self._publica(hipoteca))
+
+            filas = []
+            for usuario_id, (nombre, edad) in sorted(self._usuarios.items()):
+                if (edad_minima is not None and edad < edad_minima) or (edad_maxima is not None and edad > edad_maxima):
+                    continue
+                usuario = {"usuario_id": usuario_id, "name": nombre, "age": edad}
+                hipotecas = por_usuario.get(usuario_id, [])
+                if not hipotecas and not solo_con_hipotecas:
+                    filas.append({**usuario, "id": None, "monto_total": None, "fecha_inicio": None,
+                                  "cuota_mensual": None})
+                filas.extend({**usuario, **hipoteca} for hipoteca in hipotecas)
+            return filas
+
+    def eliminar_usuario(self, usuario_id: int) -> bool:
+        with self._candado:
+            if self._usuarios.pop(usuario_id, None) is None:
+                return False
+            for hipoteca_id in [hipoteca["id"] for hipoteca in self._hipotecas.values()
+                                if hipoteca["usuario_id"] == usuario_id]:
+                del self._hipotecas[hipoteca_id]
+            return True
+
+    def modificar_usuario(self, usuario_id: int, nombre: str, edad: int, recalcular) -> bool:
+        with self._candado:
+            if usuario_id not in self._usuarios:
+                return False
+            if self._buscar_usuario(nombre, edad) not in (None, usuario_id):
+                raise UsuarioDuplicado(f"Ya existe el usuario ({nombre}, {edad})")
+            afectadas = []
+            if self._usuarios[usuario_id][1] != edad:
+                afectadas = [{clave: hipoteca[clave] for clave in ("id", "monto_total", *DATOS_CALCULO)}
+                             for hipoteca in self._hipotecas.values()
+                             if hipoteca["usuario_id"] == usuario_id and hipoteca["tipo_hipoteca"] is not None]
+            # Se calcula todo antes de modificar, así un error no deja los cambios a medias
+            cuotas = recalcular(edad, afectadas) if afectadas else []
+            self._usuarios[usuario_id] = (nombre, edad)
+            for hipoteca_id, cuota_mensual in cuotas:
+                self._hipotecas[hipoteca_id].update(cuota_mensual=cuota_mensual, edad=edad)
+            return True
+
+    def insertar_hipoteca(self, usuario_id: int, monto_total: float, fecha_inicio, cuota_mensual: float,
+                          datos_calculo: tuple) -> bool:
+        with self._candado:
+            if usuario_id not in self._usuarios:
+                return False
+            self._insertar_hipoteca(usuario_id, monto_total, fecha_inicio, cuota_mensual, datos_calculo)
+            return True
+
+    def insertar_hipotecas(self, hipotecas) -> list[tuple[int, int | None]]:
+        filas = []
+        with self._candado:
+            for fila, usuario_id, monto_total, fecha_inicio, cuota_mensual, *datos_calculo in hipotecas:
+                if usuario_id not in self._usuarios:
+                    filas.append((fila, None))
+                else:
+                    filas.append((fila, self._insertar_hipoteca(usuario_id, monto_total, fecha_inicio,
+                                                                cuota_mensual, datos_calculo)))
+        return filas
+
+    def hipotecas_de_usuario(self, usuario_id: int) -> list[dict]:
+        with self._candado:
+            return [self._publica(hipoteca) for hipoteca in self._hipotecas.values()
+                    if hipoteca["usuario_id"] == usuario_id]
+
+    def hipotecas_de_usuarios(self, usuario_ids, fecha_desde, fecha_hasta) -> list[dict]:
+        usuario_ids = set(usuario_ids)
+        fecha_desde, fecha_hasta = fecha(fecha_desde), fecha(fecha_hasta)
+        with self._candado:
+            return [{"usuario_id": hipoteca["usuario_id"], **self._publica(hipoteca)}
+                    for hipoteca in sorted(self._hipotecas.values(),
+                                           key=lambda hipoteca: (hipoteca["usuario_id"], hipoteca["id"]))
+                    if hipoteca["usuario_id"] in usuario_ids
+                    and (fecha_desde is None or hipoteca["fecha_inicio"] >= fecha_desde)
+                    and (fecha_hasta is None or hipoteca["fecha_inicio"] <= fecha_hasta)]
+
+    def iterar_hipotecas(self, tamano_lote: int):
+        ultimo_id = 0
+        while True:
+            with self._candado:
+                ids = sorted(hipoteca_id for hipoteca_id in self._hipotecas if hipoteca_id > ultimo_id)[:tamano_lote]
+                lote = [tuple(self._hipotecas[hipoteca_id][columna] for columna in COLUMNAS_HIPOTECAS)
+                        for hipoteca_id in ids]
+            yield from lote
+            if len(lote) < tamano_lote:
+                return
+            ultimo_id = lote[-1][0]
+
+    def modificar_hipoteca(self, hipoteca_id: int, cuota_mensual: float) -> bool:
+        with self._candado:
+            if hipoteca_id not in self._hipotecas:
+                return False
+            self._hipotecas[hipoteca_id]["cuota_mensual"] = cuota_mensual
+            return True
+
+    def resumen_cartera(self, agrupar_por, fecha_desde, fecha_hasta) -> list[dict]:
+        fecha_desde, fecha_hasta = fecha(fecha_desde), fecha(fecha_hasta)
+        grupos = {}
+        with self._candado:
+            for hipoteca in self._hipotecas.values():
+                valores = {"mes": hipoteca["fecha_inicio"].replace(day=1), "rango_edad": rango_edad(hipoteca["edad"])}
+                if ((fecha_desde is not None and valores["mes"] < fecha_desde.replace(day=1))
+                        or (fecha_hasta is not None and valores["mes"] > fecha_hasta)):
+                    continue
+                grupo = grupos.setdefault(tuple(valores[columna] for columna in agrupar_por), [0, 0.0, 0.0])
+                grupo[0] += 1
+                grupo[1] += hipoteca["cuota_mensual"]
+                grupo[2] += hipoteca["monto_total"]
+        return [{**dict(zip(agrupar_por, clave)), "cantidad": cantidad, "cuota_total": cuota_total,
+                 "monto_promedio": monto_total / cantidad}
+                for clave, (cantidad, cuota_total, monto_total) in sorted(grupos.items())]
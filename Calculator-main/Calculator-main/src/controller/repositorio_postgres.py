@@ -0,0 +1,403 @@
+import functools
+import re
+import threading
+import weakref
+
+import psycopg2
+from psycopg2 import errors, extensions
+from psycopg2.extras import RealDictCursor
+
+from controller.pool_conexiones import PoolConexiones, obtener_pool
+from controller.cache_usuarios import obtener_cache_usuarios
+from controller.repositorio import (Repositorio, ErrorRepositorio, UsuarioDuplicado, AGRUPACIONES_RESUMEN,
+                                    COLUMNAS_HIPOTECAS, fecha)
+
+# Todo el SQL de PostgreSQL está en este módulo, con parámetros $1, $2... como los de PREPARE: lo ejecutan tanto
+# RepositorioPostgres (psycopg2) como los controladores asíncronos de app_controller_async.py (asyncpg)
+
+# Consultas frecuentes que se preparan una vez por conexión (PREPARE) y después se ejecutan por nombre (EXECUTE),
+# así el servidor no vuelve a analizarlas y planificarlas en cada llamada: nombre -> (tipos de parámetros, consulta)
+CONSULTAS_PREPARADAS = {
+    "insertar_usuario": ("varchar, int", "INSERT INTO usuarios (name, age) VALUES ($1, $2) RETURNING id"),
+    "obtener_usuarios": ("", "SELECT id, name, age FROM usuarios ORDER BY id"),
+    "obtener_usuario": ("int", "SELECT id, name, age FROM usuarios WHERE id = $1"),
+    "obtener_usuarios_pagina": ("int, int", "SELECT id, name, age FROM usuarios WHERE id > $1 ORDER BY id LIMIT $2"),
+    "eliminar_usuario": ("int", """WITH hipotecas_eliminadas AS (
+                                       DELETE FROM hipotecas WHERE usuario_id = $1
+                                   )
+                                   DELETE FROM usuarios WHERE id = $1"""),
+    # Devuelve una fila por cada hipoteca que hay que recalcular porque cambió la edad (una sola fila con id NULL si
+    # no hay ninguna) y ninguna fila si el usuario no existe
+    "modificar_usuario": ("varchar, int, int", """WITH anterior AS (
+                                                      SELECT age FROM usuarios WHERE id = $3
+                                                  ),
+                                                  modificado AS (
+                                                      UPDATE usuarios SET name = $1, age = $2 WHERE id = $3
+                                                      RETURNING id, age
+                                                  )
+                                                  SELECT h.id, h.monto_total, h.esperanza_vida, h.sexo, h.periodo_pago,
+                                                         h.porcentaje_propiedad, h.tipo_hipoteca
+                                                  FROM modificado m CROSS JOIN anterior a
+                                                  LEFT JOIN hipotecas h ON h.usuario_id = m.id AND a.age <> m.age
+                                                                           AND h.tipo_hipoteca IS NOT NULL"""),
+    # Si el usuario no existe el SELECT no devuelve filas y no se inserta nada
+    "insertar_hipoteca": ("float8, date, float8, int, float8, char, int, float8, int",
+                          """INSERT INTO hipotecas (usuario_id, monto_total, fecha_inicio, cuota_mensual,
+                                                    esperanza_vida, sexo, periodo_pago, porcentaje_propiedad,
+                                                    tipo_hipoteca)
+                             SELECT id, $1, $2, $3, $5, $6, $7, $8, $9 FROM usuarios WHERE id = $4"""),
+    "obtener_hipotecas": ("int", """SELECT id, monto_total, fecha_inicio, cuota_mensual
+                                   FROM hipotecas
+                                   WHERE usuario_id = $1"""),
+    "modificar_hipoteca": ("float8, int", "UPDATE hipotecas SET cuota_mensual = $1 WHERE id = $2"),
+}
+
+INSERTAR_USUARIOS = {
+    # actualizar -> consulta; devuelve (id, name, age, insertado) de cada usuario creado o existente
+    False: """INSERT INTO usuarios (name, age) SELECT * FROM unnest($1::varchar[], $2::int[])
+              ON CONFLICT (name, age) DO NOTHING
+              RETURNING id, name, age, TRUE""",
+    True: """INSERT INTO usuarios (name, age) SELECT * FROM unnest($1::varchar[], $2::int[])
+             ON CONFLICT (name, age) DO UPDATE SET name = EXCLUDED.name
+             RETURNING id, name, age, xmax = 0""",
+}
+
+# Los id se reservan antes de insertar para poder relacionar cada fila con la hipoteca creada; devuelve (fila, id)
+# de cada fila, con id NULL si el usuario no existe
+INSERTAR_HIPOTECAS = """WITH datos AS (
+                            SELECT * FROM unnest($1::int[], $2::int[], $3::float8[], $4::date[], $5::float8[],
+                                                 $6::float8[], $7::char[], $8::int[], $9::float8[], $10::int[])
+                                AS d(fila, usuario_id, monto_total, fecha_inicio, cuota_mensual, esperanza_vida,
+                                     sexo, periodo_pago, porcentaje_propiedad, tipo_hipoteca)
+                        ),
+                        candidatas AS (
+                            SELECT d.*, nextval(pg_get_serial_sequence('hipotecas', 'id')) AS id
+                            FROM datos d JOIN usuarios u ON u.id = d.usuario_id
+                        ),
+                        insertadas AS (
+                            INSERT INTO hipotecas (id, usuario_id, monto_total, fecha_inicio, cuota_mensual,
+                                                   esperanza_vida, sexo, periodo_pago, porcentaje_propiedad,
+                                                   tipo_hipoteca)
+                            SELECT id, usuario_id, monto_total, fecha_inicio, cuota_mensual, esperanza_vida, sexo,
+                                   periodo_pago, porcentaje_propiedad, tipo_hipoteca
+                            FROM candidatas
+                            RETURNING id
+                        )
+                        SELECT d.fila, i.id
+                        FROM datos d
+                        LEFT JOIN candidatas c ON c.fila = d.fila
+                        LEFT JOIN insertadas i ON i.id = c.id"""
+
+# Guarda las cuotas recalculadas por modificar_usuario: $1 los id, $2 las cuotas y $3 la nueva edad
+RECALCULAR_CUOTAS = """UPDATE hipotecas SET cuota_mensual = v.cuota_mensual, edad = $3
+                       FROM unnest($1::int[], $2::float8[]) AS v(id, cuota_mensual)
+                       WHERE hipotecas.id = v.id"""
+
+ITERAR_USUARIOS = "SELECT id, name, age FROM usuarios ORDER BY id"
+ITERAR_HIPOTECAS = f"SELECT {', '.join(COLUMNAS_HIPOTECAS)} FROM hipotecas ORDER BY id"
+
+# Se ejecutan en orden y en una transacción; el LOCK bloquea las escrituras en hipotecas mientras se reconstruye, para
+# no perder cambios
+RECONSTRUIR_RESUMEN = (
+    "LOCK TABLE hipotecas IN SHARE MODE",
+    "DELETE FROM resumen_hipotecas",
+    """INSERT INTO resumen_hipotecas (mes, rango_edad, cantidad, cuota_total, monto_total)
+       SELECT date_trunc('month', fecha_inicio)::date, COALESCE(rango_edad(edad), -1), count(*), sum(cuota_mensual),
+              sum(monto_total)
+       FROM hipotecas
+       GROUP BY 1, 2""",
+)
+
+
+def _filtros(condiciones, inicio: int = 1) -> tuple[str, list]:
+    """
+    Une con AND las condiciones (fragmento SQL con un $, valor) cuyo valor no es None, numerando los parámetros
+    desde inicio.
+    """
+    fragmentos, valores = [], []
+    for condicion, valor in condiciones:
+        if valor is not None:
+            valores.append(valor)
+            fragmentos.append(condicion.replace("$", f"${inicio + len(valores) - 1}"))
+    return " AND ".join(fragmentos) or "TRUE", valores
+
+
+def consulta_usuarios_con_hipotecas(edad_minima, edad_maxima, fecha_desde, fecha_hasta,
+                                    solo_con_hipotecas: bool) -> tuple[str, list]:
+    """
+    Consulta y parámetros de los usuarios con sus hipotecas en un solo LEFT JOIN (ver
+    Repositorio.usuarios_con_hipotecas); los filtros en None no se incluyen.
+    """
+    filtros_hipotecas, valores_hipotecas = _filtros([("h.fecha_inicio >= $", fecha(fecha_desde)),
+                                                     ("h.fecha_inicio <= $", fecha(fecha_hasta))])
+    filtros_usuarios, valores_usuarios = _filtros([("u.age >= $", edad_minima), ("u.age <= $", edad_maxima)],
+                                                  len(valores_hipotecas) + 1)
+    consulta = f"""SELECT u.id AS usuario_id, u.name, u.age,
+                          h.id, h.monto_total, h.fecha_inicio, h.cuota_mensual
+                   FROM usuarios u {"JOIN" if solo_con_hipotecas else "LEFT JOIN"} hipotecas h
+                       ON h.usuario_id = u.id AND {filtros_hipotecas}
+                   WHERE {filtros_usuarios}
+                   ORDER BY u.id, h.id"""
+    return consulta, valores_hipotecas + valores_usuarios
+
+
+def consulta_hipotecas_de_usuarios(usuario_ids, fecha_desde, fecha_hasta) -> tuple[str, list]:
+    """
+    Consulta y parámetros de las hipotecas de varios usuarios (usuario_id = ANY(...)) ordenadas por usuario e ID.
+    """
+    filtros, valores = _filtros([("fecha_inicio >= $", fecha(fecha_desde)),
+                                 ("fecha_inicio <= $", fecha(fecha_hasta))], 2)
+    consulta = f"""SELECT usuario_id, id, monto_total, fecha_inicio, cuota_mensual
+                   FROM hipotecas
+                   WHERE usuario_id = ANY($1::int[]) AND {filtros}
+                   ORDER BY usuario_id, id"""
+    return consulta, [list(usuario_ids)] + valores
+
+
+def consulta_resumen_cartera(agrupar_por, fecha_desde, fecha_hasta) -> tuple[str, list]:
+    """
+    Consulta y parámetros de los totales de la cartera agrupados por las columnas de AGRUPACIONES_RESUMEN pedidas. Se
+    leen de resumen_hipotecas, que los disparadores de la migración 0004 mantienen al día con cada inserción,
+    modificación o eliminación de hipotecas, así nunca se recorre la tabla hipotecas.
+    """
+    if not agrupar_por or any(columna not in AGRUPACIONES_RESUMEN for columna in agrupar_por):
+        raise ValueError(f"Agrupación no válida: {agrupar_por}.")
+    filtros, valores = _filtros([("mes >= date_trunc('month', $::date)", fecha(fecha_desde)),
+                                 ("mes <= $", fecha(fecha_hasta))])
+    columnas = ", ".join(agrupar_por)
+    consulta = f"""SELECT {columnas}, sum(cantidad)::int AS cantidad, sum(cuota_total) AS cuota_total,
+                          sum(monto_total) / sum(cantidad) AS monto_promedio
+                   FROM resumen_hipotecas
+                   WHERE cantidad > 0 AND {filtros}
+                   GROUP BY {columnas}
+                   ORDER BY {columnas}"""
+    return consulta, valores
+
+
+def columnas_hipotecas(hipotecas) -> tuple[list, ...]:
+    """
+    Convierte las filas de Repositorio.insertar_hipotecas en las diez listas de parámetros de INSERTAR_HIPOTECAS.
+    """
+    columnas = tuple([] for _ in range(10))
+    for hipoteca in hipotecas:
+        for columna, valor in zip(columnas, hipoteca):
+            columna.append(valor)
+    columnas[3][:] = [fecha(valor) for valor in columnas[3]]
+    return columnas
+
+
+@functools.lru_cache(maxsize=256)
+def _marcadores_psycopg(consulta: str) -> str:
+    # psycopg2 no entiende $n: cada uno pasa a ser el parámetro con nombre "n"
+    return re.sub(r"\$(\d+)", r"%(\1)s", consulta.replace("%", "%%"))
+
+
+# Consultas ya preparadas en cada conexión; al descartarse una conexión su entrada desaparece sola
+_preparadas = weakref.WeakKeyDictionary()
+_candado_preparadas = threading.Lock()
+
+
+class RepositorioPostgres(Repositorio):
+    def __init__(self, pool: PoolConexiones | None = None):
+        """
+        Repositorio sobre la base de datos PostgreSQL de secret_config, con el esquema de sql/migraciones.
+
+        Args:
+            pool (PoolConexiones | None): Pool de conexiones a usar, por defecto el compartido del proceso.
+        """
+        self.pool = pool or obtener_pool()
+        self.viajes_red = 0
+        self.preparaciones = 0
+        self._candado_viajes = threading.Lock()
+        self._viajes_hilo = threading.local()
+
+    def _ejecutar(self, cursor, consulta, parametros=None):
+        """
+        Ejecuta una consulta contando el viaje de ida y vuelta a la base de datos.
+        """
+        with self._candado_viajes:
+            self.viajes_red += 1
+        self._viajes_hilo.cantidad = self.viajes_hilo() + 1
+        cursor.execute(consulta, parametros)
+
+    def _ejecutar_preparada(self, cursor, nombre: str, parametros=()):
+        """
+        Ejecuta una de las CONSULTAS_PREPARADAS por nombre. La primera vez en cada conexión se envía el PREPARE junto
+        con el EXECUTE, en el mismo viaje a la base de datos.
+        """
+        conexion = cursor.connection
+        with _candado_preparadas:
+            preparadas = _preparadas.setdefault(conexion, set())
+        ejecutar = f"EXECUTE {nombre}" + (f" ({', '.join(['%s'] * len(parametros))})" if parametros else "")
+
+        if nombre in preparadas:
+            try:
+                self._ejecutar(cursor, ejecutar, parametros)
+                return
+            except errors.InvalidSqlStatementName:
+                # Alguien descartó las consultas preparadas de la conexión (DEALLOCATE o DISCARD)
+                preparadas.discard(nombre)
+                if conexion.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    raise
+
+        tipos, consulta = CONSULTAS_PREPARADAS[nombre]
+        # El PREPARE queda hecho aunque falle el EXECUTE que lo acompaña
+        preparadas.add(nombre)
+        with self._candado_viajes:
+            self.preparaciones += 1
+        try:
+            self._ejecutar(cursor, f"PREPARE {nombre}{f' ({tipos})' if tipos else ''} AS {consulta}; {ejecutar}",
+                           parametros)
+        except errors.DuplicatePreparedStatement:
+            if conexion.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                raise
+            self._ejecutar(cursor, ejecutar, parametros)
+
+    def _ejecutar_sql(self, cursor, consulta: str, parametros=()):
+        """
+        Ejecuta una de las consultas de este módulo, con parámetros $n, sin prepararla.
+        """
+        self._ejecutar(cursor, _marcadores_psycopg(consulta),
+                       {str(numero): valor for numero, valor in enumerate(parametros, 1)})
+
+    def viajes_hilo(self) -> int:
+        return getattr(self._viajes_hilo, "cantidad", 0)
+
+    def _leer_filas(self, nombre: str, parametros=()) -> list[tuple]:
+        with self.pool.conexion() as conexion, conexion.cursor() as cursor:
+            self._ejecutar_preparada(cursor, nombre, parametros)
+            return cursor.fetchall()
+
+    def _modificar(self, nombre: str, parametros) -> bool:
+        with self.pool.conexion() as conexion, conexion.cursor() as cursor:
+            try:
+                self._ejecutar_preparada(cursor, nombre, parametros)
+            except psycopg2.Error as e:
+                raise ErrorRepositorio(str(e))
+            return cursor.rowcount > 0
+
+    def insertar_usuario(self, nombre: str, edad: int) -> int:
+        with self.pool.conexion() as conexion, conexion.cursor() as cursor:
+            try:
+                self._ejecutar_preparada(cursor, "insertar_usuario", (nombre, edad))
+            except psycopg2.errors.UniqueViolation as e:
+                raise UsuarioDuplicado(str(e))
+            except psycopg2.IntegrityError as e:
+                raise ErrorRepositorio(str(e))
+            return cursor.fetchone()[0]
+
+    def insertar_usuarios(self, usuarios, actualizar: bool) -> list[tuple[int, str, int, bool]]:
+        with self.pool.conexion() as conexion, conexion.cursor() as cursor:
+            try:
+                self._ejecutar_sql(cursor, INSERTAR_USUARIOS[actualizar],
+                                   ([nombre for nombre, _ in usuarios], [edad for _, edad in usuarios]))
+            except psycopg2.Error as e:
+                raise ErrorRepositorio(str(e))
+            return cursor.fetchall()
+
+    def listar_usuarios(self) -> list[tuple]:
+        return self._leer_filas("obtener_usuarios")
+
+    def obtener_usuario(self, usuario_id: int) -> tuple | None:
+        filas = self._leer_filas("obtener_usuario", (usuario_id,))
+        return filas[0] if filas else None
+
+    def usuarios_desde(self, ultimo_id: int, limite: int) -> list[tuple]:
+        return self._leer_filas("obtener_usuarios_pagina", (ultimo_id, limite))
+
+    def _iterar(self, nombre: str, consulta, tamano_lote: int):
+        with self.pool.conexion() as conexion:
+            # Los cursores con nombre solo existen dentro de una transacción
+            conexion.autocommit = False
+            try:
+                with conexion.cursor(name=nombre) as cursor:
+                    cursor.itersize = tamano_lote
+                    self._ejecutar_sql(cursor, consulta)
+                    yield from cursor
+            finally:
+                conexion.rollback()
+                conexion.autocommit = True
+
+    def iterar_usuarios(self, tamano_lote: int):
+        return self._iterar("iterar_usuarios", ITERAR_USUARIOS, tamano_lote)
+
+    def usuarios_con_hipotecas(self, edad_minima, edad_maxima, fecha_desde, fecha_hasta,
+                               solo_con_hipotecas: bool) -> list[dict]:
+        consulta, parametros = consulta_usuarios_con_hipotecas(edad_minima, edad_maxima, fecha_desde, fecha_hasta,
+                                                               solo_con_hipotecas)
+        with self.pool.conexion() as conexion, conexion.cursor(cursor_factory=RealDictCursor) as cursor:
+            self._ejecutar_sql(cursor, consulta, parametros)
+            return cursor.fetchall()
+
+    def eliminar_usuario(self, usuario_id: int) -> bool:
+        return self._modificar("eliminar_usuario", (usuario_id,))
+
+    def modificar_usuario(self, usuario_id: int, nombre: str, edad: int, recalcular) -> bool:
+        with self.pool.conexion() as conexion, conexion, conexion.cursor(cursor_factory=RealDictCursor) as cursor:
+            try:
+                self._ejecutar_preparada(cursor, "modificar_usuario", (nombre, edad, usuario_id))
+                filas = cursor.fetchall()
+                afectadas = [fila for fila in filas if fila["id"] is not None]
+                cuotas = recalcular(edad, afectadas) if afectadas else []
+                if cuotas:
+                    ids, nuevas = zip(*cuotas)
+                    self._ejecutar_sql(cursor, RECALCULAR_CUOTAS, (list(ids), list(nuevas), edad))
+            except psycopg2.Error as e:
+                raise ErrorRepositorio(str(e))
+            return bool(filas)
+
+    def insertar_hipoteca(self, usuario_id: int, monto_total: float, fecha_inicio, cuota_mensual: float,
+                          datos_calculo: tuple) -> bool:
+        with self.pool.conexion() as conexion, conexion.cursor() as cursor:
+            try:
+                self._ejecutar_preparada(cursor, "insertar_hipoteca",
+                                         (monto_total, fecha_inicio, cuota_mensual, usuario_id, *datos_calculo))
+            except psycopg2.errors.ForeignKeyViolation:
+                return False
+            except psycopg2.IntegrityError as e:
+                raise ErrorRepositorio(str(e))
+            return cursor.rowcount > 0
+
+    def insertar_hipotecas(self, hipotecas) -> list[tuple[int, int | None]]:
+        with self.pool.conexion() as conexion, conexion.cursor() as cursor:
+            try:
+                self._ejecutar_sql(cursor, INSERTAR_HIPOTECAS, columnas_hipotecas(hipotecas))
+            except (psycopg2.Error, ValueError) as e:
+                raise ErrorRepositorio(str(e))
+            return cursor.fetchall()
+
+    def hipotecas_de_usuario(self, usuario_id: int) -> list[dict]:
+        with self.pool.conexion() as conexion, conexion.cursor(cursor_factory=RealDictCursor) as cursor:
+            self._ejecutar_preparada(cursor, "obtener_hipotecas", (usuario_id,))
+            return cursor.fetchall()
+
+    def hipotecas_de_usuarios(self, usuario_ids, fecha_desde, fecha_hasta) -> list[dict]:
+        consulta, parametros = consulta_hipotecas_de_usuarios(usuario_ids, fecha_desde, fecha_hasta)
+        with self.pool.conexion() as conexion, conexion.cursor(cursor_factory=RealDictCursor) as cursor:
+            self._ejecutar_sql(cursor, consulta, parametros)
+            return cursor.fetchall()
+
+    def iterar_hipotecas(self, tamano_lote: int):
+        return self._iterar("iterar_hipotecas", ITERAR_HIPOTECAS, tamano_lote)
+
+    def modificar_hipoteca(self, hipoteca_id: int, cuota_mensual: float) -> bool:
+        return self._modificar("modificar_hipoteca", (cuota_mensual, hipoteca_id))
+
+    def resumen_cartera(self, agrupar_por, fecha_desde, fecha_hasta) -> list[dict]:
+        consulta, parametros = consulta_resumen_cartera(agrupar_por, fecha_desde, fecha_hasta)
+        with self.pool.conexion() as conexion, conexion.cursor(cursor_factory=RealDictCursor) as cursor:
+            self._ejecutar_sql(cursor, consulta, parametros)
+            return cursor.fetchall()
+
+    def reconstruir_resumen(self) -> None:
+        with self.pool.conexion() as conexion, conexion:
+            with conexion.cursor() as cursor:
+                for consulta in RECONSTRUIR_RESUMEN:
+                    self._ejecutar_sql(cursor, consulta)
+
+    def cache_usuarios(self):
+        # Los cambios de otros procesos llegan a la caché por LISTEN/NOTIFY
+        return obtener_cache_usuarios()
+
+    def cerrar(self) -> None:
+        self.pool.cerrar()
@@ -0,0 +1,272 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from controller.repositorio import (Repositorio, ErrorRepositorio, UsuarioDuplicado, COLUMNAS_HIPOTECAS, DATOS_CALCULO,
+                                    secret_config, fecha)
+
+RUTA = getattr(secret_config, "SQLITE_RUTA", "hipotecas.db")
+
+# Versiones del esquema local, aplicadas en orden según PRAGMA user_version
+ESQUEMA = [
+    """CREATE TABLE IF NOT EXISTS usuarios (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           name VARCHAR(100) NOT NULL,
+           age INTEGER NOT NULL,
+           UNIQUE (name, age)
+       );
+       CREATE TABLE IF NOT EXISTS hipotecas (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           usuario_id INTEGER NOT NULL REFERENCES usuarios (id) ON DELETE CASCADE,
+           monto_total FLOAT NOT NULL,
+           fecha_inicio DATE NOT NULL,
+           cuota_mensual FLOAT NOT NULL,
+           edad INTEGER
+       );
+       CREATE INDEX IF NOT EXISTS hipotecas_usuario_id_idx ON hipotecas (usuario_id);""",
+    # Datos de entrada de Calculator de cada hipoteca, como en la migración 0005 de PostgreSQL
+    """ALTER TABLE hipotecas ADD COLUMN esperanza_vida FLOAT;
+       ALTER TABLE hipotecas ADD COLUMN sexo CHAR(1);
+       ALTER TABLE hipotecas ADD COLUMN periodo_pago INTEGER;
+       ALTER TABLE hipotecas ADD COLUMN porcentaje_propiedad FLOAT;
+       ALTER TABLE hipotecas ADD COLUMN tipo_hipoteca INTEGER;""",
+]
+
+
+def _hipoteca(fila) -> dict:
+    hipoteca = dict(fila)
+    hipoteca["fecha_inicio"] = fecha(hipoteca["fecha_inicio"])
+    return hipoteca
+
+
+def _fecha_texto(valor):
+    return valor.isoformat() if hasattr(valor, "isoformat") else valor
+
+
+def _filtros(condiciones) -> tuple[str, list]:
+    """
+    Une con AND las condiciones (fragmento SQL, valor) cuyo valor no es None y devuelve también sus valores.
+    """
+    activas = [(condicion, valor) for condicion, valor in condiciones if valor is not None]
+    return " AND ".join(condicion for condicion, _ in activas) or "1", [valor for _, valor in activas]
+
+
+class RepositorioSQLite(Repositorio):
+    def __init__(self, ruta: str = RUTA):
+        """
+        Repositorio en un archivo SQLite local, sin servidor; ":memory:" lo guarda solo en memoria.
+
+        Args:
+            ruta (str): Archivo de la base de datos, por defecto secret_config.SQLITE_RUTA o "hipotecas.db".
+        """
+        self.ruta = ruta
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conexion.row_factory = sqlite3.Row
+        self._conexion.execute("PRAGMA foreign_keys = ON")
+        self._candado = threading.RLock()
+        self._migrar()
+
+    def _migrar(self):
+        with self._transaccion() as conexion:
+            version = conexion.execute("PRAGMA user_version").fetchone()[0]
+            for numero, script in enumerate(ESQUEMA[version:], start=version + 1):
+                for sentencia in script.split(";"):
+                    if sentencia.strip():
+                        conexion.execute(sentencia)
+                conexion.execute(f"PRAGMA user_version = {numero}")
+
+    @contextmanager
+    def _transaccion(self):
+        with self._candado:
+            self._conexion.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conexion
+            except BaseException:
+                self._conexion.execute("ROLLBACK")
+                raise
+            self._conexion.execute("COMMIT")
+
+    def _leer(self, consulta, parametros=()) -> list:
+        with self._candado:
+            return self._conexion.execute(consulta, parametros).fetchall()
+
+    def _modificar(self, consulta, parametros) -> bool:
+        try:
+            with self._transaccion() as conexion:
+                return conexion.execute(consulta, parametros).rowcount > 0
+        except sqlite3.Error as e:
+            raise ErrorRepositorio(str(e))
+
+    def insertar_usuario(self, nombre: str, edad: int) -> int:
+        try:
+            with self._transaccion() as conexion:
+                return conexion.execute("INSERT INTO usuarios (name, age) VALUES (?, ?)", (nombre, edad)).lastrowid
+        except sqlite3.IntegrityError as e:
+            if "UNIQUE" in str(e):
+                raise UsuarioDuplicado(str(e))
+            raise ErrorRepositorio(str(e))
+
+    def insertar_usuarios(self, usuarios, actualizar: bool) -> list[tuple[int, str, int, bool]]:
+        filas = []
+        try:
+            with self._transaccion() as conexion:
+                for nombre, edad in usuarios:
+                    cursor = conexion.execute("INSERT OR IGNORE INTO usuarios (name, age) VALUES (?, ?)",
+                                              (nombre, edad))
+                    if cursor.rowcount:
+                        filas.append((cursor.lastrowid, nombre, edad, True))
+                    elif actualizar:
+                        existente = conexion.execute("SELECT id FROM usuarios WHERE name = ? AND age = ?",
+                                                     (nombre, edad)).fetchone()
+                        filas.append((existente[0], nombre, edad, False))
+        except sqlite3.Error as e:
+            raise ErrorRepositorio(str(e))
+        return filas
+
+    def listar_usuarios(self) -> list[tuple]:
+        return [tuple(fila) for fila in self._leer("SELECT id, name, age FROM usuarios ORDER BY id")]
+
+    def obtener_usuario(self, usuario_id: int) -> tuple | None:
+        filas = self._leer("SELECT id, name, age FROM usuarios WHERE id = ?", (usuario_id,))
+        return tuple(filas[0]) if filas else None
+
+    def usuarios_desde(self, ultimo_id: int, limite: int) -> list[tuple]:
+        return [tuple(fila) for fila in
+                self._leer("SELECT id, name, age FROM usuarios WHERE id > ? ORDER BY id LIMIT ?", (ultimo_id, limite))]
+
+    def iterar_usuarios(self, tamano_lote: int):
+        # Se pagina por clave para no dejar la conexión compartida ocupada mientras se recorre
+        ultimo_id = 0
+        while True:
+            lote = self.usuarios_desde(ultimo_id, tamano_lote)
+            yield from lote
+            if len(lote) < tamano_lote:
+                return
+            ultimo_id = lote[-1][0]
+
+    def usuarios_con_hipotecas(self, edad_minima, edad_maxima, fecha_desde, fecha_hasta,
+                               solo_con_hipotecas: bool) -> list[dict]:
+        filtros_hipotecas, valores_hipotecas = _filtros([("h.fecha_inicio >= ?", _fecha_texto(fecha_desde)),
+                                                         ("h.fecha_inicio <= ?", _fecha_texto(fecha_hasta))])
+        filtros_usuarios, valores_usuarios = _filtros([("u.age >= ?", edad_minima), ("u.age <= ?", edad_maxima)])
+        union = "JOIN" if solo_con_hipotecas else "LEFT JOIN"
+        filas = self._leer(f"""SELECT u.id AS usuario_id, u.name, u.age,
+                                      h.id, h.monto_total, h.fecha_inicio, h.cuota_mensual
+                               FROM usuarios u {union} hipotecas h ON h.usuario_id = u.id AND {filtros_hipotecas}
+                               WHERE {filtros_usuarios}
+                               ORDER BY u.id, h.id""", valores_hipotecas + valores_usuarios)
+        return [_hipoteca(fila) for fila in filas]
+
+    def eliminar_usuario(self, usuario_id: int) -> bool:
+        return self._modificar("DELETE FROM usuarios WHERE id = ?", (usuario_id,))
+
+    def modificar_usuario(self, usuario_id: int, nombre: str, edad: int, recalcular) -> bool:
+        try:
+            with self._transaccion() as conexion:
+                anterior = conexion.execute("SELECT age FROM usuarios WHERE id = ?", (usuario_id,)).fetchone()
+                if anterior is None:
+                    return False
+                conexion.execute("UPDATE usuarios SET name = ?, age = ? WHERE id = ?", (nombre, edad, usuario_id))
+                if anterior[0] == edad:
+                    return True
+                afectadas = [dict(fila) for fila in conexion.execute(
+                    f"""SELECT id, monto_total, {', '.join(DATOS_CALCULO)}
+                        FROM hipotecas
+                        WHERE usuario_id = ? AND tipo_hipoteca IS NOT NULL""", (usuario_id,))]
+                if afectadas:
+                    conexion.executemany("UPDATE hipotecas SET cuota_mensual = ?, edad = ? WHERE id = ?",
+                                         [(cuota, edad, hipoteca_id)
+                                          for hipoteca_id, cuota in recalcular(edad, afectadas)])
+                return True
+        except sqlite3.Error as e:
+            raise ErrorRepositorio(str(e))
+
+    def insertar_hipoteca(self, usuario_id: int, monto_total: float, fecha_inicio, cuota_mensual: float,
+                          datos_calculo: tuple) -> bool:
+        try:
+            with self._transaccion() as conexion:
+                cursor = conexion.execute(f"""INSERT INTO hipotecas (usuario_id, monto_total, fecha_inicio,
+                                                                     cuota_mensual, edad, {', '.join(DATOS_CALCULO)})
+                                              SELECT id, ?, ?, ?, age, ?, ?, ?, ?, ? FROM usuarios WHERE id = ?""",
+                                          (monto_total, _fecha_texto(fecha_inicio), cuota_mensual, *datos_calculo,
+                                           usuario_id))
+                return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            raise ErrorRepositorio(str(e))
+
+    def insertar_hipotecas(self, hipotecas) -> list[tuple[int, int | None]]:
+        filas = []
+        try:
+            with self._transaccion() as conexion:
+                for fila, usuario_id, monto_total, fecha_inicio, cuota_mensual, *datos_calculo in hipotecas:
+                    usuario = conexion.execute("SELECT age FROM usuarios WHERE id = ?", (usuario_id,)).fetchone()
+                    if usuario is None:
+                        filas.append((fila, None))
+                        continue
+                    cursor = conexion.execute(f"""INSERT INTO hipotecas (usuario_id, monto_total,
+                                                      fecha_inicio, cuota_mensual, edad, {', '.join(DATOS_CALCULO)})
+                                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                                              (usuario_id, monto_total, _fecha_texto(fecha_inicio), cuota_mensual,
+                                               usuario[0], *datos_calculo))
+                    filas.append((fila, cursor.lastrowid))
+        except sqlite3.Error as e:
+            raise ErrorRepositorio(str(e))
+        return filas
+
+    def hipotecas_de_usuario(self, usuario_id: int) -> list[dict]:
+        return [_hipoteca(fila) for fila in
+                self._leer("""SELECT id, monto_total, fecha_inicio, cuota_mensual
+                              FROM hipotecas
+                              WHERE usuario_id = ?""", (usuario_id,))]
+
+    def hipotecas_de_usuarios(self, usuario_ids, fecha_desde, fecha_hasta) -> list[dict]:
+        usuario_ids = list(usuario_ids)
+        filtros, valores = _filtros([("fecha_inicio >= ?", _fecha_texto(fecha_desde)),
+                                     ("fecha_inicio <= ?", _fecha_texto(fecha_hasta))])
+        filas = self._leer(f"""SELECT usuario_id, id, monto_total, fecha_inicio, cuota_mensual
+                               FROM hipotecas
+                               WHERE usuario_id IN (SELECT value FROM json_each(?)) AND {filtros}
+                               ORDER BY usuario_id, id""", [str(usuario_ids)] + valores)
+        return [_hipoteca(fila) for fila in filas]
+
+    def iterar_hipotecas(self, tamano_lote: int):
+        # Paginada por clave, como iterar_usuarios
+        ultimo_id = 0
+        while True:
+            lote = self._leer(f"SELECT {', '.join(COLUMNAS_HIPOTECAS)} FROM hipotecas WHERE id > ? ORDER BY id LIMIT ?",
+                              (ultimo_id, tamano_lote))
+            for fila in lote:
+                fila = tuple(fila)
+                yield (*fila[:3], fecha(fila[3]), *fila[4:])
+            if len(lote) < tamano_lote:
+                return
+            ultimo_id = lote[-1][0]
+
+    def modificar_hipoteca(self, hipoteca_id: int, cuota_mensual: float) -> bool:
+        return self._modificar("UPDATE hipotecas SET cuota_mensual = ? WHERE id = ?", (cuota_mensual, hipoteca_id))
+
+    def resumen_cartera(self, agrupar_por, fecha_desde, fecha_hasta) -> list[dict]:
+        # Sin disparadores que mantengan un resumen, se agrupa al consultar; la cartera de un quiosco es pequeña
+        filtros, valores = _filtros([("fecha_inicio >= date(?, 'start of month')", _fecha_texto(fecha_desde)),
+                                     ("fecha_inicio < date(?, 'start of month', '+1 month')",
+                                      _fecha_texto(fecha_hasta))])
+        columnas = ", ".join(agrupar_por)
+        filas = self._leer(f"""SELECT date(fecha_inicio, 'start of month') AS mes,
+                                      COALESCE(edad / 10 * 10, -1) AS rango_edad,
+                                      count(*) AS cantidad, sum(cuota_mensual) AS cuota_total,
+                                      avg(monto_total) AS monto_promedio
+                               FROM hipotecas
+                               WHERE {filtros}
+                               GROUP BY {columnas}
+                               ORDER BY {columnas}""", valores)
+        resumen = []
+        for fila in filas:
+            grupo = {columna: fecha(fila[columna]) if columna == "mes" else fila[columna] for columna in agrupar_por}
+            grupo.update(cantidad=fila["cantidad"], cuota_total=fila["cuota_total"],
+                         monto_promedio=fila["monto_promedio"])
+            resumen.append(grupo)
+        return resumen
+
+    def cerrar(self) -> None:
+        with self._candado:
+            self._conexion.close()
@@ -0,0 +1,201 @@
+import sys
+sys.path.append("src")
+sys.path.append(".")
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from controller.app_controller import recalcular_cuotas
+from controller.pool_conexiones import conectar
+from controller.repositorio import COLUMNAS_HIPOTECAS
+
+TAMANO_LOTE = 5000
+# Reglas de tarifa que se pueden reemplazar para todas las hipotecas; los demás datos de cálculo son de cada hipoteca
+REGLAS = ("porcentaje_propiedad",)
+
+
+def calcular_fragmentos(cantidad: int) -> list[tuple[int, int]]:
+    """
+    Divide el rango de usuario_id de la tabla hipotecas en fragmentos contiguos.
+
+    Args:
+        cantidad (int): Número de fragmentos deseado.
+
+    Returns:
+        list[tuple[int, int]]: Los rangos (desde, hasta), ambos incluidos.
+    """
+    conexion = conectar()
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("SELECT MIN(usuario_id), MAX(usuario_id) FROM hipotecas")
+            minimo, maximo = cursor.fetchone()
+    finally:
+        conexion.close()
+
+    if minimo is None:
+        return []
+    tamano = max((maximo - minimo + 1) // cantidad, 1)
+    fragmentos = []
+    desde = minimo
+    while desde <= maximo:
+        hasta = maximo if len(fragmentos) == cantidad - 1 else min(desde + tamano - 1, maximo)
+        fragmentos.append((desde, hasta))
+        desde = hasta + 1
+    return fragmentos
+
+
+def revaluar_fragmento(fragmento: tuple[int, int], reglas: dict, tamano_lote: int = TAMANO_LOTE) -> dict:
+    """
+    Recalcula la cuota mensual de las hipotecas de un fragmento de usuarios con Calculator y la guarda con
+    actualizaciones masivas. Todo el fragmento se confirma en una sola transacción.
+
+    Cada hipoteca se recalcula con su edad y sus propios datos de cálculo (ver recalcular_cuotas); las reglas solo
+    reemplazan los valores de REGLAS que se indiquen, y el valor nuevo también se guarda en la hipoteca. Las
+    hipotecas sin datos de cálculo, creadas antes de que se guardaran, se omiten y conservan su cuota.
+
+    Args:
+        fragmento (tuple[int, int]): Rango de usuario_id (desde, hasta).
+        reglas (dict): Valores de REGLAS que reemplazan a los guardados en cada hipoteca.
+        tamano_lote (int): Cantidad de hipotecas que se leen y actualizan a la vez.
+
+    Returns:
+        dict: Reporte del fragmento con filas leídas, actualizadas, rechazadas, omitidas y segundos.
+    """
+    inicio = time.perf_counter()
+    filas = actualizadas = omitidas = 0
+    conexion = conectar()
+    try:
+        with conexion:
+            with conexion.cursor(name=f"revaluacion_{fragmento[0]}_{fragmento[1]}") as lectura, \
+                    conexion.cursor() as escritura:
+                lectura.itersize = tamano_lote
+                lectura.execute(sql.SQL("SELECT {} FROM hipotecas WHERE usuario_id BETWEEN %s AND %s").format(
+                    sql.SQL(", ").join(map(sql.Identifier, COLUMNAS_HIPOTECAS))), fragmento)
+                while True:
+                    lote = lectura.fetchmany(tamano_lote)
+                    if not lote:
+                        break
+                    hipotecas = [{**dict(zip(COLUMNAS_HIPOTECAS, fila)), **reglas} for fila in lote]
+                    con_datos = [hipoteca for hipoteca in hipotecas
+                                 if hipoteca["tipo_hipoteca"] is not None and hipoteca["edad"] is not None]
+                    cuotas = recalcular_cuotas([hipoteca["edad"] for hipoteca in con_datos],
+                                               con_datos) if con_datos else []
+                    porcentajes = {hipoteca["id"]: hipoteca["porcentaje_propiedad"] for hipoteca in con_datos}
+                    execute_values(escritura,
+                                   """UPDATE hipotecas
+                                      SET cuota_mensual = v.cuota_mensual, porcentaje_propiedad = v.porcentaje_propiedad
+                                      FROM (VALUES %s) AS v(id, cuota_mensual, porcentaje_propiedad)
+                                      WHERE hipotecas.id = v.id""",
+                                   [(hipoteca_id, cuota, porcentajes[hipoteca_id]) for hipoteca_id, cuota in cuotas],
+                                   template="(%s, %s::float8, %s::float8)", page_size=tamano_lote)
+                    filas += len(lote)
+                    actualizadas += len(cuotas)
+                    omitidas += len(hipotecas) - len(con_datos)
+    finally:
+        conexion.close()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "fragmento": list(fragmento),
+        "filas": filas,
+        "actualizadas": actualizadas,
+        "rechazadas": filas - actualizadas - omitidas,
+        "omitidas": omitidas,
+        "segundos": segundos,
+        "filas_por_segundo": filas / segundos if segundos else 0.0,
+    }
+
+
+def _leer_punto_control(ruta, reglas):
+    if not ruta or not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as archivo:
+        punto_control = json.load(archivo)
+    if punto_control["reglas"] != reglas:
+        raise ValueError(f"El punto de control '{ruta}' corresponde a otras reglas de revaluación.")
+    return punto_control
+
+
+def _guardar_punto_control(ruta, punto_control):
+    if not ruta:
+        return
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(punto_control, archivo)
+    os.replace(temporal, ruta)
+
+
+def revaluar_hipotecas(reglas: dict, procesos: int | None = None, fragmentos: int | None = None,
+                       punto_control: str | None = None, tamano_lote: int = TAMANO_LOTE, reportar=print) -> list[dict]:
+    """
+    Recalcula la cuota mensual de todas las hipotecas repartiendo los fragmentos de usuario_id entre varios procesos.
+
+    Cada fragmento terminado se anota en el archivo de punto de control, así una ejecución interrumpida se retoma
+    sin repetir los fragmentos ya confirmados.
+
+    Args:
+        reglas (dict): Valores de REGLAS que reemplazan a los guardados en cada hipoteca (ver revaluar_fragmento).
+        procesos (int | None): Cantidad de procesos, por defecto uno por núcleo.
+        fragmentos (int | None): Cantidad de fragmentos, por defecto cuatro por proceso.
+        punto_control (str | None): Ruta del archivo de punto de control.
+        tamano_lote (int): Cantidad de hipotecas que se leen y actualizan a la vez.
+        reportar (callable): Función que recibe cada línea del reporte por fragmento.
+
+    Returns:
+        list[dict]: El reporte de cada fragmento procesado en esta ejecución.
+    """
+    desconocidas = set(reglas) - set(REGLAS)
+    if desconocidas:
+        raise ValueError(f"Reglas de revaluación inválidas: {sorted(desconocidas)}, deben ser de {REGLAS}.")
+    procesos = procesos or os.cpu_count() or 1
+    estado = _leer_punto_control(punto_control, reglas)
+    if estado is None:
+        estado = {"reglas": reglas,
+                  "fragmentos": [list(f) for f in calcular_fragmentos(fragmentos or procesos * 4)],
+                  "completados": []}
+        _guardar_punto_control(punto_control, estado)
+
+    pendientes = [tuple(f) for f in estado["fragmentos"] if f not in estado["completados"]]
+    reportes = []
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        futuros = [ejecutor.submit(revaluar_fragmento, fragmento, reglas, tamano_lote) for fragmento in pendientes]
+        for futuro in as_completed(futuros):
+            reporte = futuro.result()
+            reportes.append(reporte)
+            estado["completados"].append(reporte["fragmento"])
+            _guardar_punto_control(punto_control, estado)
+            desde, hasta = reporte["fragmento"]
+            reportar(f"Usuarios {desde}-{hasta}: {reporte['actualizadas']} de {reporte['filas']} hipotecas "
+                     f"actualizadas ({reporte['omitidas']} sin datos de cálculo) en {reporte['segundos']:.2f} s "
+                     f"({reporte['filas_por_segundo']:,.0f} filas/s)")
+    return reportes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula la cuota mensual de todas las hipotecas con sus propios "
+                                                 "datos de cálculo.")
+    parser.add_argument("--porcentaje-propiedad", type=float,
+                        help="Nuevo porcentaje de la propiedad para todas las hipotecas; si se omite se usa el de cada "
+                             "hipoteca")
+    parser.add_argument("--procesos", type=int)
+    parser.add_argument("--fragmentos", type=int)
+    parser.add_argument("--punto-control", default="revaluacion.json")
+    parser.add_argument("--tamano-lote", type=int, default=TAMANO_LOTE)
+    args = parser.parse_args(argv)
+
+    reglas = {regla: getattr(args, regla) for regla in REGLAS if getattr(args, regla) is not None}
+    inicio = time.perf_counter()
+    reportes = revaluar_hipotecas(reglas, args.procesos, args.fragmentos, args.punto_control, args.tamano_lote)
+    segundos = time.perf_counter() - inicio
+    filas = sum(reporte["filas"] for reporte in reportes)
+    print(f"Total: {filas} hipotecas en {segundos:.2f} s ({filas / segundos if segundos else 0:,.0f} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,12 @@ Desarrollar una calculadora que permita calcular la cuota mensual que un banco l
 una hipoteca inversa.
 """
 
+from enum import IntEnum
+
+import numpy as np
+
+from .life_table import LifeTable, default_life_table
+
 MINIMUM_AGE = 65
 LIFE_MORTGAGE = 1
 PARTIAL_MORTGAGE = 2
@@ -95,6 +101,104 @@ class ExpectedLifeEqualToAge(Exception):
         super().__init__(f'La expectativa de vida no puede ser igual o menor que la edad.')
 
 
+class InvalidUserData(Exception):
+    """
+    Custom exception for invalid user data (empty name or negative age).
+
+    Excepción personalizada para datos de usuario no válidos (nombre vacío o edad negativa).
+    """
+
+    def __init__(self):
+        super().__init__(f'Datos inválidos para crear usuario')
+
+
+class ErrorCode(IntEnum):
+    """
+    Validation error codes, one for each custom exception.
+
+    Códigos de error de validación, uno por cada excepción personalizada.
+    """
+
+    VALID = 0
+    INVALID_AMOUNT = 1
+    INVALID_AGE = 2
+    INVALID_EXPECTED_LIFE = 3
+    INVALID_FEE_TIME = 4
+    INVALID_PROPERTY_PERCENTAGE = 5
+    INVALID_OPTION = 6
+    EXPECTED_LIFE_EQUAL_TO_AGE = 7
+    INVALID_USER_DATA = 8
+
+
+ERROR_EXCEPTIONS = {
+    ErrorCode.INVALID_AMOUNT: InvalidAmount,
+    ErrorCode.INVALID_AGE: InvalidAge,
+    ErrorCode.INVALID_EXPECTED_LIFE: InvalidExpectedLife,
+    ErrorCode.INVALID_FEE_TIME: InvalidFeeTime,
+    ErrorCode.INVALID_PROPERTY_PERCENTAGE: InvalidPropertyPercentage,
+    ErrorCode.INVALID_OPTION: InvalidOption,
+    ErrorCode.EXPECTED_LIFE_EQUAL_TO_AGE: ExpectedLifeEqualToAge,
+    ErrorCode.INVALID_USER_DATA: InvalidUserData,
+}
+
+
+class ValidationResult:
+    """
+    Result of a validation that does not raise exceptions.
+
+    Resultado de una validación que no lanza excepciones. El mensaje de error solo se construye la primera vez que se
+    solicita, por lo que validar datos inválidos no tiene el costo de crear y capturar una excepción.
+    """
+
+    __slots__ = ('code', '_message')
+
+    def __init__(self, code: ErrorCode):
+        self.code: ErrorCode = code
+        self._message: str | None = None
+
+    def __bool__(self) -> bool:
+        return self.code == ErrorCode.VALID
+
+    def __repr__(self) -> str:
+        return f'ValidationResult({self.code.name})'
+
+    @property
+    def ok(self) -> bool:
+        """
+        True if the validated inputs are valid.
+        """
+        return self.code == ErrorCode.VALID
+
+    @property
+    def message(self) -> str:
+        """
+        The error message of the exception associated with the code, empty for valid inputs.
+        """
+        if self._message is None:
+            self._message = '' if self.ok else str(ERROR_EXCEPTIONS[self.code]())
+        return self._message
+
+    def exception(self) -> Exception | None:
+        """
+        Build the exception associated with the code.
+
+        Returns:
+            Exception | None: The exception, or None for valid inputs.
+        """
+        return None if self.ok else ERROR_EXCEPTIONS[self.code]()
+
+    def raise_for_error(self) -> None:
+        """
+        Raise the exception associated with the code if the inputs are not valid.
+        """
+        if not self.ok:
+            raise ERROR_EXCEPTIONS[self.code]()
+
+
+# Un único resultado por código, así validar no crea objetos nuevos.
+VALIDATION_RESULTS = {code: ValidationResult(code) for code in ErrorCode}
+
+
 class Calculator:
     def __init__(self, total_amount: int, age: int, expected_life: int, fee_time: int,
                  property_percentage: float, mortgage_type: int):
@@ -119,7 +223,9 @@ class Calculator:
         """
 
         self._validate_inputs(total_amount, age, expected_life, fee_time, property_percentage, mortgage_type)
+        self._set_inputs(total_amount, age, expected_life, fee_time, property_percentage, mortgage_type)
 
+    def _set_inputs(self, total_amount, age, expected_life, fee_time, property_percentage, mortgage_type):
         self.total_amount: int = total_amount
         self.age: int = age
         self.expected_life: int = expected_life
@@ -127,28 +233,144 @@ class Calculator:
         self.property_percentage: float = property_percentage
         self.mortgage_type: int = mortgage_type
 
+    @classmethod
+    def from_life_table(cls, total_amount: int, age: int, sex: str, fee_time: int, property_percentage: float,
+                        mortgage_type: int, life_table: LifeTable | None = None) -> 'Calculator':
+        """
+        Create a Calculator deriving the expected life from the age and sex with a life table.
+
+        Args:
+            sex (str): Sex of the mortgage holder ('F' or 'M').
+            life_table (LifeTable | None): The table to use, by default the configured one (see default_life_table).
+
+        Raises:
+            InvalidSex: If the sex is not in the life table.
+            MissingLifeTable: If no table is given or configured.
+            The same exceptions as the constructor for the other inputs.
+        """
+
+        life_table = life_table or default_life_table()
+        return cls(total_amount, age, life_table.expected_life(age, sex), fee_time, property_percentage,
+                   mortgage_type)
+
+    @classmethod
+    def try_create(cls, total_amount: int, age: int, expected_life: int, fee_time: int,
+                   property_percentage: float, mortgage_type: int) -> tuple['Calculator | None', ValidationResult]:
+        """
+        Create a Calculator without raising exceptions for invalid inputs.
+
+        Returns:
+            tuple[Calculator | None, ValidationResult]: The calculator (None if the inputs are not valid) and the
+            validation result.
+        """
+
+        result = cls.validate(total_amount, age, expected_life, fee_time, property_percentage, mortgage_type)
+        if not result:
+            return None, result
+
+        calculator = cls.__new__(cls)
+        calculator._set_inputs(total_amount, age, expected_life, fee_time, property_percentage, mortgage_type)
+        return calculator, result
+
     @staticmethod
-    def _validate_inputs(total_amount, age, expected_life, fee_time, property_percentage, mortgage_type):
+    def validate(total_amount, age, expected_life, fee_time, property_percentage,
+                 mortgage_type) -> ValidationResult:
+        """
+        Validate the inputs without raising exceptions.
+
+        Returns:
+            ValidationResult: The result of the first rule the inputs break, or a valid result.
+        """
+
         if total_amount <= 0:
-            raise InvalidAmount()
+            return VALIDATION_RESULTS[ErrorCode.INVALID_AMOUNT]
 
         if age < MINIMUM_AGE:
-            raise InvalidAge()
+            return VALIDATION_RESULTS[ErrorCode.INVALID_AGE]
 
         if expected_life <= 0:
-            raise InvalidExpectedLife()
+            return VALIDATION_RESULTS[ErrorCode.INVALID_EXPECTED_LIFE]
 
         if fee_time <= 0:
-            raise InvalidFeeTime()
+            return VALIDATION_RESULTS[ErrorCode.INVALID_FEE_TIME]
 
         if property_percentage <= 0:
-            raise InvalidPropertyPercentage()
+            return VALIDATION_RESULTS[ErrorCode.INVALID_PROPERTY_PERCENTAGE]
 
         if mortgage_type not in VALIDS_INPUTS:
-            raise InvalidOption()
+            return VALIDATION_RESULTS[ErrorCode.INVALID_OPTION]
 
         if expected_life <= age:
-            raise ExpectedLifeEqualToAge()
+            return VALIDATION_RESULTS[ErrorCode.EXPECTED_LIFE_EQUAL_TO_AGE]
+
+        return VALIDATION_RESULTS[ErrorCode.VALID]
+
+    @staticmethod
+    def _validate_inputs(total_amount, age, expected_life, fee_time, property_percentage, mortgage_type):
+        Calculator.validate(total_amount, age, expected_life, fee_time, property_percentage,
+                            mortgage_type).raise_for_error()
+
+    @staticmethod
+    def _validate_inputs_batch(total_amount, age, expected_life, fee_time, property_percentage,
+                               mortgage_type) -> np.ndarray:
+        """
+        Vectorized version of _validate_inputs.
+
+        Instead of raising on the first bad row, every row gets the ErrorCode of the first rule it breaks, following
+        the same order as _validate_inputs.
+
+        Returns:
+            np.ndarray: The error code of each row (ErrorCode.VALID for valid rows).
+        """
+
+        conditions = [
+            total_amount <= 0,
+            age < MINIMUM_AGE,
+            expected_life <= 0,
+            fee_time <= 0,
+            property_percentage <= 0,
+            ~np.isin(mortgage_type, VALIDS_INPUTS),
+            expected_life <= age,
+        ]
+        choices = [
+            ErrorCode.INVALID_AMOUNT,
+            ErrorCode.INVALID_AGE,
+            ErrorCode.INVALID_EXPECTED_LIFE,
+            ErrorCode.INVALID_FEE_TIME,
+            ErrorCode.INVALID_PROPERTY_PERCENTAGE,
+            ErrorCode.INVALID_OPTION,
+            ErrorCode.EXPECTED_LIFE_EQUAL_TO_AGE,
+        ]
+        return np.select(conditions, choices, default=ErrorCode.VALID).astype(np.int8)
+
+    @staticmethod
+    def calculate_monthly_fees(total_amount, age, expected_life, fee_time, property_percentage,
+                               mortgage_type) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate the monthly fee of many mortgages in one vectorized pass.
+
+        Every argument is a column (NumPy array, list or any array-backed sequence) with one value per mortgage,
+        scalars are broadcast to the length of the other columns.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The monthly fees (NaN for invalid rows) and the ErrorCode of each row.
+        """
+
+        total_amount = np.asarray(total_amount, dtype=np.float64)
+        age = np.asarray(age, dtype=np.float64)
+        expected_life = np.asarray(expected_life, dtype=np.float64)
+        fee_time = np.asarray(fee_time, dtype=np.float64)
+        property_percentage = np.asarray(property_percentage, dtype=np.float64)
+        mortgage_type = np.asarray(mortgage_type)
+
+        errors = Calculator._validate_inputs_batch(total_amount, age, expected_life, fee_time,
+                                                   property_percentage, mortgage_type)
+
+        amount = total_amount * (property_percentage / 100)
+        months = np.select([mortgage_type == LIFE_MORTGAGE, mortgage_type == PARTIAL_MORTGAGE],
+                           [(expected_life - age) * 12, fee_time * 12], default=1)
+        fees = np.divide(amount, months, out=np.full(errors.shape, np.nan), where=errors == ErrorCode.VALID)
+        return fees, errors
 
     def calculate_monthly_fee(self) -> float:
         """
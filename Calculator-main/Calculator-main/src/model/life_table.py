@@ -0,0 +1,209 @@
+"""
+Tablas de vida actuariales para derivar la esperanza de vida a partir de la edad y el sexo.
+
+La tabla se carga una sola vez en un arreglo indexado por sexo y edad, de modo que cada consulta es un acceso O(1)
+con interpolación lineal entre edades enteras. El proyecto no incluye ninguna tabla: la ruta de la tabla actuarial
+oficial se indica con la variable de entorno TABLA_VIDA o como argumento.
+"""
+
+import csv
+import functools
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+TABLE_PATH_VARIABLE = 'TABLA_VIDA'
+CACHE_DIRECTORY = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                               'hipoteca_inversa')
+SEXES = {'F': 0, 'M': 1}
+
+
+class InvalidSex(Exception):
+    """
+    Custom exception for sexes that are not in the life table.
+
+    Excepción personalizada para sexos que no están en la tabla de vida.
+    """
+
+    def __init__(self):
+        super().__init__(f'El sexo ingresado no es válido. Por favor, ingrese F o M.')
+
+
+class MissingLifeTable(Exception):
+    """
+    Custom exception for when no life table is configured.
+
+    Excepción personalizada para cuando no se configuró ninguna tabla de vida.
+    """
+
+    def __init__(self):
+        super().__init__(f'No hay una tabla de vida configurada. Indique la ruta de la tabla actuarial en la variable '
+                         f'de entorno {TABLE_PATH_VARIABLE} o ingrese la esperanza de vida.')
+
+
+class LifeTable:
+    def __init__(self, table: np.ndarray):
+        """
+        Initialize the life table.
+
+        Args:
+            table (np.ndarray): Array with shape (3, ages), the first row holds the consecutive integer ages and the
+                next ones the remaining years of life of each sex, in the order of SEXES.
+
+        Raises:
+            ValueError: If the table has no ages, the ages are not consecutive or a sex has no value for some age.
+        """
+
+        if table.ndim != 2 or table.shape[0] != len(SEXES) + 1 or table.shape[1] == 0:
+            raise ValueError(f'La tabla de vida debe tener forma ({len(SEXES) + 1}, edades) con al menos una edad, '
+                             f'pero tiene forma {table.shape}.')
+        if not np.array_equal(table[0], table[0, 0] + np.arange(table.shape[1])):
+            raise ValueError('Las edades de la tabla de vida deben ser enteros consecutivos.')
+        if np.isnan(table[1:]).any():
+            raise ValueError('La tabla de vida debe tener la esperanza de vida de cada sexo para cada edad.')
+
+        self.table: np.ndarray = table
+        self.first_age: int = int(table[0, 0])
+        self.last_age: int = int(table[0, -1])
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'LifeTable':
+        """
+        Read a table from a CSV file with the columns edad, sexo and esperanza_vida (remaining years of life).
+
+        Raises:
+            ValueError: If a row has an unknown sex, the file has no ages, some age between the first and the last is
+                missing or a sex has no value for some age.
+        """
+
+        remaining = {}
+        with open(path, newline='', encoding='utf-8') as file:
+            for line, row in enumerate(csv.DictReader(file), start=2):
+                sex = SEXES.get((row['sexo'] or '').strip().upper())
+                if sex is None:
+                    raise ValueError(f"La tabla de vida '{path}' tiene un sexo desconocido en la línea {line}: "
+                                     f"{row['sexo']!r}.")
+                remaining[(sex, int(row['edad']))] = float(row['esperanza_vida'])
+
+        ages = sorted({age for _, age in remaining})
+        if not ages:
+            raise ValueError(f"La tabla de vida '{path}' no tiene ninguna edad.")
+        if ages != list(range(ages[0], ages[-1] + 1)):
+            raise ValueError(f"La tabla de vida '{path}' debe tener todas las edades entre {ages[0]} y {ages[-1]}.")
+        for name, sex in SEXES.items():
+            missing = [age for age in ages if (sex, age) not in remaining]
+            if missing:
+                raise ValueError(f"La tabla de vida '{path}' no tiene la esperanza de vida del sexo {name} para las "
+                                 f"edades {', '.join(map(str, missing))}.")
+        table = np.empty((len(SEXES) + 1, len(ages)), dtype=np.float64)
+        table[0] = ages
+        for sex in SEXES.values():
+            table[sex + 1] = [remaining[(sex, age)] for age in ages]
+        return cls(table)
+
+    def save(self, path: str) -> None:
+        """
+        Save the table as a .npy file that load can memory-map.
+        """
+
+        np.save(path, self.table)
+
+    @staticmethod
+    def _cache_path(path: str) -> str:
+        name = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(CACHE_DIRECTORY, f'tabla_vida_{name}.npy')
+
+    @classmethod
+    def load(cls, path: str) -> 'LifeTable':
+        """
+        Load a table. A CSV file is converted once to a '.npy' file in the user cache directory, which is
+        memory-mapped from then on; if the cache cannot be written the table is kept in memory.
+        """
+
+        if path.endswith('.npy'):
+            return cls(np.load(path, mmap_mode='r'))
+
+        cache = cls._cache_path(path)
+        if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+            return cls(np.load(cache, mmap_mode='r'))
+
+        table = cls.from_csv(path)
+        try:
+            os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+            # Se escribe en un archivo temporal y se renombra, así otro proceso nunca lee un caché a medio escribir
+            with tempfile.NamedTemporaryFile(dir=CACHE_DIRECTORY, suffix='.npy', delete=False) as file:
+                np.save(file, table.table)
+            os.replace(file.name, cache)
+        except OSError:
+            pass
+        return table
+
+    def expected_life(self, age: float, sex: str) -> float:
+        """
+        Get the expected life (age plus remaining years) of a person in constant time.
+
+        Raises:
+            InvalidSex: If the sex is not in the table.
+        """
+
+        sex_index = SEXES.get(str(sex).strip().upper())
+        if sex_index is None:
+            raise InvalidSex()
+
+        position = min(max(age, self.first_age), self.last_age) - self.first_age
+        index = int(position)
+        following = min(index + 1, self.table.shape[1] - 1)
+        fraction = position - index
+        remaining = self.table[sex_index + 1]
+        return age + float(remaining[index] + fraction * (remaining[following] - remaining[index]))
+
+    def expected_lives(self, ages, sexes) -> np.ndarray:
+        """
+        Vectorized version of expected_life.
+
+        Args:
+            ages: Ages of each person.
+            sexes: Sex of each person ('F' or 'M').
+
+        Returns:
+            np.ndarray: The expected life of each person, NaN for unknown sexes or ages.
+        """
+
+        ages = np.asarray(ages, dtype=np.float64)
+        # Each distinct value is normalized like in expected_life, not each row
+        names, inverse = np.unique(np.asarray(sexes, dtype=object).astype(str), return_inverse=True)
+        sex_index = np.array([SEXES.get(name.strip().upper(), -1) for name in names], dtype=np.int64)[inverse]
+
+        known = (sex_index >= 0) & ~np.isnan(ages)
+        # Unknown ages are looked up as the first age and discarded at the end
+        position = np.clip(np.where(known, ages, self.first_age), self.first_age, self.last_age) - self.first_age
+        index = position.astype(np.int64)
+        following = np.minimum(index + 1, self.table.shape[1] - 1)
+        fraction = position - index
+        rows = np.clip(sex_index, 0, None) + 1
+        remaining = self.table[rows, index] + fraction * (self.table[rows, following] - self.table[rows, index])
+        return np.where(known, ages + remaining, np.nan)
+
+
+def default_life_table(path: str | None = None) -> LifeTable:
+    """
+    The configured life table, loaded only once per process.
+
+    Args:
+        path (str | None): Path of the table, by default the one in the TABLA_VIDA environment variable.
+
+    Raises:
+        MissingLifeTable: If no path is given or configured.
+    """
+
+    path = path or os.environ.get(TABLE_PATH_VARIABLE)
+    if not path:
+        raise MissingLifeTable()
+    return _load_table(os.path.abspath(path))
+
+
+@functools.lru_cache(maxsize=None)
+def _load_table(path: str) -> LifeTable:
+    return LifeTable.load(path)
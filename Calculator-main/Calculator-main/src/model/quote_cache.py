@@ -0,0 +1,177 @@
+"""
+Caché de cotizaciones compartida por todas las interfaces (consola, Kivy y web) del mismo proceso.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from model.calculator import Calculator, ValidationResult, LIFE_MORTGAGE, PARTIAL_MORTGAGE
+from model.rate_table import RateTable, default_rate_table
+
+DEFAULT_MAX_SIZE = 10000
+
+# Distingue en configure un argumento omitido de uno pasado como None
+_UNSET = object()
+
+
+class QuoteCache:
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: float | None = None, clock=time.monotonic,
+                 rate_table: RateTable | None = None):
+        """
+        Initialize a bounded LRU cache of monthly fees.
+
+        Args:
+            max_size (int): Maximum number of quotes kept in the cache.
+            ttl (float | None): Seconds a quote stays valid, None to keep it until it is evicted.
+            clock (callable): Function returning the current time in seconds.
+            rate_table (RateTable | None): Table of precalculated fee factors looked up on a miss, None to always
+                calculate the fee with Calculator.
+        """
+
+        self.max_size: int = max_size
+        self.ttl: float | None = ttl
+        self.rate_table: RateTable | None = rate_table
+        self._clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+        self.table_hits: int = 0
+
+    def configure(self, max_size: int = _UNSET, ttl: float | None = _UNSET,
+                  rate_table: RateTable | None = _UNSET) -> None:
+        """
+        Change the size, the time to live and/or the rate table of the cache, evicting the extra entries. Omitted
+        arguments keep their current value; ttl=None keeps quotes until they are evicted and rate_table=None always
+        calculates the fee with Calculator.
+        """
+
+        with self._lock:
+            if max_size is not _UNSET:
+                self.max_size = max_size
+            if ttl is not _UNSET:
+                self.ttl = ttl
+            if rate_table is not _UNSET:
+                self.rate_table = rate_table
+            self._evict()
+
+    @staticmethod
+    def _key(total_amount, age, expected_life, fee_time, property_percentage, mortgage_type) -> tuple:
+        """
+        Normalize the inputs keeping only what the fee of each mortgage type depends on, so that, for example, two
+        life mortgages with the same remaining years share the same entry.
+        """
+
+        if mortgage_type == LIFE_MORTGAGE:
+            months = float(expected_life - age)
+        elif mortgage_type == PARTIAL_MORTGAGE:
+            months = float(fee_time)
+        else:
+            months = None
+        return int(mortgage_type), float(total_amount), float(property_percentage), months
+
+    def try_monthly_fee(self, total_amount, age, expected_life, fee_time, property_percentage,
+                        mortgage_type) -> tuple[float | None, ValidationResult]:
+        """
+        Get the monthly fee from the cache. On a miss the fee is looked up in the rate table, and calculated with
+        Calculator when there is no table or the inputs are outside its grid.
+
+        Returns:
+            tuple[float | None, ValidationResult]: The monthly fee (None if the inputs are not valid) and the
+            validation result.
+        """
+
+        validation = Calculator.validate(total_amount, age, expected_life, fee_time, property_percentage,
+                                         mortgage_type)
+        if not validation:
+            return None, validation
+
+        key = self._key(total_amount, age, expected_life, fee_time, property_percentage, mortgage_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                fee, expires_at = entry
+                if expires_at is None or expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return fee, validation
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            rate_table = self.rate_table
+
+        factor = None
+        if rate_table is not None:
+            factor = rate_table.factor(age, expected_life, fee_time, property_percentage, mortgage_type)
+        if factor is None:
+            calculator, _ = Calculator.try_create(total_amount, age, expected_life, fee_time, property_percentage,
+                                                  mortgage_type)
+            fee = calculator.calculate_monthly_fee()
+        else:
+            fee = total_amount * factor
+
+        with self._lock:
+            expires_at = None if self.ttl is None else self._clock() + self.ttl
+            self._entries[key] = (fee, expires_at)
+            self._entries.move_to_end(key)
+            if factor is not None:
+                self.table_hits += 1
+            self._evict()
+        return fee, validation
+
+    def monthly_fee(self, total_amount, age, expected_life, fee_time, property_percentage,
+                    mortgage_type) -> float:
+        """
+        Get the monthly fee from the cache.
+
+        Raises:
+            The same exceptions as Calculator when the inputs are not valid.
+        """
+
+        fee, validation = self.try_monthly_fee(total_amount, age, expected_life, fee_time, property_percentage,
+                                               mortgage_type)
+        validation.raise_for_error()
+        return fee
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Remove every quote and reset the statistics.
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = self.table_hits = 0
+
+    def stats(self) -> dict:
+        """
+        Usage statistics of the cache.
+
+        Returns:
+            dict: hits, misses, evictions, expirations, table_hits (misses answered by the rate table), size,
+            max_size and hit_rate.
+        """
+
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'table_hits': self.table_hits,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hit_rate': self.hits / requests if requests else 0.0,
+            }
+
+
+# Instancia compartida por todas las interfaces del proceso, con la tabla de tarifas cargada al iniciar.
+quote_cache = QuoteCache(rate_table=default_rate_table())
@@ -0,0 +1,95 @@
+"""
+Cotización vectorizada de bloques de solicitantes, compartida por la cotización en bloque de la consola y el endpoint
+de cotización por lotes de la web.
+
+Un bloque es un diccionario de columnas (listas o arreglos de igual largo) con las columnas de INPUT_COLUMNS y,
+opcionalmente, sex para derivar la esperanza de vida de la tabla de vida.
+"""
+
+import numpy as np
+
+from model.calculator import Calculator, ErrorCode, ERROR_EXCEPTIONS
+from model.life_table import InvalidSex, default_life_table
+
+# Columnas de entrada, en el mismo orden que los argumentos de Calculator
+INPUT_COLUMNS = ["total_amount", "age", "expected_life", "fee_time", "property_percentage", "mortgage_type"]
+DEFAULT_CHUNK_SIZE = 50000
+
+# Nombre con el que se reportan las filas que no se pudieron convertir a número
+PARSE_ERROR = ValueError.__name__
+# Nombre con el que se reportan las filas cuya esperanza de vida no se pudo derivar porque falta el sexo o no está en
+# la tabla de vida, como en la cotización interactiva
+SEX_ERROR = InvalidSex.__name__
+
+# Nombre de la excepción asociada a cada código de error, indexado por código
+ERROR_NAMES = np.array([""] * len(ErrorCode), dtype=object)
+for code, exception in ERROR_EXCEPTIONS.items():
+    ERROR_NAMES[code] = exception.__name__
+
+
+def to_float_column(values) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a column to an array of floats.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The values (NaN where they could not be converted) and the mask of invalid
+        values.
+    """
+
+    try:
+        column = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        column = np.empty(len(values), dtype=np.float64)
+        for index, value in enumerate(values):
+            try:
+                column[index] = float(value)
+            except (TypeError, ValueError):
+                column[index] = np.nan
+    return column, np.isnan(column)
+
+
+def quote_chunk(chunk: dict, life_table_path: str | None = None) -> tuple[dict, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calculate the monthly fee of every row of a chunk. Rows without expected life but with a sex take it from the
+    life table of life_table_path, or from the one configured in TABLA_VIDA.
+
+    Returns:
+        tuple[dict, np.ndarray, np.ndarray, np.ndarray]: The chunk with the monthly_fee and error columns added, the
+        error code of each row, the mask of rows that could not be converted to numbers and the mask of rows whose
+        sex is missing or not in the life table.
+
+    Raises:
+        MissingLifeTable: If some row needs the life table and none is given or configured.
+    """
+
+    length = len(next(iter(chunk.values()))) if chunk else 0
+    parse_errors = np.zeros(length, dtype=bool)
+    sex_errors = np.zeros(length, dtype=bool)
+    columns = []
+    for name in INPUT_COLUMNS:
+        column, invalid = to_float_column(chunk.get(name, [None] * length))
+        if name == "expected_life" and "sex" in chunk and invalid.any():
+            # Sin esperanza de vida se deriva de la edad y el sexo con la tabla de vida
+            ages, invalid_ages = to_float_column(chunk.get("age", [None] * length))
+            derived = default_life_table(life_table_path).expected_lives(ages, chunk["sex"])
+            column = np.where(invalid, derived, column)
+            # Con una edad válida la tabla solo no encuentra la esperanza de vida si el sexo falta o es desconocido
+            sex_errors = invalid & ~invalid_ages & np.isnan(derived)
+            invalid = np.isnan(column) & ~sex_errors
+        parse_errors |= invalid
+        columns.append(column)
+    sex_errors &= ~parse_errors
+    rejected = parse_errors | sex_errors
+
+    fees, errors = Calculator.calculate_monthly_fees(*columns)
+    errors[rejected] = ErrorCode.VALID
+    fees[rejected] = np.nan
+
+    error_names = ERROR_NAMES[errors]
+    error_names[parse_errors] = PARSE_ERROR
+    error_names[sex_errors] = SEX_ERROR
+
+    quoted = dict(chunk)
+    quoted["monthly_fee"] = np.where(np.isnan(fees), None, fees)
+    quoted["error"] = error_names
+    return quoted, errors, parse_errors, sex_errors
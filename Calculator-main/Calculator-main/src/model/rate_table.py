@@ -0,0 +1,214 @@
+"""
+Tablas precalculadas de factores de cuota obtenidas al barrer una grilla de parámetros con Calculator.
+
+Cada celda guarda la cuota mensual por unidad de monto total. La cuota solo depende del tipo de hipoteca, de los años
+de pago (esperanza de vida menos edad en la vitalicia, periodo de pago en la parcial) y del porcentaje de la propiedad,
+así que la tabla se guarda sobre esos tres ejes y la edad y la esperanza de vida se aplican al buscar. Una cotización
+interactiva se reduce a calcular un índice y multiplicar por el monto.
+"""
+
+import functools
+import json
+import os
+
+import numpy as np
+
+from model.calculator import Calculator, ValidationResult, VALIDS_INPUTS, MINIMUM_AGE, LIFE_MORTGAGE, PARTIAL_MORTGAGE
+
+DEFAULT_AGES = range(MINIMUM_AGE, 111)
+DEFAULT_EXPECTED_LIVES = range(MINIMUM_AGE + 1, 121)
+DEFAULT_FEE_TIMES = range(1, 31)
+DEFAULT_PROPERTY_PERCENTAGES = (0.5, 1.0, 1.2, 1.5, 1.8, 1.9, 2.0, 2.1, 2.5, 3.0)
+TABLE_PATH_VARIABLE = 'TABLA_TARIFAS'
+
+
+def _integer_axis(values) -> tuple[int, int]:
+    values = [int(value) for value in values]
+    if values != list(range(values[0], values[0] + len(values))):
+        raise ValueError('Los ejes de edad, esperanza de vida y periodo de pago deben ser enteros consecutivos.')
+    return values[0], len(values)
+
+
+class RateTable:
+    def __init__(self, factors: np.ndarray, ages, expected_lives, fee_times, property_percentages):
+        """
+        Initialize a table of fee factors.
+
+        Args:
+            factors (np.ndarray): Monthly fee per unit of total amount, with shape (mortgage type, years of payment,
+                property percentage). The years axis starts at 1.
+            ages, expected_lives, fee_times: Consecutive integer values of each axis of the grid.
+            property_percentages: Values of the property percentage axis.
+        """
+
+        self.factors: np.ndarray = factors
+        self.years: range = range(1, factors.shape[1] + 1)
+        self.ages: range = range(*self._bounds(ages))
+        self.expected_lives: range = range(*self._bounds(expected_lives))
+        self.fee_times: range = range(*self._bounds(fee_times))
+        self.property_percentages: list[float] = [float(value) for value in property_percentages]
+        self._percentage_index: dict[float, int] = {value: index
+                                                    for index, value in enumerate(self.property_percentages)}
+
+    @staticmethod
+    def _bounds(values) -> tuple[int, int]:
+        start, size = _integer_axis(values)
+        return start, start + size
+
+    @classmethod
+    def sweep(cls, ages=DEFAULT_AGES, expected_lives=DEFAULT_EXPECTED_LIVES, fee_times=DEFAULT_FEE_TIMES,
+              property_percentages=DEFAULT_PROPERTY_PERCENTAGES) -> 'RateTable':
+        """
+        Evaluate Calculator in one vectorized pass over every mortgage type, every number of years of payment the grid
+        can produce and every property percentage.
+
+        Returns:
+            RateTable: The table with the factors of every combination.
+        """
+
+        age_start, _ = _integer_axis(ages)
+        life_start, life_size = _integer_axis(expected_lives)
+        fee_start, fee_size = _integer_axis(fee_times)
+        years = np.arange(1, max(life_start + life_size - 1 - age_start, fee_start + fee_size - 1, 1) + 1,
+                          dtype=np.float64)
+        factors, _ = Calculator.calculate_monthly_fees(
+            1,
+            MINIMUM_AGE,
+            MINIMUM_AGE + years[None, :, None],
+            years[None, :, None],
+            np.asarray(property_percentages, dtype=np.float64)[None, None, :],
+            np.asarray(VALIDS_INPUTS)[:, None, None],
+        )
+        return cls(factors, ages, expected_lives, fee_times, property_percentages)
+
+    def save(self, path: str) -> None:
+        """
+        Save the table as '<path>.npy' (the factors) and '<path>.json' (the axes).
+        """
+
+        np.save(f'{path}.npy', self.factors)
+        with open(f'{path}.json', 'w', encoding='utf-8') as file:
+            json.dump({
+                'ages': [self.ages.start, self.ages.stop],
+                'expected_lives': [self.expected_lives.start, self.expected_lives.stop],
+                'fee_times': [self.fee_times.start, self.fee_times.stop],
+                'property_percentages': self.property_percentages,
+            }, file)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'RateTable':
+        """
+        Load a table saved with save. By default the factors are memory-mapped, so only the pages that are looked up
+        are read from disk.
+        """
+
+        with open(f'{path}.json', encoding='utf-8') as file:
+            axes = json.load(file)
+        factors = np.load(f'{path}.npy', mmap_mode='r' if mmap else None)
+        return cls(factors, range(*axes['ages']), range(*axes['expected_lives']), range(*axes['fee_times']),
+                   axes['property_percentages'])
+
+    @staticmethod
+    def _axis_index(axis: range, value) -> int | None:
+        index = int(value) - axis.start
+        if index != value - axis.start or not 0 <= index < len(axis):
+            return None
+        return index
+
+    def factor(self, age, expected_life, fee_time, property_percentage, mortgage_type) -> float | None:
+        """
+        Look up the fee factor of a combination in constant time.
+
+        Returns:
+            float | None: The monthly fee per unit of total amount, None if the combination is outside the grid or
+            is not valid.
+        """
+
+        age_index = self._axis_index(self.ages, age)
+        life_index = self._axis_index(self.expected_lives, expected_life)
+        fee_index = self._axis_index(self.fee_times, fee_time)
+        percentage_index = self._percentage_index.get(float(property_percentage))
+        if (mortgage_type not in VALIDS_INPUTS or age_index is None or life_index is None or fee_index is None
+                or percentage_index is None or expected_life <= age):
+            return None
+        if mortgage_type == LIFE_MORTGAGE:
+            years = expected_life - age
+        elif mortgage_type == PARTIAL_MORTGAGE:
+            years = fee_time
+        else:
+            years = self.years.start
+        year_index = self._axis_index(self.years, years)
+        if year_index is None:
+            return None
+        value = float(self.factors[VALIDS_INPUTS.index(mortgage_type), year_index, percentage_index])
+        return None if value != value else value
+
+    def try_monthly_fee(self, total_amount, age, expected_life, fee_time, property_percentage,
+                        mortgage_type) -> tuple[float | None, ValidationResult]:
+        """
+        Get the monthly fee from the table, falling back to Calculator for combinations outside the grid.
+
+        Returns:
+            tuple[float | None, ValidationResult]: The monthly fee (None if the inputs are not valid) and the
+            validation result.
+        """
+
+        validation = Calculator.validate(total_amount, age, expected_life, fee_time, property_percentage,
+                                         mortgage_type)
+        if not validation:
+            return None, validation
+
+        factor = self.factor(age, expected_life, fee_time, property_percentage, mortgage_type)
+        if factor is None:
+            calculator, _ = Calculator.try_create(total_amount, age, expected_life, fee_time, property_percentage,
+                                                  mortgage_type)
+            return calculator.calculate_monthly_fee(), validation
+        return total_amount * factor, validation
+
+    def rate_sheet(self, mortgage_type: int, property_percentage: float, fee_time: int | None = None) -> np.ndarray:
+        """
+        Get the rate sheet of a mortgage type and property percentage: the fee factor of each age (rows) and expected
+        life (columns), NaN where the expected life is not greater than the age. For a partial mortgage the fee time
+        must be given.
+
+        Returns:
+            np.ndarray: The sheet, built from the factors of the table.
+
+        Raises:
+            ValueError: If the mortgage is partial and the fee time is missing or outside the table.
+        """
+
+        percentage_index = self._percentage_index[float(property_percentage)]
+        factors = self.factors[VALIDS_INPUTS.index(mortgage_type), :, percentage_index]
+        ages = np.asarray(self.ages)[:, None]
+        expected_lives = np.asarray(self.expected_lives)[None, :]
+        valid = expected_lives > ages
+        if mortgage_type == LIFE_MORTGAGE:
+            years = np.where(valid, expected_lives - ages, self.years.start)
+        elif mortgage_type == PARTIAL_MORTGAGE:
+            if fee_time is None:
+                raise ValueError('La hoja de tarifas de una hipoteca parcial requiere el periodo de pago.')
+            if self._axis_index(self.fee_times, fee_time) is None:
+                raise ValueError(f'El periodo de pago {fee_time} no está en la tabla.')
+            years = np.full(valid.shape, fee_time)
+        else:
+            years = np.full(valid.shape, self.years.start)
+        return np.where(valid, factors[years - self.years.start], np.nan)
+
+
+def default_rate_table(path: str | None = None) -> RateTable:
+    """
+    The rate table used by the quote cache, built only once per process.
+
+    Args:
+        path (str | None): Path of a table saved with RateTable.save, by default the one in the TABLA_TARIFAS
+            environment variable. Without a path the default grid is swept.
+    """
+
+    path = path or os.environ.get(TABLE_PATH_VARIABLE)
+    return _load_table(os.path.abspath(path) if path else None)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_table(path: str | None) -> RateTable:
+    return RateTable.load(path) if path else RateTable.sweep()
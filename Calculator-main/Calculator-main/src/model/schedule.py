@@ -0,0 +1,136 @@
+"""
+Cronograma mensual de desembolsos de una hipoteca inversa, generado de forma perezosa a partir de un Calculator.
+"""
+
+import calendar
+import datetime
+from typing import Iterable, Iterator, NamedTuple
+
+from model.calculator import Calculator, LIFE_MORTGAGE, PARTIAL_MORTGAGE
+
+
+class ScheduleRow(NamedTuple):
+    month: int
+    date: datetime.date
+    amount: float
+    running_total: float
+
+
+def add_months(start: datetime.date, months: int) -> datetime.date:
+    """
+    Add a number of months to a date, moving the day back to the end of the month when it does not exist.
+    """
+
+    month_index = start.month - 1 + months
+    year = start.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(start.day, calendar.monthrange(year, month)[1])
+    return datetime.date(year, month, day)
+
+
+def _months_between(start: datetime.date, end: datetime.date) -> int:
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+def payment_count(calculator: Calculator) -> int:
+    """
+    Number of monthly payments of the mortgage: until the expected life for a life mortgage, during the fee time for
+    a partial mortgage and a single payment for a total mortgage.
+    """
+
+    if calculator.mortgage_type == LIFE_MORTGAGE:
+        return int(round((calculator.expected_life - calculator.age) * 12))
+    if calculator.mortgage_type == PARTIAL_MORTGAGE:
+        return int(round(calculator.fee_time * 12))
+    return 1
+
+
+def schedule_row(calculator: Calculator, fecha_inicio: datetime.date, month: int,
+                 monthly_fee: float | None = None) -> ScheduleRow:
+    """
+    Get the row of month N of the schedule in constant time, without generating the previous ones.
+
+    Args:
+        calculator (Calculator): The mortgage.
+        fecha_inicio (datetime.date): Date of the first payment.
+        month (int): Number of the payment, starting at 1.
+        monthly_fee (float | None): The monthly fee, calculated with the calculator when it is not given.
+
+    Raises:
+        ValueError: If the month is outside the schedule.
+    """
+
+    count = payment_count(calculator)
+    if not 1 <= month <= count:
+        raise ValueError(f'El mes {month} está fuera del cronograma (1 a {count}).')
+    if monthly_fee is None:
+        monthly_fee = calculator.calculate_monthly_fee()
+    return ScheduleRow(month, add_months(fecha_inicio, month - 1), monthly_fee, monthly_fee * month)
+
+
+def payout_schedule(calculator: Calculator, fecha_inicio: datetime.date,
+                    start_month: int = 1) -> Iterator[ScheduleRow]:
+    """
+    Generate the month by month schedule of the mortgage lazily, one row at a time.
+
+    Args:
+        calculator (Calculator): The mortgage.
+        fecha_inicio (datetime.date): Date of the first payment.
+        start_month (int): First month to generate, to seek directly to month N.
+
+    Yields:
+        ScheduleRow: Month number, date, amount and running total of each payment.
+    """
+
+    count = payment_count(calculator)
+    monthly_fee = calculator.calculate_monthly_fee()
+    for month in range(max(start_month, 1), count + 1):
+        yield ScheduleRow(month, add_months(fecha_inicio, month - 1), monthly_fee, monthly_fee * month)
+
+
+def _window_months(count: int, fecha_inicio: datetime.date, desde: datetime.date,
+                   hasta: datetime.date) -> tuple[int, int]:
+    first = _months_between(fecha_inicio, desde) + 1
+    if add_months(fecha_inicio, first - 1) < desde:
+        first += 1
+    last = _months_between(fecha_inicio, hasta) + 1
+    if add_months(fecha_inicio, last - 1) > hasta:
+        last -= 1
+    return max(first, 1), min(last, count)
+
+
+def window_total(calculator: Calculator, fecha_inicio: datetime.date, desde: datetime.date,
+                 hasta: datetime.date) -> tuple[int, float]:
+    """
+    Aggregate the payments whose date falls between desde and hasta (both included) in constant time and memory.
+
+    Returns:
+        tuple[int, float]: Number of payments and total amount paid in the window.
+    """
+
+    first, last = _window_months(payment_count(calculator), fecha_inicio, desde, hasta)
+    if last < first:
+        return 0, 0.0
+    payments = last - first + 1
+    return payments, calculator.calculate_monthly_fee() * payments
+
+
+def portfolio_window_total(contracts: Iterable[tuple[Calculator, datetime.date]], desde: datetime.date,
+                           hasta: datetime.date) -> tuple[int, float]:
+    """
+    Aggregate the payments of many contracts between desde and hasta, consuming the contracts one at a time.
+
+    Args:
+        contracts (Iterable[tuple[Calculator, datetime.date]]): Pairs of mortgage and date of its first payment.
+
+    Returns:
+        tuple[int, float]: Number of payments and total amount paid in the window.
+    """
+
+    payments = 0
+    amount = 0.0
+    for calculator, fecha_inicio in contracts:
+        contract_payments, contract_amount = window_total(calculator, fecha_inicio, desde, hasta)
+        payments += contract_payments
+        amount += contract_amount
+    return payments, amount
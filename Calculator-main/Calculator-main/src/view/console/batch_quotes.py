@@ -0,0 +1,306 @@
+import sys
+sys.path.append( "src" )
+sys.path.append( "." )
+
+import argparse
+import csv
+import json
+import time
+from collections import Counter
+
+import numpy as np
+
+from model.calculator import ErrorCode, ERROR_EXCEPTIONS
+from model.life_table import MissingLifeTable
+from model.quote_chunks import DEFAULT_CHUNK_SIZE, INPUT_COLUMNS, PARSE_ERROR, SEX_ERROR, quote_chunk, to_float_column
+
+
+def detect_format(path):
+    """Deduce el formato del archivo a partir de su extensión"""
+    extension = path.rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return "csv"
+    if extension in ("ndjson", "jsonl"):
+        return "ndjson"
+    if extension == "parquet":
+        return "parquet"
+    if extension in ("arrow", "feather", "ipc"):
+        return "arrow"
+    raise ValueError(f"Formato de archivo no soportado: '{path}'")
+
+
+def import_pyarrow():
+    """Importa pyarrow, que solo es necesario para los formatos Parquet y Arrow"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Los formatos Parquet y Arrow requieren instalar pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def _rows_to_chunk(rows, columns):
+    """Convierte una lista de filas (diccionarios) en un bloque por columnas"""
+    return {column: [row.get(column) for row in rows] for column in columns}
+
+
+def read_csv_chunks(path, chunk_size):
+    """Lee un archivo CSV en bloques de como máximo chunk_size filas"""
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.DictReader(file)
+        columns = list(reader.fieldnames or [])
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) == chunk_size:
+                yield _rows_to_chunk(rows, columns)
+                rows = []
+        if rows:
+            yield _rows_to_chunk(rows, columns)
+
+
+def read_ndjson_chunks(path, chunk_size):
+    """Lee un archivo NDJSON (un objeto JSON por línea) en bloques de como máximo chunk_size filas"""
+    with open(path, encoding="utf-8") as file:
+        columns = list(INPUT_COLUMNS)
+        rows = []
+        for line in file:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            columns.extend(column for column in row if column not in columns)
+            rows.append(row)
+            if len(rows) == chunk_size:
+                yield _rows_to_chunk(rows, columns)
+                rows = []
+        if rows:
+            yield _rows_to_chunk(rows, columns)
+
+
+def _batch_to_chunk(batch):
+    return {name: batch.column(index).to_numpy(zero_copy_only=False)
+            for index, name in enumerate(batch.schema.names)}
+
+
+def read_parquet_chunks(path, chunk_size):
+    """Lee un archivo Parquet por lotes de registros"""
+    pyarrow = import_pyarrow()
+    parquet_file = pyarrow.parquet.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        yield _batch_to_chunk(batch)
+
+
+def read_arrow_chunks(path, chunk_size):
+    """Lee un archivo Arrow IPC mapeado en memoria, lote por lote"""
+    pyarrow = import_pyarrow()
+    with pyarrow.memory_map(path) as source:
+        reader = pyarrow.ipc.open_file(source)
+        for index in range(reader.num_record_batches):
+            batch = reader.get_batch(index)
+            for offset in range(0, batch.num_rows, chunk_size):
+                yield _batch_to_chunk(batch.slice(offset, chunk_size))
+
+
+READERS = {
+    "csv": read_csv_chunks,
+    "ndjson": read_ndjson_chunks,
+    "parquet": read_parquet_chunks,
+    "arrow": read_arrow_chunks,
+}
+
+
+class CsvQuoteWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = None
+
+    def write(self, chunk):
+        columns = list(chunk)
+        if self.writer is None:
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(columns)
+        self.writer.writerows(zip(*(chunk[column] for column in columns)))
+
+    def close(self):
+        self.file.close()
+
+
+class NdjsonQuoteWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, chunk):
+        columns = list(chunk)
+        for values in zip(*(chunk[column] for column in columns)):
+            self.file.write(json.dumps(dict(zip(columns, values)), default=_json_default))
+            self.file.write("\n")
+
+    def close(self):
+        self.file.close()
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def output_schema(pyarrow, chunk):
+    """
+    Arma el esquema de salida, el mismo para todos los bloques aunque alguno tenga solo filas inválidas: las columnas
+    de INPUT_COLUMNS y monthly_fee son float64 y error es texto. Las demás columnas toman el tipo del primer bloque, o
+    texto si en el primer bloque solo traen None.
+    """
+    fields = []
+    for name, values in chunk.items():
+        if name in INPUT_COLUMNS or name == "monthly_fee":
+            field_type = pyarrow.float64()
+        elif name == "error":
+            field_type = pyarrow.string()
+        else:
+            field_type = pyarrow.array(values).type
+            if pyarrow.types.is_null(field_type):
+                field_type = pyarrow.string()
+        fields.append((name, field_type))
+    return pyarrow.schema(fields)
+
+
+def arrow_columns(pyarrow, chunk, schema):
+    """Convierte un bloque a las columnas del esquema; los valores de entrada no numéricos quedan nulos"""
+    columns = []
+    for field in schema:
+        values = chunk[field.name]
+        if field.name in INPUT_COLUMNS:
+            values, invalid = to_float_column(values)
+            columns.append(pyarrow.array(values, mask=invalid))
+        else:
+            columns.append(pyarrow.array(values, type=field.type))
+    return columns
+
+
+class ParquetQuoteWriter:
+    def __init__(self, path):
+        self.pyarrow = import_pyarrow()
+        self.path = path
+        self.schema = None
+        self.writer = None
+
+    def write(self, chunk):
+        if self.writer is None:
+            self.schema = output_schema(self.pyarrow, chunk)
+            self.writer = self.pyarrow.parquet.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(self.pyarrow.table(arrow_columns(self.pyarrow, chunk, self.schema),
+                                                   schema=self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class ArrowQuoteWriter:
+    def __init__(self, path):
+        self.pyarrow = import_pyarrow()
+        self.path = path
+        self.schema = None
+        self.writer = None
+
+    def write(self, chunk):
+        if self.writer is None:
+            self.schema = output_schema(self.pyarrow, chunk)
+            self.writer = self.pyarrow.ipc.new_file(self.path, self.schema)
+        self.writer.write_batch(self.pyarrow.record_batch(arrow_columns(self.pyarrow, chunk, self.schema),
+                                                          schema=self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {
+    "csv": CsvQuoteWriter,
+    "ndjson": NdjsonQuoteWriter,
+    "parquet": ParquetQuoteWriter,
+    "arrow": ArrowQuoteWriter,
+}
+
+
+def run_pipeline(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, input_format=None, output_format=None,
+                 life_table_path=None):
+    """
+    Cotiza un archivo completo de solicitantes bloque por bloque y escribe las cuotas en output_path.
+
+    Solo se mantiene en memoria un bloque a la vez, por lo que el consumo de memoria no depende del tamaño del
+    archivo.
+
+    Returns:
+        dict: Resumen de la ejecución con filas procesadas, cotizadas, rechazadas por tipo de excepción y filas por
+        segundo.
+    """
+    input_format = input_format or detect_format(input_path)
+    output_format = output_format or detect_format(output_path)
+    reader = READERS[input_format]
+    writer = WRITERS[output_format](output_path)
+
+    rows = 0
+    rejected = Counter()
+    start = time.perf_counter()
+    try:
+        for chunk in reader(input_path, chunk_size):
+            quoted, errors, parse_errors, sex_errors = quote_chunk(chunk, life_table_path)
+            writer.write(quoted)
+
+            rows += len(errors)
+            rejected[PARSE_ERROR] += int(parse_errors.sum())
+            rejected[SEX_ERROR] += int(sex_errors.sum())
+            counts = np.bincount(errors, minlength=len(ErrorCode))
+            for code, exception in ERROR_EXCEPTIONS.items():
+                rejected[exception.__name__] += int(counts[code])
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    rejected = {name: count for name, count in rejected.items() if count}
+    return {
+        "rows": rows,
+        "quoted": rows - sum(rejected.values()),
+        "rejected": rejected,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else 0.0,
+    }
+
+
+def print_summary(summary):
+    """Imprime el resumen de rendimiento de una ejecución"""
+    print(f"Filas procesadas: {summary['rows']}")
+    print(f"Filas cotizadas: {summary['quoted']}")
+    print(f"Tiempo: {summary['seconds']:.2f} s ({summary['rows_per_second']:,.0f} filas/s)")
+    if summary["rejected"]:
+        print("Filas rechazadas por tipo de excepción:")
+        for name, count in sorted(summary["rejected"].items(), key=lambda item: -item[1]):
+            print(f"  {name}: {count}")
+    else:
+        print("No se rechazó ninguna fila.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cotiza en bloque un archivo de solicitantes de hipoteca inversa.")
+    parser.add_argument("entrada", help="Archivo de solicitantes (.csv, .ndjson, .parquet o .arrow)")
+    parser.add_argument("salida", help="Archivo donde se escriben las cotizaciones")
+    parser.add_argument("--tamano-bloque", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Cantidad de filas que se procesan a la vez")
+    parser.add_argument("--tabla-vida", help="Tabla de vida (CSV) para las filas sin esperanza de vida; por defecto la "
+                                             "de la variable de entorno TABLA_VIDA")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run_pipeline(args.entrada, args.salida, args.tamano_bloque, life_table_path=args.tabla_vida)
+    except (OSError, ValueError, MissingLifeTable) as e:
+        print(f"Error: {e}")
+        return 1
+    print_summary(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,8 +4,16 @@ sys.path.append( "src" )
 sys.path.append( "." )
 
 import datetime
-from src.model.calculator import Calculator
+import itertools
+from model.calculator import Calculator
+from model.quote_cache import quote_cache
+from model.life_table import default_life_table
+from model.schedule import payment_count, payout_schedule, schedule_row
 from src.controller.app_controller import ControladorUsuarios, ControladorHipotecas
+from src.controller.cola_hipotecas import ColaHipotecas
+
+# Meses del cronograma de desembolsos que se muestran después de calcular una hipoteca
+MESES_CRONOGRAMA = 12
 
 def format_number_with_dots(number):
     """Formatea el número agregando puntos para facilitar la lectura"""
@@ -29,9 +37,64 @@ def get_float_input(prompt):
         except ValueError:
             print("Error: Ingrese un número válido.")
 
+def get_life_expectancy_input(age):
+    """Obtiene la esperanza de vida y el sexo (None si no se usó la tabla de vida), o None si hay un error"""
+    while True:
+        text = input("Ingrese la esperanza de vida esperada (vacío para usar la tabla de vida): ").strip()
+        if text:
+            try:
+                return int(text), None
+            except ValueError:
+                print("Error: Ingrese un número entero válido.")
+                continue
+        sex = input("Ingrese el sexo (F/M): ").strip().upper()
+        try:
+            expected_life = default_life_table().expected_life(age, sex)
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+        print(f"Esperanza de vida según la tabla de vida: {expected_life:.1f} años")
+        return expected_life, sex
+
+def print_users(controlador_usuarios):
+    """Muestra los usuarios página por página y devuelve False si no hay usuarios registrados"""
+    usuarios, token = controlador_usuarios.obtener_usuarios_pagina()
+    if not usuarios:
+        return False
+    print("Usuarios registrados:")
+    while True:
+        for usuario in usuarios:
+            print(f"ID: {usuario.id}, Nombre: {usuario.name}, Edad: {usuario.age}")
+        if token is None or input("Presione Enter para ver más usuarios o 'q' para continuar: ").strip().lower() == "q":
+            return True
+        usuarios, token = controlador_usuarios.obtener_usuarios_pagina(token=token)
+
+def print_schedule(calculadora, fecha_inicio, cuota_mensual):
+    """Muestra el resumen del cronograma de desembolsos y sus primeros MESES_CRONOGRAMA meses"""
+    pagos = payment_count(calculadora)
+    if pagos < 1:
+        return
+    # Solo se generan los meses que se muestran; el último pago se calcula directamente
+    ultimo = schedule_row(calculadora, fecha_inicio, pagos, cuota_mensual)
+    print(f"Cronograma: {pagos} pagos del {fecha_inicio} al {ultimo.date}, "
+          f"total {format_number_with_dots(ultimo.running_total)}")
+    for fila in itertools.islice(payout_schedule(calculadora, fecha_inicio), MESES_CRONOGRAMA):
+        print(f"  Mes {fila.month}: {fila.date} {format_number_with_dots(fila.amount)} "
+              f"(acumulado {format_number_with_dots(fila.running_total)})")
+    if pagos > MESES_CRONOGRAMA:
+        print("  ...")
+
+def report_failed_mortgage(resultado):
+    """Avisa que una hipoteca encolada no se pudo guardar"""
+    print(f"\nError: No se pudo registrar la hipoteca del usuario {resultado['usuario_id']} "
+          f"({format_number_with_dots(resultado['monto_total'])}): {resultado.get('error', resultado['resultado'])}")
+
 def main():
     controlador_usuarios = ControladorUsuarios()
     controlador_hipotecas = ControladorHipotecas()
+    # Con ESCRITURA_DIFERIDA las hipotecas se guardan en segundo plano y la cotización no espera a la base de datos
+    cola_hipotecas = ColaHipotecas(controlador_hipotecas, al_fallar=report_failed_mortgage) \
+        if os.environ.get("ESCRITURA_DIFERIDA") else None
 
     while True:
         print("\nMenú principal:")
@@ -48,6 +111,10 @@ def main():
             # Registrar nuevo usuario
             nombre = input("Ingrese el nombre: ")
             edad = get_int_input("Ingrese la edad: ")
+            validacion = controlador_usuarios.validar_usuario(nombre, edad)
+            if not validacion:
+                print(f"Error: {validacion.message}")
+                continue
             try:
                 usuario = controlador_usuarios.crear_usuario(nombre, edad)
                 print("Usuario registrado correctamente.")
@@ -56,16 +123,11 @@ def main():
 
         elif opcion == 2:
             # Modificar usuario existente
-            usuarios = controlador_usuarios.obtener_usuarios()
-            if not usuarios:
+            if not print_users(controlador_usuarios):
                 print("No hay usuarios registrados.")
             else:
-                print("Usuarios registrados:")
-                for usuario in usuarios:
-                    print(f"ID: {usuario.id}, Nombre: {usuario.name}, Edad: {usuario.age}")
-
                 id_usuario = get_int_input("Ingrese el ID del usuario a modificar: ")
-                usuario_modificar = next((u for u in usuarios if u.id == id_usuario), None)
+                usuario_modificar = controlador_usuarios.obtener_usuario(id_usuario)
 
                 if usuario_modificar:
                     nombre = input(f"Ingrese el nuevo nombre (actual: {usuario_modificar.name}): ") or usuario_modificar.name
@@ -81,14 +143,9 @@ def main():
 
         elif opcion == 3:
             # Eliminar usuario
-            usuarios = controlador_usuarios.obtener_usuarios()
-            if not usuarios:
+            if not print_users(controlador_usuarios):
                 print("No hay usuarios registrados.")
             else:
-                print("Usuarios registrados:")
-                for usuario in usuarios:
-                    print(f"ID: {usuario.id}, Nombre: {usuario.name}, Edad: {usuario.age}")
-
                 id_usuario = get_int_input("Ingrese el ID del usuario a eliminar: ")
                 try:
                     controlador_usuarios.eliminar_usuario(id_usuario)
@@ -98,49 +155,59 @@ def main():
 
         elif opcion == 4:
             # Listar usuarios
-            usuarios = controlador_usuarios.obtener_usuarios()
-            if not usuarios:
+            if not print_users(controlador_usuarios):
                 print("No hay usuarios registrados.")
-            else:
-                print("Usuarios registrados:")
-                for usuario in usuarios:
-                    print(f"ID: {usuario.id}, Nombre: {usuario.name}, Edad: {usuario.age}")
 
         elif opcion == 5:
             # Calcular hipoteca inversa
-            usuarios = controlador_usuarios.obtener_usuarios()
-            if not usuarios:
+            if not print_users(controlador_usuarios):
                 print("No hay usuarios registrados. Registre un usuario primero.")
             else:
-                print("Usuarios registrados:")
-                for usuario in usuarios:
-                    print(f"ID: {usuario.id}, Nombre: {usuario.name}, Edad: {usuario.age}")
-
                 id_usuario = get_int_input("Ingrese el ID del usuario: ")
-                usuario = next((u for u in usuarios if u.id == id_usuario), None)
+                usuario = controlador_usuarios.obtener_usuario(id_usuario)
 
                 if usuario:
                     monto_total = get_float_input("Ingrese el monto total de la hipoteca: ")
-                    esperanza_vida = get_int_input("Ingrese la esperanza de vida esperada: ")
+                    datos_vida = get_life_expectancy_input(usuario.age)
+                    if datos_vida is None:
+                        continue
+                    esperanza_vida, sexo = datos_vida
                     periodo_pago = get_int_input("Ingrese el período de tiempo para las tarifas (en años): ")
                     porcentaje_propiedad = get_float_input("Ingrese el porcentaje de valor de la propiedad: ")
                     mortgage_type = int(input("Ingrese el tipo de hipoteca (1 para hipoteca vitalicia, 2 para hipoteca parcial, 3 para hipoteca total): "))
 
+                    cuota_mensual, validacion = quote_cache.try_monthly_fee(monto_total, usuario.age, esperanza_vida, periodo_pago, porcentaje_propiedad, mortgage_type)
+                    if not validacion:
+                        print(f"Error: {validacion.message}")
+                        continue
+
+                    # Datos con los que se recalcula la cuota si cambia la edad del usuario
+                    calculo = {"esperanza_vida": esperanza_vida, "sexo": sexo, "periodo_pago": periodo_pago,
+                               "porcentaje_propiedad": porcentaje_propiedad, "tipo_hipoteca": mortgage_type}
                     try:
-                        calculadora = Calculator(monto_total, usuario.age, esperanza_vida, periodo_pago, porcentaje_propiedad, mortgage_type)
-                        cuota_mensual = calculadora.calculate_monthly_fee()
                         print(f"La cuota mensual de la hipoteca inversa es: {format_number_with_dots(cuota_mensual)}")
+                        print_schedule(Calculator(monto_total, usuario.age, esperanza_vida, periodo_pago,
+                                                  porcentaje_propiedad, mortgage_type),
+                                       datetime.date.today(), cuota_mensual)
 
                         # Agregar nueva hipoteca
-                        controlador_hipotecas.crear_hipoteca(usuario.id, monto_total, datetime.date.today(), cuota_mensual)
-                        print("Hipoteca registrada correctamente.")
+                        if cola_hipotecas:
+                            cola_hipotecas.crear_hipoteca(usuario.id, monto_total, datetime.date.today(), cuota_mensual,
+                                                         calculo)
+                            print("Hipoteca en cola para registrarse.")
+                        else:
+                            controlador_hipotecas.crear_hipoteca(usuario.id, monto_total, datetime.date.today(), cuota_mensual,
+                                                                calculo)
+                            print("Hipoteca registrada correctamente.")
                     except Exception as e:
                         print(f"Error: {e}")
                 else:
                     print("No se encontró el usuario.")
 
         elif opcion == 6:
-            # Salir
+            # Salir, guardando antes las hipotecas pendientes
+            if cola_hipotecas:
+                cola_hipotecas.cerrar()
             break
 
         else:
@@ -1,4 +1,8 @@
-from src.model.calculator import Calculator
+import sys
+sys.path.append( "src" )
+sys.path.append( "." )
+
+from model.quote_cache import quote_cache
 
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
@@ -19,8 +23,11 @@ class CalculatorLayout(BoxLayout):
             mortgage_type = self.get_mortgage_type()
 
             # Realizar cálculo
-            calculator = Calculator(total_amount, age, life_expectancy, payment_period, property_percentage, mortgage_type)
-            monthly_fee = calculator.calculate_monthly_fee()
+            monthly_fee, validation = quote_cache.try_monthly_fee(total_amount, age, life_expectancy, payment_period,
+                                                                  property_percentage, mortgage_type)
+            if not validation:
+                self.show_popup('Error', validation.message)
+                return
 
             # Mostrar resultado
             self.show_popup('Resultado', f'Cuota Mensual: {monthly_fee:.2f}')
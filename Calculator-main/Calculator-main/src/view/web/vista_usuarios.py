@@ -1,12 +1,22 @@
-from flask import Flask, Blueprint, render_template, request, redirect, url_for
+from flask import Flask, Blueprint, Response, jsonify, render_template, request, redirect, url_for
 
 blueprint = Blueprint( "vista_usuarios", __name__, "templates" )
 
+import math
 import sys
 sys.path.append("src")
 sys.path.append(".")
 from model.user import Usuario
+from model.calculator import ErrorCode, VALIDATION_RESULTS
+from model.life_table import InvalidSex, MissingLifeTable, default_life_table
+from model.quote_cache import quote_cache
 import controller.app_controller as app_controller
+from controller.exportacion import FORMATOS_EXPORTACION
+from model.quote_chunks import DEFAULT_CHUNK_SIZE, ERROR_NAMES, INPUT_COLUMNS, PARSE_ERROR, SEX_ERROR, quote_chunk
+
+# Solicitudes aceptadas como máximo en cada llamada a /api/cotizaciones, un bloque de quote_chunks
+MAXIMO_COTIZACIONES = DEFAULT_CHUNK_SIZE
+MENSAJE_DATOS_INVALIDOS = f"Los campos {', '.join(INPUT_COLUMNS)} deben ser números."
 
 controlador_usuarios = app_controller.ControladorUsuarios()
 controlador_hipotecas = app_controller.ControladorHipotecas()
@@ -28,6 +38,9 @@ def crear_usuario_view():
     edad = request.form.get("edad")
     if edad:
         edad = int(edad)  
+    validacion = controlador_usuarios.validar_usuario(nombre, edad)
+    if not validacion:
+        return render_template("excepcion.html", mensaje_error=validacion.message)
     try:
         usuario = controlador_usuarios.crear_usuario(nombre, edad)
         return render_template("usuario.html", user=usuario, mensaje="Usuario insertado exitosamente!")
@@ -40,11 +53,89 @@ def crear_usuario_view():
 @blueprint.route("/lista-usuarios")
 def lista_usuarios():
     try:
-        usuarios = controlador_usuarios.obtener_usuarios()
-        return render_template("lista-usuarios.html", usuarios=usuarios)
+        usuarios, siguiente = controlador_usuarios.obtener_usuarios_pagina(token=request.args.get("pagina"))
+        return render_template("lista-usuarios.html", usuarios=usuarios, siguiente=siguiente)
     except Exception as e:
         return render_template("excepcion.html", mensaje_error=f"Error al obtener usuarios: {str(e)}")
 
-   
 
+@blueprint.route("/exportar/<tabla>")
+def exportar(tabla):
+    # La respuesta se envía por partes (chunked) a medida que se leen los lotes, sin cargar toda la tabla
+    exportadores = {"usuarios": controlador_usuarios.exportar_usuarios,
+                    "hipotecas": controlador_hipotecas.exportar_hipotecas}
+    if tabla not in exportadores:
+        return render_template("excepcion.html", mensaje_error=f"No se puede exportar '{tabla}'"), 404
+    formato = request.args.get("formato", "csv")
+    try:
+        bloques = exportadores[tabla](formato)
+    except ValueError as e:
+        return render_template("excepcion.html", mensaje_error=str(e)), 400
+    tipo, extension = FORMATOS_EXPORTACION[formato]
+    return Response(bloques, content_type=tipo,
+                    headers={"Content-Disposition": f"attachment; filename={tabla}.{extension}"})
+
+
+def resultado_cotizacion(cuota, codigo, error_datos=False, error_sexo=False):
+    """Arma el resultado JSON de una cotización: la cuota mensual o el error con su mensaje"""
+    if error_datos:
+        return {"monthly_fee": None, "error": PARSE_ERROR, "message": MENSAJE_DATOS_INVALIDOS}
+    if error_sexo:
+        return {"monthly_fee": None, "error": SEX_ERROR, "message": str(InvalidSex())}
+    codigo = ErrorCode(int(codigo))
+    if codigo != ErrorCode.VALID:
+        return {"monthly_fee": None, "error": ERROR_NAMES[codigo], "message": VALIDATION_RESULTS[codigo].message}
+    if not math.isfinite(cuota):
+        return {"monthly_fee": None, "error": PARSE_ERROR, "message": MENSAJE_DATOS_INVALIDOS}
+    return {"monthly_fee": float(cuota), "error": None, "message": None}
+
+
+@blueprint.route("/api/cotizacion", methods=['POST'])
+def cotizar():
+    # Una solicitud con los campos de INPUT_COLUMNS; sin expected_life se deriva de la tabla de vida con sex
+    solicitud = request.get_json(silent=True)
+    if not isinstance(solicitud, dict):
+        return jsonify(resultado_cotizacion(None, None, error_datos=True)), 400
+    try:
+        if solicitud.get("expected_life") is None and solicitud.get("sex") is not None:
+            solicitud = {**solicitud, "expected_life": default_life_table().expected_life(float(solicitud["age"]),
+                                                                                           solicitud["sex"])}
+        valores = [float(solicitud[columna]) for columna in INPUT_COLUMNS]
+    except InvalidSex as e:
+        return jsonify({"monthly_fee": None, "error": type(e).__name__, "message": str(e)}), 400
+    except MissingLifeTable as e:
+        return jsonify({"monthly_fee": None, "error": type(e).__name__, "message": str(e)}), 500
+    except (KeyError, TypeError, ValueError):
+        valores = None
+    if valores is None or not all(map(math.isfinite, valores)):
+        return jsonify(resultado_cotizacion(None, None, error_datos=True)), 400
+
+    cuota, validacion = quote_cache.try_monthly_fee(*valores)
+    resultado = resultado_cotizacion(cuota, validacion.code)
+    return jsonify(resultado), 200 if validacion else 400
+
+
+@blueprint.route("/api/cotizaciones", methods=['POST'])
+def cotizar_lote():
+    # Un arreglo de solicitudes, cotizadas todas juntas con Calculator.calculate_monthly_fees; cada una tiene su
+    # resultado en la misma posición
+    solicitudes = request.get_json(silent=True)
+    if not isinstance(solicitudes, list):
+        return jsonify(error=PARSE_ERROR, message="Envíe un arreglo JSON de solicitudes."), 400
+    if len(solicitudes) > MAXIMO_COTIZACIONES:
+        return jsonify(error=PARSE_ERROR,
+                       message=f"Se aceptan como máximo {MAXIMO_COTIZACIONES} solicitudes por llamada."), 413
+
+    solicitudes = [solicitud if isinstance(solicitud, dict) else {} for solicitud in solicitudes]
+    columnas = {columna: [solicitud.get(columna) for solicitud in solicitudes] for columna in INPUT_COLUMNS}
+    if any("sex" in solicitud for solicitud in solicitudes):
+        columnas["sex"] = [solicitud.get("sex") for solicitud in solicitudes]
+    try:
+        cotizado, errores, errores_datos, errores_sexo = quote_chunk(columnas)
+    except MissingLifeTable as e:
+        return jsonify(error=type(e).__name__, message=str(e)), 500
 
+    resultados = [resultado_cotizacion(*resultado)
+                  for resultado in zip(cotizado["monthly_fee"], errores, errores_datos, errores_sexo)]
+    rechazadas = sum(resultado["error"] is not None for resultado in resultados)
+    return jsonify(results=resultados, quoted=len(resultados) - rechazadas, rejected=rechazadas)
@@ -0,0 +1,268 @@
+"""
+Benchmarks del calculador, los controladores y las rutas web.
+
+Los benchmarks de base de datos corren sobre un PostgreSQL desechable: por defecto se crea un clúster temporal con
+initdb (debe ejecutarse con un usuario distinto de root y con los binarios de PostgreSQL en el PATH o en --pg-bin);
+con --pghost se usa un servidor existente, en el que se crea y luego se borra una base de datos temporal.
+
+Uso:
+    python tests/benchmarks.py --salida resultados.json [--comparar resultados_anteriores.json]
+"""
+
+import sys
+sys.path.append( "src" )
+sys.path.append( "." )
+
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import tempfile
+import timeit
+
+import numpy as np
+
+from src.model.calculator import Calculator
+from model.quote_cache import QuoteCache
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MUESTRAS = 5
+
+
+def medir(resultados, nombre, funcion, repeticiones, filas=1):
+    """Ejecuta la función varias veces y guarda el tiempo por llamada (y por fila) en microsegundos"""
+    tiempos = timeit.repeat(funcion, number=repeticiones, repeat=MUESTRAS)
+    por_llamada = [tiempo / repeticiones * 1e6 for tiempo in tiempos]
+    resultados[nombre] = {
+        "repeticiones": repeticiones,
+        "filas": filas,
+        "mejor_us": min(por_llamada),
+        "mediana_us": statistics.median(por_llamada),
+        "mejor_us_por_fila": min(por_llamada) / filas,
+    }
+    print(f"{nombre:45s} {min(por_llamada):12.2f} us  ({min(por_llamada) / filas:.4f} us/fila)")
+
+
+def benchmarks_calculadora(resultados):
+    argumentos = (650000000, 71, 85, 1, 1.5, 1)
+    calculadora = Calculator(*argumentos)
+    medir(resultados, "calculator.construccion", lambda: Calculator(*argumentos), 20000)
+    medir(resultados, "calculator.calculate_monthly_fee", calculadora.calculate_monthly_fee, 20000)
+    medir(resultados, "calculator.validate", lambda: Calculator.validate(*argumentos), 20000)
+    medir(resultados, "calculator.validate_invalido", lambda: Calculator.validate(1, 60, 85, 1, 1.5, 1), 20000)
+
+    cache = QuoteCache()
+    cache.monthly_fee(*argumentos)
+    medir(resultados, "quote_cache.acierto", lambda: cache.monthly_fee(*argumentos), 20000)
+
+    filas = 100000
+    generador = np.random.default_rng(0)
+    columnas = (
+        generador.uniform(1e8, 1e9, filas),
+        generador.integers(60, 100, filas),
+        generador.integers(70, 110, filas),
+        generador.integers(1, 30, filas),
+        generador.uniform(0.5, 3, filas),
+        generador.integers(1, 4, filas),
+    )
+    medir(resultados, "calculator.calculate_monthly_fees", lambda: Calculator.calculate_monthly_fees(*columnas),
+          5, filas)
+
+
+class PostgresDesechable:
+    """Servidor o base de datos PostgreSQL temporal que se elimina al terminar"""
+
+    def __init__(self, pg_bin=None, pghost=None, pguser=None, pgpassword=None, pgdatabase="postgres"):
+        self.pg_bin = pg_bin
+        self.pghost = pghost
+        self.pguser = pguser
+        self.pgpassword = pgpassword
+        self.pgdatabase_admin = pgdatabase
+        self.directorio = None
+        self.base_de_datos = f"benchmark_{os.getpid()}"
+
+    def _binario(self, nombre):
+        ruta = os.path.join(self.pg_bin, nombre) if self.pg_bin else shutil.which(nombre)
+        if not ruta or not os.path.exists(ruta):
+            raise RuntimeError(f"No se encontró '{nombre}'. Use --pg-bin o --pghost.")
+        return ruta
+
+    def iniciar(self):
+        if self.pghost is None:
+            self.directorio = tempfile.mkdtemp(prefix="benchmark_pg_")
+            datos = os.path.join(self.directorio, "datos")
+            with socket.socket() as libre:
+                libre.bind(("127.0.0.1", 0))
+                puerto = libre.getsockname()[1]
+            subprocess.run([self._binario("initdb"), "-D", datos, "-U", "postgres", "-A", "trust"],
+                           check=True, stdout=subprocess.DEVNULL)
+            subprocess.run([self._binario("pg_ctl"), "-D", datos, "-w", "-l", os.path.join(self.directorio, "log"),
+                            "-o", f"-p {puerto} -k {self.directorio} -c listen_addresses=''", "start"],
+                           check=True, stdout=subprocess.DEVNULL)
+            self.pghost = self.directorio
+            self.pguser = "postgres"
+            self.pgpassword = ""
+            self.puerto = puerto
+        else:
+            self.puerto = None
+
+        import psycopg2
+        conexion = psycopg2.connect(**self._parametros(self.pgdatabase_admin))
+        conexion.autocommit = True
+        with conexion.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE {self.base_de_datos}")
+        conexion.close()
+
+        # Los controladores leen la conexión de secret_config
+        import secret_config
+        secret_config.PGHOST = self.pghost
+        secret_config.PGUSER = self.pguser
+        secret_config.PGPASSWORD = self.pgpassword
+        secret_config.PGDATABASE = self.base_de_datos
+        if self.puerto:
+            os.environ["PGPORT"] = str(self.puerto)
+
+        from controller.migraciones import aplicar_migraciones
+        aplicar_migraciones(reportar=lambda linea: None)
+
+    def _parametros(self, base_de_datos):
+        parametros = {"host": self.pghost, "user": self.pguser, "password": self.pgpassword,
+                      "database": base_de_datos}
+        if self.puerto:
+            parametros["port"] = self.puerto
+        return parametros
+
+    def detener(self):
+        if self.directorio:
+            subprocess.run([self._binario("pg_ctl"), "-D", os.path.join(self.directorio, "datos"), "-m", "immediate",
+                            "stop"], stdout=subprocess.DEVNULL)
+            shutil.rmtree(self.directorio, ignore_errors=True)
+            return
+
+        import psycopg2
+        conexion = psycopg2.connect(**self._parametros(self.pgdatabase_admin))
+        conexion.autocommit = True
+        with conexion.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {self.base_de_datos} WITH (FORCE)")
+        conexion.close()
+
+
+def benchmarks_controladores(resultados):
+    from controller.app_controller import ControladorUsuarios, ControladorHipotecas
+    from controller.repositorio import crear_repositorio
+
+    repositorio = crear_repositorio("postgres")
+    controlador_usuarios = ControladorUsuarios(repositorio)
+    controlador_hipotecas = ControladorHipotecas(repositorio)
+    contador = itertools.count()
+
+    for i in range(1000):
+        controlador_usuarios.crear_usuario(f"Usuario {i}", 65 + i % 40)
+    usuario = controlador_usuarios.crear_usuario("Usuario hipotecas", 70)
+    for i in range(20):
+        controlador_hipotecas.crear_hipoteca(usuario.id, 100000000 + i, datetime.date(2024, 1, 1), 1000)
+    hipoteca_id = controlador_hipotecas.obtener_hipotecas(usuario.id)[0]["id"]
+
+    medir(resultados, "controlador_usuarios.crear_usuario",
+          lambda: controlador_usuarios.crear_usuario(f"Nuevo {next(contador)}", 70), 200)
+    medir(resultados, "controlador_usuarios.obtener_usuarios", controlador_usuarios.obtener_usuarios, 20)
+    medir(resultados, "controlador_usuarios.obtener_usuarios_pagina", controlador_usuarios.obtener_usuarios_pagina,
+          200)
+    medir(resultados, "controlador_usuarios.iterar_usuarios",
+          lambda: sum(1 for _ in controlador_usuarios.iterar_usuarios()), 20)
+    medir(resultados, "controlador_usuarios.modificar_usuario",
+          lambda: controlador_usuarios.modificar_usuario(usuario.id, "Usuario hipotecas", 70), 200)
+    medir(resultados, "controlador_hipotecas.crear_hipoteca",
+          lambda: controlador_hipotecas.crear_hipoteca(usuario.id, 200000000 + next(contador),
+                                                       datetime.date(2024, 1, 1), 1000), 200)
+    medir(resultados, "controlador_hipotecas.obtener_hipotecas",
+          lambda: controlador_hipotecas.obtener_hipotecas(usuario.id), 200)
+    medir(resultados, "controlador_hipotecas.modificar_hipoteca",
+          lambda: controlador_hipotecas.modificar_hipoteca(hipoteca_id, 1200), 200)
+    medir(resultados, "controlador_hipotecas.resumen_cartera", controlador_hipotecas.resumen_cartera, 200)
+
+
+def benchmarks_web(resultados):
+    from flask import Flask
+    from view.web import vista_usuarios
+
+    app = Flask(__name__, template_folder=os.path.join(RAIZ, "templates"))
+    app.register_blueprint(vista_usuarios.blueprint)
+    cliente = app.test_client()
+    contador = itertools.count()
+
+    medir(resultados, "web.inicio", lambda: cliente.get("/"), 200)
+    medir(resultados, "web.lista_usuarios", lambda: cliente.get("/lista-usuarios"), 20)
+    medir(resultados, "web.crear_usuario",
+          lambda: cliente.post("/crear-usuario", data={"nombre": f"Web {next(contador)}", "edad": "70"}), 100)
+
+    solicitud = {"total_amount": 650000000, "age": 70, "expected_life": 85, "fee_time": 10, "property_percentage": 1.5,
+                 "mortgage_type": 1}
+    medir(resultados, "web.api_cotizacion", lambda: cliente.post("/api/cotizacion", json=solicitud), 200)
+    solicitudes = [{**solicitud, "age": 65 + i % 20} for i in range(1000)]
+    medir(resultados, "web.api_cotizaciones_1000", lambda: cliente.post("/api/cotizaciones", json=solicitudes), 20)
+
+
+def comparar(resultados, ruta_anterior):
+    """Imprime la variación de cada benchmark respecto a una ejecución anterior"""
+    with open(ruta_anterior, encoding="utf-8") as archivo:
+        anteriores = json.load(archivo)["resultados"]
+    print(f"\nComparación con {ruta_anterior}:")
+    for nombre, resultado in resultados.items():
+        if nombre in anteriores:
+            cambio = resultado["mejor_us"] / anteriores[nombre]["mejor_us"] - 1
+            print(f"{nombre:45s} {cambio:+8.1%}")
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=RAIZ, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta los benchmarks y guarda los resultados en JSON.")
+    parser.add_argument("--salida", default="benchmarks.json")
+    parser.add_argument("--comparar", help="Resultados anteriores con los que comparar")
+    parser.add_argument("--sin-base-de-datos", action="store_true",
+                        help="Omite los benchmarks de controladores y rutas web")
+    parser.add_argument("--pg-bin", help="Directorio con initdb y pg_ctl")
+    parser.add_argument("--pghost", help="Servidor PostgreSQL existente en el que crear la base temporal")
+    parser.add_argument("--pguser", default="postgres")
+    parser.add_argument("--pgpassword", default="")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    benchmarks_calculadora(resultados)
+
+    if not args.sin_base_de_datos:
+        postgres = PostgresDesechable(args.pg_bin, args.pghost, args.pguser, args.pgpassword)
+        postgres.iniciar()
+        try:
+            benchmarks_controladores(resultados)
+            benchmarks_web(resultados)
+        finally:
+            postgres.detener()
+
+    with open(args.salida, "w", encoding="utf-8") as archivo:
+        json.dump({
+            "commit": commit_actual(),
+            "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "resultados": resultados,
+        }, archivo, indent=2)
+
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,76 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
 import unittest
+import numpy as np
+from flask import Flask
+from psycopg2 import extensions
 from datetime import date
 import sys
 sys.path.append( "src" )
 sys.path.append( "." )
 from controller.app_controller import ControladorUsuarios, ControladorHipotecas
+from controller.repositorio import crear_repositorio
+from controller.repositorio_postgres import RepositorioPostgres
+from controller.revaluacion import revaluar_hipotecas
+from controller.particiones import archivar_particion, crear_particiones, listar_particiones
+from controller.pool_conexiones import PoolConexiones, PoolAgotado
+from controller.migraciones import aplicar_migraciones, listar_migraciones, version_actual
+from controller.cache_usuarios import CacheUsuarios
+from controller.cola_hipotecas import ColaHipotecas, ColaLlena
+from controller.app_controller_async import ControladorUsuariosAsync, ControladorHipotecasAsync, crear_pool
+from view.web import vista_usuarios
+
+# Las pruebas usan SQLite en memoria; ALMACENAMIENTO=postgres las corre contra la base de datos de secret_config
+ALMACENAMIENTO = os.environ.get("ALMACENAMIENTO", "sqlite")
+POSTGRES = ALMACENAMIENTO == "postgres"
+SOLO_POSTGRES = unittest.skipUnless(POSTGRES, "Requiere ALMACENAMIENTO=postgres")
+
+
+def limpiar_postgres(repositorio):
+    # Eliminar todos los registros de las tablas antes de cada prueba
+    with repositorio.pool.conexion() as conexion, conexion.cursor() as cursor:
+        cursor.execute("DELETE FROM hipotecas")
+        cursor.execute("DELETE FROM usuarios")
+
+
+def esperar_notificaciones(cache, cantidad, tiempo_espera=5.0, quietud=0.3):
+    # Espera a que la caché reciba al menos cantidad avisos y luego quietud segundos sin que llegue otro
+    limite = time.monotonic() + tiempo_espera
+    recibidas, desde = cache.estadisticas()["notificaciones"], time.monotonic()
+    while time.monotonic() < limite:
+        time.sleep(0.05)
+        actuales = cache.estadisticas()["notificaciones"]
+        if actuales != recibidas:
+            recibidas, desde = actuales, time.monotonic()
+        elif recibidas >= cantidad and time.monotonic() - desde >= quietud:
+            return
+    raise AssertionError(f"La caché recibió {recibidas} avisos de {cantidad}")
+
 
 class ControladorHipotecasTest(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
-        cls.controlador_usuarios = ControladorUsuarios()
-        cls.controlador_hipotecas = ControladorHipotecas()
+        if POSTGRES:
+            aplicar_migraciones(reportar=lambda linea: None)
+            cls.repositorio = crear_repositorio("postgres")
 
     def setUp(self):
-        # Eliminar todos los registros de las tablas antes de cada prueba
-        with self.controlador_usuarios.conexion.cursor() as cursor:
-            cursor.execute("DELETE FROM hipotecas")
-            cursor.execute("DELETE FROM usuarios")
-            self.controlador_usuarios.conexion.commit()
+        if POSTGRES:
+            limpiar_postgres(self.repositorio)
+        else:
+            # Un almacenamiento nuevo por prueba, así no hace falta borrar nada
+            self.repositorio = crear_repositorio(ALMACENAMIENTO, **({"ruta": ":memory:"}
+                                                                    if ALMACENAMIENTO == "sqlite" else {}))
+        self.controlador_usuarios = ControladorUsuarios(self.repositorio)
+        self.controlador_hipotecas = ControladorHipotecas(self.repositorio)
+        if self.controlador_usuarios.cache is not None:
+            self.controlador_usuarios.cache.invalidar()
 
     def tearDown(self):
         pass  # No es necesario realizar acciones adicionales después de cada prueba
@@ -49,6 +103,64 @@ class ControladorHipotecasTest(unittest.TestCase):
         self.assertEqual(usuario_actualizado.name, nuevo_nombre)
         self.assertEqual(usuario_actualizado.age, nueva_edad)
 
+    def test_modificar_usuario_recalcula_hipotecas(self):
+        usuario = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        calculo = {"esperanza_vida": 85, "periodo_pago": 1, "porcentaje_propiedad": 1.5, "tipo_hipoteca": 1}
+        self.controlador_hipotecas.crear_hipoteca(usuario.id, 200000.0, date(2023, 1, 1), 25.0, calculo)
+        # Sin datos de cálculo la cuota no se puede recalcular y queda igual
+        self.controlador_hipotecas.crear_hipoteca(usuario.id, 100000.0, date(2023, 1, 1), 1000)
+
+        self.controlador_usuarios.modificar_usuario(usuario.id, "Juan José", 80)
+
+        cuotas = {hipoteca["monto_total"]: hipoteca["cuota_mensual"]
+                  for hipoteca in self.controlador_hipotecas.obtener_hipotecas(usuario.id)}
+        self.assertAlmostEqual(cuotas[200000.0], 200000.0 * 0.015 / ((85 - 80) * 12))
+        self.assertEqual(cuotas[100000.0], 1000)
+        resumen = self.controlador_hipotecas.resumen_cartera(agrupar_por=("rango_edad",))
+        self.assertEqual({fila["rango_edad"]: fila["cantidad"] for fila in resumen}, {70: 1, 80: 1})
+
+    def test_exportar(self):
+        juan = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        diego = self.controlador_usuarios.crear_usuario("Diego Sanabria", 80)
+        calculo = {"esperanza_vida": 85, "periodo_pago": 1, "porcentaje_propiedad": 1.5, "tipo_hipoteca": 1}
+        self.controlador_hipotecas.crear_hipoteca(juan.id, 200000.0, date(2023, 1, 1), 25.0, calculo)
+        self.controlador_hipotecas.crear_hipoteca(diego.id, 300000.0, date(2024, 1, 1), 1500)
+
+        bloques = list(self.controlador_usuarios.exportar_usuarios("csv", tamano_lote=1))
+        self.assertEqual(2, len(bloques))
+        usuarios = list(csv.DictReader(io.StringIO(b"".join(bloques).decode("utf-8"))))
+        self.assertEqual([("Juan José", "75"), ("Diego Sanabria", "80")], [(u["name"], u["age"]) for u in usuarios])
+
+        bloques = self.controlador_hipotecas.exportar_hipotecas("ndjson", tamano_lote=1)
+        hipotecas = [json.loads(linea) for linea in b"".join(bloques).decode("utf-8").splitlines()]
+        self.assertEqual([(juan.id, 200000.0, "2023-01-01", 85, 1), (diego.id, 300000.0, "2024-01-01", None, None)],
+                         [(h["usuario_id"], h["monto_total"], h["fecha_inicio"], h["esperanza_vida"],
+                           h["tipo_hipoteca"]) for h in hipotecas])
+
+        with self.assertRaises(ValueError):
+            self.controlador_hipotecas.exportar_hipotecas("xlsx")
+
+        iteradas = list(self.controlador_hipotecas.iterar_hipotecas(tamano_lote=1))
+        self.assertEqual([(juan.id, 1.5), (diego.id, None)],
+                         [(h["usuario_id"], h["porcentaje_propiedad"]) for h in iteradas])
+
+    def test_exportar_arrow(self):
+        try:
+            import pyarrow.ipc
+        except ImportError:
+            self.skipTest("Requiere pyarrow")
+        usuario = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        self.controlador_hipotecas.crear_hipoteca(usuario.id, 200000.0, date(2023, 1, 1), 1000)
+        self.controlador_hipotecas.crear_hipoteca(usuario.id, 300000.0, date(2024, 1, 1), 1500)
+
+        datos = b"".join(self.controlador_hipotecas.exportar_hipotecas("arrow", tamano_lote=1))
+        tabla = pyarrow.ipc.open_stream(datos).read_all()
+        self.assertEqual([200000.0, 300000.0], tabla.column("monto_total").to_pylist())
+        self.assertEqual([date(2023, 1, 1), date(2024, 1, 1)], tabla.column("fecha_inicio").to_pylist())
+
+        usuarios = pyarrow.ipc.open_stream(b"".join(self.controlador_usuarios.exportar_usuarios("arrow"))).read_all()
+        self.assertEqual(["Juan José"], usuarios.column("name").to_pylist())
+
     def test_eliminar_usuario(self):
         usuario = self.controlador_usuarios.crear_usuario("Matias Herrera", 68)
         self.controlador_usuarios.eliminar_usuario(usuario.id)
@@ -63,6 +175,57 @@ class ControladorHipotecasTest(unittest.TestCase):
         self.assertEqual(usuarios[0].name, "Matias Herrera")
         self.assertEqual(usuarios[1].name, "Juan José")
 
+    def test_obtener_usuarios_pagina(self):
+        for i in range(5):
+            self.controlador_usuarios.crear_usuario(f"Usuario {i}", 65 + i)
+
+        pagina, token = self.controlador_usuarios.obtener_usuarios_pagina(2)
+        nombres = [usuario.name for usuario in pagina]
+        while token is not None:
+            pagina, token = self.controlador_usuarios.obtener_usuarios_pagina(2, token)
+            nombres += [usuario.name for usuario in pagina]
+
+        self.assertEqual([f"Usuario {i}" for i in range(5)], nombres)
+        with self.assertRaises(ValueError):
+            self.controlador_usuarios.obtener_usuarios_pagina(2, "no-es-un-token")
+
+    def test_iterar_usuarios(self):
+        for i in range(5):
+            self.controlador_usuarios.crear_usuario(f"Usuario {i}", 65 + i)
+        usuarios = list(self.controlador_usuarios.iterar_usuarios(tamano_lote=2))
+        self.assertEqual([f"Usuario {i}" for i in range(5)], [usuario.name for usuario in usuarios])
+
+    def test_obtener_usuario(self):
+        usuario = self.controlador_usuarios.crear_usuario("Matias Herrera", 68)
+        self.assertEqual("Matias Herrera", self.controlador_usuarios.obtener_usuario(usuario.id).name)
+        self.assertIsNone(self.controlador_usuarios.obtener_usuario(9999))
+
+    def test_resumen_cartera(self):
+        matias = self.controlador_usuarios.crear_usuario("Matias Herrera", 68)
+        juan = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        self.controlador_hipotecas.crear_hipoteca(matias.id, 200000.0, date(2023, 1, 1), 1000)
+        self.controlador_hipotecas.crear_hipoteca(matias.id, 400000.0, date(2023, 1, 20), 2000)
+        self.controlador_hipotecas.crear_hipotecas_masivo([(juan.id, 300000.0, date(2023, 2, 1), 1500)])
+        hipoteca_id = self.controlador_hipotecas.obtener_hipotecas(juan.id)[0]["id"]
+        self.controlador_hipotecas.modificar_hipoteca(hipoteca_id, 1800)
+
+        por_mes = self.controlador_hipotecas.resumen_cartera("mes")
+        self.assertEqual([(date(2023, 1, 1), 2, 3000, 300000.0), (date(2023, 2, 1), 1, 1800, 300000.0)],
+                         [(f["mes"], f["cantidad"], f["cuota_total"], f["monto_promedio"]) for f in por_mes])
+        por_edad = self.controlador_hipotecas.resumen_cartera("rango_edad", fecha_desde=date(2023, 2, 15))
+        self.assertEqual([(70, 1)], [(f["rango_edad"], f["cantidad"]) for f in por_edad])
+
+        # Al eliminar el usuario sus hipotecas dejan de contar
+        self.controlador_usuarios.eliminar_usuario(matias.id)
+        self.assertEqual([(70, 1, 1800)], [(f["rango_edad"], f["cantidad"], f["cuota_total"])
+                                           for f in self.controlador_hipotecas.resumen_cartera("rango_edad")])
+
+        incremental = self.controlador_hipotecas.resumen_cartera()
+        self.controlador_hipotecas.reconstruir_resumen()
+        self.assertEqual(incremental, self.controlador_hipotecas.resumen_cartera())
+        with self.assertRaises(ValueError):
+            self.controlador_hipotecas.resumen_cartera("usuario_id")
+
     def test_obtener_hipotecas(self):
         usuario = self.controlador_usuarios.crear_usuario("Matias Herrera", 68)
         monto_total = 2000000
@@ -75,6 +238,37 @@ class ControladorHipotecasTest(unittest.TestCase):
         self.assertEqual(hipotecas[0]["fecha_inicio"], fecha_inicio)
         self.assertEqual(hipotecas[0]["cuota_mensual"], cuota_mensual)
 
+    def test_obtener_usuarios_con_hipotecas(self):
+        matias = self.controlador_usuarios.crear_usuario("Matias Herrera", 68)
+        juan = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        self.controlador_usuarios.crear_usuario("Ana María", 90)
+        self.controlador_hipotecas.crear_hipoteca(matias.id, 200000.0, date(2023, 1, 1), 1000)
+        self.controlador_hipotecas.crear_hipoteca(matias.id, 300000.0, date(2024, 1, 1), 1500)
+        self.controlador_hipotecas.crear_hipoteca(juan.id, 400000.0, date(2024, 6, 1), 2000)
+
+        usuarios = self.controlador_usuarios.obtener_usuarios_con_hipotecas()
+
+        self.assertEqual(["Matias Herrera", "Juan José", "Ana María"], [usuario.name for usuario in usuarios])
+        self.assertEqual([2, 1, 0], [len(usuario.hipotecas) for usuario in usuarios])
+        self.assertEqual(self.controlador_hipotecas.obtener_hipotecas(matias.id), usuarios[0].hipotecas)
+
+        usuarios = self.controlador_usuarios.obtener_usuarios_con_hipotecas(
+            edad_maxima=80, fecha_desde=date(2024, 1, 1), solo_con_hipotecas=True)
+        self.assertEqual([(matias.id, [300000.0]), (juan.id, [400000.0])],
+                         [(usuario.id, [h["monto_total"] for h in usuario.hipotecas]) for usuario in usuarios])
+
+    def test_obtener_hipotecas_de_usuarios(self):
+        matias = self.controlador_usuarios.crear_usuario("Matias Herrera", 68)
+        juan = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        self.controlador_hipotecas.crear_hipoteca(matias.id, 200000.0, date(2023, 1, 1), 1000)
+        self.controlador_hipotecas.crear_hipoteca(matias.id, 300000.0, date(2024, 1, 1), 1500)
+
+        hipotecas = self.controlador_hipotecas.obtener_hipotecas_de_usuarios([matias.id, juan.id],
+                                                                             fecha_hasta=date(2023, 12, 31))
+
+        self.assertEqual([200000.0], [hipoteca["monto_total"] for hipoteca in hipotecas[matias.id]])
+        self.assertEqual([], hipotecas[juan.id])
+
     def test_modificar_hipoteca(self):
         usuario = self.controlador_usuarios.crear_usuario("Diego Sanabria", 75)
         monto_total = 350000000
@@ -95,6 +289,118 @@ class ControladorHipotecasTest(unittest.TestCase):
         self.assertEqual(len(hipotecas), 1)
         self.assertEqual(hipotecas[0]["cuota_mensual"], nueva_cuota_mensual)
 
+    def test_modificar_usuario_inexistente(self):
+        with self.assertRaises(Exception) as cm:
+            self.controlador_usuarios.modificar_usuario(9999, "Matias Herrera", 70)
+        self.assertIn("El usuario no existe", str(cm.exception))
+
+    def test_crear_usuarios_masivo(self):
+        self.controlador_usuarios.crear_usuario("Matias Herrera", 68)
+        usuarios = [("Juan José", 75), ("Matias Herrera", 68), ("", 70), ("Juan José", 75), ("Diego Sanabria", 80)]
+
+        reporte = self.controlador_usuarios.crear_usuarios_masivo(usuarios, tamano_lote=3)
+
+        self.assertEqual(["creado", "omitido", "invalido", "omitido", "creado"],
+                         [fila["resultado"] for fila in reporte])
+        self.assertEqual(3, len(self.controlador_usuarios.obtener_usuarios()))
+
+        reporte = self.controlador_usuarios.crear_usuarios_masivo(usuarios, conflicto="actualizar")
+
+        self.assertEqual(["existente", "existente", "invalido", "duplicado", "existente"],
+                         [fila["resultado"] for fila in reporte])
+        self.assertEqual(reporte[0]["id"], reporte[3]["id"])
+        self.assertEqual(3, len(self.controlador_usuarios.obtener_usuarios()))
+
+    def test_crear_hipotecas_masivo(self):
+        usuario = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        hipotecas = [
+            (usuario.id, 200000000.0, date(2023, 1, 1), 1000),
+            (9999, 200000000.0, date(2023, 1, 1), 1000),
+            (usuario.id, 300000000.0, "2023-02-01", 1500),
+        ]
+
+        reporte = self.controlador_hipotecas.crear_hipotecas_masivo(hipotecas)
+
+        self.assertEqual(["creada", "usuario_inexistente", "creada"], [fila["resultado"] for fila in reporte])
+        guardadas = {hipoteca["id"]: hipoteca for hipoteca in self.controlador_hipotecas.obtener_hipotecas(usuario.id)}
+        self.assertEqual(300000000.0, guardadas[reporte[2]["id"]]["monto_total"])
+        self.assertEqual(date(2023, 2, 1), guardadas[reporte[2]["id"]]["fecha_inicio"])
+
+    def test_crear_hipoteca_repetida(self):
+        # Un usuario puede guardar dos veces la misma cotización el mismo día
+        usuario = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        self.controlador_hipotecas.crear_hipoteca(usuario.id, 200000.0, date(2023, 1, 1), 1000)
+        self.controlador_hipotecas.crear_hipoteca(usuario.id, 200000.0, date(2023, 1, 1), 1000)
+        self.assertEqual(2, len(self.controlador_hipotecas.obtener_hipotecas(usuario.id)))
+
+    def test_cola_hipotecas(self):
+        usuario = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        fallidas = []
+        cola = ColaHipotecas(self.controlador_hipotecas, tamano_lote=2, al_fallar=fallidas.append)
+        cola.crear_hipoteca(usuario.id, 200000.0, date(2023, 1, 1), 1000)
+        cola.crear_hipoteca(9999, 200000.0, date(2023, 1, 1), 1000)
+        cola.crear_hipoteca(usuario.id, 300000.0, date(2023, 2, 1), 1500)
+        cola.cerrar()
+
+        hipotecas = self.controlador_hipotecas.obtener_hipotecas(usuario.id)
+        self.assertEqual({200000.0, 300000.0}, {hipoteca["monto_total"] for hipoteca in hipotecas})
+        self.assertEqual([(9999, "usuario_inexistente")], [(f["usuario_id"], f["resultado"]) for f in fallidas])
+        estadisticas = cola.estadisticas()
+        self.assertEqual((3, 2, 1), (estadisticas["encoladas"], estadisticas["guardadas"], estadisticas["fallidas"]))
+        with self.assertRaises(Exception):
+            cola.crear_hipoteca(usuario.id, 400000.0, date(2023, 3, 1), 2000)
+
+    def test_cola_hipotecas_cerrar_con_productores(self):
+        # Lo que se encoló mientras se cerraba la cola se guarda o se informa, nunca queda detrás del cierre
+        usuario = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        cola = ColaHipotecas(self.controlador_hipotecas, capacidad=5, tamano_lote=3, espera_lote=0)
+
+        def producir():
+            while True:
+                try:
+                    cola.crear_hipoteca(usuario.id, 200000.0, date(2023, 1, 1), 1000)
+                except Exception:
+                    return
+
+        productores = [threading.Thread(target=producir) for _ in range(4)]
+        for productor in productores:
+            productor.start()
+        time.sleep(0.05)
+        cola.cerrar()
+        for productor in productores:
+            productor.join()
+
+        estadisticas = cola.estadisticas()
+        self.assertEqual(0, estadisticas["pendientes"])
+        self.assertEqual(estadisticas["encoladas"], estadisticas["guardadas"] + estadisticas["fallidas"])
+        self.assertEqual(estadisticas["guardadas"], len(self.controlador_hipotecas.obtener_hipotecas(usuario.id)))
+
+    def test_cola_hipotecas_llena(self):
+        usuario = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        liberar = threading.Event()
+        controlador = self.controlador_hipotecas
+
+        class ControladorLento(ControladorHipotecas):
+            def crear_hipotecas_masivo(self, hipotecas, tamano_lote=1000):
+                liberar.wait(5)
+                return controlador.crear_hipotecas_masivo(hipotecas, tamano_lote)
+
+        cola = ColaHipotecas(ControladorLento(self.repositorio), capacidad=1, espera_lote=0)
+        try:
+            cola.crear_hipoteca(usuario.id, 200000.0, date(2023, 1, 1), 1000)
+            # El hilo quedó guardando la primera; la segunda ocupa el único lugar y la tercera no entra
+            for _ in range(50):
+                if cola.estadisticas()["pendientes"] == 0:
+                    break
+                time.sleep(0.01)
+            cola.crear_hipoteca(usuario.id, 300000.0, date(2023, 1, 1), 1000)
+            with self.assertRaises(ColaLlena):
+                cola.crear_hipoteca(usuario.id, 400000.0, date(2023, 1, 1), 1000, tiempo_espera=0.05)
+        finally:
+            liberar.set()
+            cola.cerrar()
+        self.assertEqual(2, len(self.controlador_hipotecas.obtener_hipotecas(usuario.id)))
+
     def test_crear_usuario_con_datos_invalidos(self):
         with self.assertRaises(Exception) as cm:
             self.controlador_usuarios.crear_usuario("", 68)
@@ -104,6 +410,13 @@ class ControladorHipotecasTest(unittest.TestCase):
             self.controlador_usuarios.crear_usuario("Matias Herrera", -1)
         self.assertIn("Datos inválidos para crear usuario", str(cm.exception))
 
+    def test_validar_usuario(self):
+        self.assertTrue(self.controlador_usuarios.validar_usuario("Matias Herrera", 68).ok)
+        self.assertTrue(self.controlador_usuarios.validar_usuario("Matias Herrera", np.int64(68)).ok)
+        self.assertFalse(self.controlador_usuarios.validar_usuario("Matias Herrera", True).ok)
+        self.assertFalse(self.controlador_usuarios.validar_usuario("Matias Herrera", 68.5).ok)
+        self.assertFalse(self.controlador_usuarios.validar_usuario("Matias Herrera", np.int64(-1)).ok)
+
     def test_crear_hipoteca_para_usuario_inexistente(self):
         usuario_id_inexistente = 9999
         monto_total = 200000000
@@ -126,5 +439,427 @@ class ControladorHipotecasTest(unittest.TestCase):
             self.controlador_usuarios.eliminar_usuario(usuario_id_inexistente)
         self.assertIn("El usuario no existe", str(cm.exception))
 
+@SOLO_POSTGRES
+class ControladorPostgresTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        aplicar_migraciones(reportar=lambda linea: None)
+        cls.repositorio = crear_repositorio("postgres")
+
+    def setUp(self):
+        limpiar_postgres(self.repositorio)
+        self.controlador_usuarios = ControladorUsuarios(self.repositorio)
+        self.controlador_hipotecas = ControladorHipotecas(self.repositorio)
+        self.controlador_usuarios.cache.invalidar()
+
+    def test_iterar_usuarios_devuelve_la_conexion(self):
+        for i in range(5):
+            self.controlador_usuarios.crear_usuario(f"Usuario {i}", 65 + i)
+        self.assertEqual(5, len(list(self.controlador_usuarios.iterar_usuarios(tamano_lote=2))))
+        self.assertEqual(0, self.repositorio.pool.estadisticas()["en_uso"])
+
+    def test_un_viaje_por_consulta(self):
+        matias = self.controlador_usuarios.crear_usuario("Matias Herrera", 68)
+        viajes_usuarios = self.controlador_usuarios.viajes_red
+        viajes_hipotecas = self.controlador_hipotecas.viajes_red
+
+        self.controlador_usuarios.obtener_usuarios_con_hipotecas()
+        self.controlador_hipotecas.obtener_hipotecas_de_usuarios([matias.id], fecha_hasta=date(2023, 12, 31))
+        self.controlador_hipotecas.crear_hipotecas_masivo([(matias.id, 200000000.0, date(2023, 1, 1), 1000),
+                                                           (9999, 200000000.0, date(2023, 1, 1), 1000)])
+
+        self.assertEqual(1, self.controlador_usuarios.viajes_red - viajes_usuarios)
+        self.assertEqual(2, self.controlador_hipotecas.viajes_red - viajes_hipotecas)
+
+    def test_cache_usuarios(self):
+        cache = self.controlador_usuarios.cache
+        self.assertTrue(cache.esperar_escucha(5))
+        notificaciones = cache.estadisticas()["notificaciones"]
+        usuario = self.controlador_usuarios.crear_usuario("Matias Herrera", 68)
+        # El aviso de la inserción llega por NOTIFY en cualquier momento e invalida la caché: se espera a que llegue
+        # (y a que no lleguen más) antes de llenarla
+        esperar_notificaciones(cache, notificaciones + 1)
+        self.controlador_usuarios.obtener_usuarios()
+        self.controlador_usuarios.obtener_usuario(usuario.id)
+        viajes = self.controlador_usuarios.viajes_red
+
+        self.assertEqual(["Matias Herrera"], [u.name for u in self.controlador_usuarios.obtener_usuarios()])
+        self.assertEqual("Matias Herrera", self.controlador_usuarios.obtener_usuario(usuario.id).name)
+        self.assertEqual(viajes, self.controlador_usuarios.viajes_red)
+
+        # Cada escritura invalida la caché
+        self.controlador_usuarios.modificar_usuario(usuario.id, "Matias Herrera Vanegas", 75)
+        self.assertEqual("Matias Herrera Vanegas", self.controlador_usuarios.obtener_usuario(usuario.id).name)
+        self.controlador_usuarios.eliminar_usuario(usuario.id)
+        self.assertEqual([], self.controlador_usuarios.obtener_usuarios())
+
+    def test_cache_usuarios_entre_procesos(self):
+        # Una caché propia hace de otro proceso: se entera de los cambios solo por NOTIFY
+        cache = CacheUsuarios()
+        try:
+            otro_proceso = ControladorUsuarios(self.repositorio, cache=cache)
+            self.assertTrue(cache.esperar_escucha(5))
+            self.assertEqual([], otro_proceso.obtener_usuarios())
+
+            self.controlador_usuarios.crear_usuario("Juan José", 75)
+            for _ in range(50):
+                if cache.estadisticas()["entradas"] == 0:
+                    break
+                time.sleep(0.1)
+            self.assertEqual(["Juan José"], [u.name for u in otro_proceso.obtener_usuarios()])
+        finally:
+            cache.cerrar()
+
+    def test_consultas_preparadas(self):
+        usuario = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        self.controlador_hipotecas.obtener_hipotecas(usuario.id)
+        preparaciones = self.repositorio.preparaciones
+        viajes = self.controlador_hipotecas.viajes_red
+
+        for _ in range(5):
+            self.controlador_hipotecas.obtener_hipotecas(usuario.id)
+        self.assertEqual(preparaciones, self.repositorio.preparaciones)
+        self.assertEqual(5, self.controlador_hipotecas.viajes_red - viajes)
+
+        # Si se descartan las consultas preparadas de la conexión se vuelven a preparar; con un pool propio para no
+        # dejar conexiones sin sus consultas preparadas a las demás pruebas
+        pool = PoolConexiones(minimo=0, maximo=1)
+        try:
+            controlador = ControladorHipotecas(RepositorioPostgres(pool))
+            controlador.obtener_hipotecas(usuario.id)
+            with pool.conexion() as conexion, conexion.cursor() as cursor:
+                cursor.execute("DEALLOCATE ALL")
+            controlador.crear_hipoteca(usuario.id, 200000.0, date(2023, 1, 1), 1000)
+            self.assertEqual(1, len(controlador.obtener_hipotecas(usuario.id)))
+        finally:
+            pool.cerrar()
+
+    def test_revaluar_hipotecas(self):
+        joven = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        mayor = self.controlador_usuarios.crear_usuario("Diego Sanabria", 90)
+        vitalicia = {"esperanza_vida": 85, "sexo": None, "periodo_pago": 1, "porcentaje_propiedad": 1.5,
+                     "tipo_hipoteca": 1}
+        parcial = {"esperanza_vida": 95, "sexo": None, "periodo_pago": 5, "porcentaje_propiedad": 1.5,
+                   "tipo_hipoteca": 2}
+        self.controlador_hipotecas.crear_hipoteca(joven.id, 650000000, date(2023, 1, 1), 1000, vitalicia)
+        self.controlador_hipotecas.crear_hipoteca(mayor.id, 650000000, date(2023, 1, 1), 1000, parcial)
+        # Con 90 años la esperanza de vida de 85 ya no es válida, y la última no tiene datos de cálculo
+        self.controlador_hipotecas.crear_hipoteca(mayor.id, 700000000, date(2023, 1, 1), 1000, vitalicia)
+        self.controlador_hipotecas.crear_hipoteca(mayor.id, 800000000, date(2023, 1, 1), 1000)
+
+        reportes = revaluar_hipotecas({"porcentaje_propiedad": 2.0}, procesos=2, fragmentos=2,
+                                      reportar=lambda linea: None)
+
+        self.assertEqual(4, sum(reporte["filas"] for reporte in reportes))
+        self.assertEqual(2, sum(reporte["actualizadas"] for reporte in reportes))
+        self.assertEqual(1, sum(reporte["rechazadas"] for reporte in reportes))
+        self.assertEqual(1, sum(reporte["omitidas"] for reporte in reportes))
+        self.assertAlmostEqual(650000000 * 0.02 / 120,
+                               self.controlador_hipotecas.obtener_hipotecas(joven.id)[0]["cuota_mensual"], 2)
+        cuotas = {h["monto_total"]: h["cuota_mensual"] for h in self.controlador_hipotecas.obtener_hipotecas(mayor.id)}
+        self.assertAlmostEqual(650000000 * 0.02 / 60, cuotas[650000000], 2)
+        self.assertEqual(1000, cuotas[700000000])
+        self.assertEqual(1000, cuotas[800000000])
+        porcentajes = {fila[2]: fila[9] for fila in self.repositorio.iterar_hipotecas(10)}
+        self.assertEqual({650000000: 2.0, 700000000: 1.5, 800000000: None}, porcentajes)
+
+        # Sin reglas cada hipoteca se recalcula solo con sus datos
+        revaluar_hipotecas({}, procesos=1, fragmentos=1, reportar=lambda linea: None)
+        self.assertAlmostEqual(650000000 * 0.02 / 120,
+                               self.controlador_hipotecas.obtener_hipotecas(joven.id)[0]["cuota_mensual"], 2)
+        self.assertRaises(ValueError, revaluar_hipotecas, {"tipo_hipoteca": 3}, reportar=lambda linea: None)
+
+    def test_un_viaje_por_operacion(self):
+        usuario = self.controlador_usuarios.crear_usuario("Diego Sanabria", 75)
+        self.controlador_hipotecas.crear_hipoteca(usuario.id, 350000000, date(2023, 1, 1), 2250000)
+        hipoteca_id = self.controlador_hipotecas.obtener_hipotecas(usuario.id)[0]["id"]
+        viajes_usuarios = self.controlador_usuarios.viajes_red
+        viajes_hipotecas = self.controlador_hipotecas.viajes_red
+
+        self.controlador_usuarios.modificar_usuario(usuario.id, "Diego Sanabria", 76)
+        self.controlador_hipotecas.modificar_hipoteca(hipoteca_id, 1200000)
+        self.controlador_hipotecas.crear_hipoteca(usuario.id, 400000000, date(2023, 1, 1), 2250000)
+        self.controlador_usuarios.eliminar_usuario(usuario.id)
+
+        self.assertEqual(2, self.controlador_usuarios.viajes_red - viajes_usuarios)
+        self.assertEqual(2, self.controlador_hipotecas.viajes_red - viajes_hipotecas)
+        self.assertEqual([], self.controlador_hipotecas.obtener_hipotecas(usuario.id))
+
+    def test_particiones_y_archivo(self):
+        usuario = self.controlador_usuarios.crear_usuario("Juan José", 75)
+        parcial = {"esperanza_vida": 85, "periodo_pago": 1, "porcentaje_propiedad": 1.5, "tipo_hipoteca": 2}
+        vitalicia = {"esperanza_vida": 120, "periodo_pago": 1, "porcentaje_propiedad": 1.5, "tipo_hipoteca": 1}
+        # 2001 no tiene partición: las hipotecas quedan en hipotecas_default hasta que se crea. La parcial terminó en
+        # 2002 y la vitalicia sigue vigente hasta 2046
+        self.controlador_hipotecas.crear_hipoteca(usuario.id, 200000.0, date(2001, 3, 1), 1000, parcial)
+        self.controlador_hipotecas.crear_hipoteca(usuario.id, 250000.0, date(2001, 5, 1), 1200, vitalicia)
+        self.controlador_hipotecas.crear_hipoteca(usuario.id, 300000.0, date.today(), 1500)
+
+        self.assertIn(2001, crear_particiones())
+        self.assertIn(2001, listar_particiones())
+        with self.repositorio.pool.conexion() as conexion, conexion.cursor() as cursor:
+            cursor.execute("EXPLAIN SELECT * FROM hipotecas WHERE fecha_inicio BETWEEN '2001-01-01' AND '2001-12-31'")
+            plan = "\n".join(fila for fila, in cursor.fetchall())
+        self.assertIn("hipotecas_2001", plan)
+        self.assertNotIn("hipotecas_default", plan)
+
+        def leer(ruta):
+            with gzip.open(ruta, "rt", encoding="utf-8", newline="") as archivo:
+                return [fila["monto_total"] for fila in csv.DictReader(archivo)]
+
+        with tempfile.TemporaryDirectory() as directorio:
+            reporte = archivar_particion(2001, directorio, formato="csv")
+            self.assertEqual((1, 1, False), (reporte["filas"], reporte["vigentes"], reporte["particion_eliminada"]))
+            self.assertEqual(["200000.0"], leer(reporte["archivo"]))
+            # La vitalicia sigue en su partición y en el resumen
+            self.assertIn(2001, listar_particiones())
+            hipotecas = self.controlador_hipotecas.obtener_hipotecas(usuario.id)
+            self.assertEqual({250000.0, 300000.0}, {hipoteca["monto_total"] for hipoteca in hipotecas})
+            resumen = self.controlador_hipotecas.resumen_cartera(("rango_edad",))
+            self.assertEqual([2], [fila["cantidad"] for fila in resumen])
+
+            # Sin hipotecas terminadas no se escribe ningún archivo
+            self.assertIsNone(archivar_particion(2001, directorio, formato="csv")["archivo"])
+
+            with self.repositorio.pool.conexion() as conexion, conexion.cursor() as cursor:
+                cursor.execute("UPDATE hipotecas SET esperanza_vida = 80 WHERE fecha_inicio = '2001-05-01'")
+                conexion.commit()
+            segundo = archivar_particion(2001, directorio, formato="csv")
+            # El archivo anterior no se sobrescribe
+            self.assertEqual(os.path.join(directorio, "hipotecas_2001_2.csv.gz"), segundo["archivo"])
+            self.assertEqual(["200000.0"], leer(reporte["archivo"]))
+            self.assertEqual(["250000.0"], leer(segundo["archivo"]))
+            self.assertEqual(["hipotecas_2001.csv.gz", "hipotecas_2001_2.csv.gz"], sorted(os.listdir(directorio)))
+        self.assertEqual((0, True), (segundo["vigentes"], segundo["particion_eliminada"]))
+        self.assertNotIn(2001, listar_particiones())
+        hipotecas = self.controlador_hipotecas.obtener_hipotecas(usuario.id)
+        self.assertEqual([300000.0], [hipoteca["monto_total"] for hipoteca in hipotecas])
+        resumen = self.controlador_hipotecas.resumen_cartera(("rango_edad",))
+        self.assertEqual([1], [fila["cantidad"] for fila in resumen])
+        with self.assertRaises(ValueError):
+            archivar_particion(2001, formato="csv")
+
+    def test_migraciones(self):
+        # Las migraciones ya se aplicaron en setUpClass: volver a ejecutarlas no hace nada
+        self.assertEqual([], aplicar_migraciones(reportar=lambda linea: None))
+        with self.repositorio.pool.conexion() as conexion:
+            self.assertEqual(listar_migraciones()[-1][0], version_actual(conexion))
+
+@SOLO_POSTGRES
+class ControladoresAsyncTest(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        aplicar_migraciones(reportar=lambda linea: None)
+
+    async def asyncSetUp(self):
+        self.pool = await crear_pool(minimo=1, maximo=2)
+        await self.pool.execute("DELETE FROM hipotecas")
+        await self.pool.execute("DELETE FROM usuarios")
+        self.controlador_usuarios = ControladorUsuariosAsync(self.pool)
+        self.controlador_hipotecas = ControladorHipotecasAsync(self.pool)
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+
+    async def test_usuarios(self):
+        usuario = await self.controlador_usuarios.crear_usuario("Matias Herrera", 68)
+        with self.assertRaises(Exception) as cm:
+            await self.controlador_usuarios.crear_usuario("Matias Herrera", 68)
+        self.assertIn("ya existe", str(cm.exception))
+
+        await self.controlador_usuarios.modificar_usuario(usuario.id, "Matias Herrera Vanegas", 75)
+        modificado = await self.controlador_usuarios.obtener_usuario(usuario.id)
+        self.assertEqual(("Matias Herrera Vanegas", 75), (modificado.name, modificado.age))
+
+        await self.controlador_usuarios.eliminar_usuario(usuario.id)
+        self.assertEqual([], await self.controlador_usuarios.obtener_usuarios())
+        with self.assertRaises(Exception) as cm:
+            await self.controlador_usuarios.eliminar_usuario(usuario.id)
+        self.assertIn("El usuario no existe", str(cm.exception))
+
+    async def test_paginas_e_iteracion(self):
+        reporte = await self.controlador_usuarios.crear_usuarios_masivo([(f"Usuario {i}", 65 + i) for i in range(5)])
+        self.assertEqual(["creado"] * 5, [fila["resultado"] for fila in reporte])
+
+        pagina, token = await self.controlador_usuarios.obtener_usuarios_pagina(3)
+        siguiente, ultimo = await self.controlador_usuarios.obtener_usuarios_pagina(3, token)
+        self.assertEqual([f"Usuario {i}" for i in range(5)], [usuario.name for usuario in pagina + siguiente])
+        self.assertIsNone(ultimo)
+
+        nombres = [usuario.name async for usuario in self.controlador_usuarios.iterar_usuarios(tamano_lote=2)]
+        self.assertEqual([f"Usuario {i}" for i in range(5)], nombres)
+
+    async def test_hipotecas(self):
+        usuario = await self.controlador_usuarios.crear_usuario("Juan José", 75)
+        await self.controlador_hipotecas.crear_hipoteca(usuario.id, 200000.0, "2023-01-01", 1000)
+        with self.assertRaises(Exception) as cm:
+            await self.controlador_hipotecas.crear_hipoteca(9999, 200000.0, date(2023, 1, 1), 1000)
+        self.assertIn("El usuario no existe", str(cm.exception))
+
+        reporte = await self.controlador_hipotecas.crear_hipotecas_masivo([
+            (usuario.id, 300000.0, date(2024, 1, 1), 1500),
+            (9999, 300000.0, date(2024, 1, 1), 1500),
+            (usuario.id, 200000.0, date(2023, 1, 1), 1000),
+        ])
+        self.assertEqual(["creada", "usuario_inexistente", "creada"], [fila["resultado"] for fila in reporte])
+
+        hipotecas = await self.controlador_hipotecas.obtener_hipotecas(usuario.id)
+        self.assertEqual([200000.0, 200000.0, 300000.0], sorted(hipoteca["monto_total"] for hipoteca in hipotecas))
+        await self.controlador_hipotecas.modificar_hipoteca(reporte[0]["id"], 1800)
+        por_usuario = await self.controlador_hipotecas.obtener_hipotecas_de_usuarios([usuario.id],
+                                                                                    fecha_desde=date(2024, 1, 1))
+        self.assertEqual([1800], [hipoteca["cuota_mensual"] for hipoteca in por_usuario[usuario.id]])
+        with self.assertRaises(Exception) as cm:
+            await self.controlador_hipotecas.modificar_hipoteca(9999, 1800)
+        self.assertIn("La hipoteca no existe", str(cm.exception))
+
+        usuarios = await self.controlador_usuarios.obtener_usuarios_con_hipotecas(edad_minima=70,
+                                                                                 fecha_hasta=date(2023, 12, 31))
+        self.assertEqual([[200000.0, 200000.0]], [[h["monto_total"] for h in u.hipotecas] for u in usuarios])
+
+    async def test_modificar_usuario_recalcula_hipotecas(self):
+        usuario = await self.controlador_usuarios.crear_usuario("Juan José", 75)
+        calculo = {"esperanza_vida": 85, "periodo_pago": 1, "porcentaje_propiedad": 1.5, "tipo_hipoteca": 1}
+        await self.controlador_hipotecas.crear_hipoteca(usuario.id, 200000.0, date(2023, 1, 1), 25.0, calculo)
+        await self.controlador_hipotecas.crear_hipotecas_masivo([(usuario.id, 300000.0, date(2024, 1, 1), 37.5,
+                                                                  calculo)])
+
+        await self.controlador_usuarios.modificar_usuario(usuario.id, "Juan José", 80)
+
+        hipotecas = await self.controlador_hipotecas.obtener_hipotecas(usuario.id)
+        self.assertEqual({200000.0: 50.0, 300000.0: 75.0},
+                         {hipoteca["monto_total"]: hipoteca["cuota_mensual"] for hipoteca in hipotecas})
+
+    async def test_resumen_exportacion_e_iteracion(self):
+        matias = await self.controlador_usuarios.crear_usuario("Matias Herrera", 68)
+        juan = await self.controlador_usuarios.crear_usuario("Juan José", 75)
+        calculo = {"esperanza_vida": 85, "periodo_pago": 1, "porcentaje_propiedad": 1.5, "tipo_hipoteca": 1}
+        await self.controlador_hipotecas.crear_hipoteca(matias.id, 200000.0, date(2023, 1, 1), 1000)
+        await self.controlador_hipotecas.crear_hipoteca(matias.id, 400000.0, date(2023, 1, 20), 2000)
+        await self.controlador_hipotecas.crear_hipoteca(juan.id, 300000.0, date(2023, 2, 1), 1800, calculo)
+
+        por_mes = await self.controlador_hipotecas.resumen_cartera("mes")
+        self.assertEqual([(date(2023, 1, 1), 2, 3000, 300000.0), (date(2023, 2, 1), 1, 1800, 300000.0)],
+                         [(f["mes"], f["cantidad"], f["cuota_total"], f["monto_promedio"]) for f in por_mes])
+        por_edad = await self.controlador_hipotecas.resumen_cartera("rango_edad", fecha_desde="2023-02-15")
+        self.assertEqual([(70, 1)], [(f["rango_edad"], f["cantidad"]) for f in por_edad])
+        with self.assertRaises(ValueError):
+            await self.controlador_hipotecas.resumen_cartera("anio")
+        incremental = await self.controlador_hipotecas.resumen_cartera()
+        await self.controlador_hipotecas.reconstruir_resumen()
+        self.assertEqual(incremental, await self.controlador_hipotecas.resumen_cartera())
+
+        hipotecas = [h async for h in self.controlador_hipotecas.iterar_hipotecas(tamano_lote=2)]
+        self.assertEqual([(matias.id, None), (matias.id, None), (juan.id, 1.5)],
+                         [(h["usuario_id"], h["porcentaje_propiedad"]) for h in hipotecas])
+
+        bloques = [bloque async for bloque in self.controlador_usuarios.exportar_usuarios("csv", tamano_lote=1)]
+        self.assertEqual(2, len(bloques))
+        usuarios = list(csv.DictReader(io.StringIO(b"".join(bloques).decode("utf-8"))))
+        self.assertEqual([("Matias Herrera", "68"), ("Juan José", "75")], [(u["name"], u["age"]) for u in usuarios])
+        bloques = [bloque async for bloque in self.controlador_hipotecas.exportar_hipotecas("ndjson")]
+        exportadas = [json.loads(linea) for linea in b"".join(bloques).decode("utf-8").splitlines()]
+        self.assertEqual([(juan.id, "2023-02-01", 85, 1)], [(h["usuario_id"], h["fecha_inicio"], h["esperanza_vida"],
+                                                            h["tipo_hipoteca"]) for h in exportadas[2:]])
+        with self.assertRaises(ValueError):
+            self.controlador_hipotecas.exportar_hipotecas("xlsx")
+
+class VistaCotizacionTest(unittest.TestCase):
+    # Los datos de CalculatorTests.test_case_1
+    SOLICITUD = {"total_amount": 650000000, "age": 71, "expected_life": 85, "fee_time": 1, "property_percentage": 1.5,
+                 "mortgage_type": 1}
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(vista_usuarios.blueprint)
+        self.cliente = app.test_client()
+
+    def test_cotizacion(self):
+        respuesta = self.cliente.post("/api/cotizacion", json=self.SOLICITUD)
+        self.assertEqual(200, respuesta.status_code)
+        self.assertAlmostEqual(58035.71428571428, respuesta.get_json()["monthly_fee"], 2)
+        self.assertIsNone(respuesta.get_json()["error"])
+
+    def test_cotizacion_invalida(self):
+        respuesta = self.cliente.post("/api/cotizacion", json={**self.SOLICITUD, "age": 60})
+        self.assertEqual(400, respuesta.status_code)
+        self.assertEqual((None, "InvalidAge"), (respuesta.get_json()["monthly_fee"], respuesta.get_json()["error"]))
+
+        respuesta = self.cliente.post("/api/cotizacion", json={**self.SOLICITUD, "mortgage_type": 9})
+        self.assertEqual((400, "InvalidOption"), (respuesta.status_code, respuesta.get_json()["error"]))
+
+        # Campos que faltan o que no son números
+        for solicitud in ({**self.SOLICITUD, "total_amount": "mucho"}, {"age": 71}):
+            respuesta = self.cliente.post("/api/cotizacion", json=solicitud)
+            self.assertEqual((400, "ValueError"), (respuesta.status_code, respuesta.get_json()["error"]))
+
+    def test_cotizacion_sin_json(self):
+        for cuerpo in ("no es JSON", "[1, 2]"):
+            respuesta = self.cliente.post("/api/cotizacion", data=cuerpo, content_type="application/json")
+            self.assertEqual((400, "ValueError"), (respuesta.status_code, respuesta.get_json()["error"]))
+
+        for cuerpo in ("no es JSON", json.dumps(self.SOLICITUD)):
+            respuesta = self.cliente.post("/api/cotizaciones", data=cuerpo, content_type="application/json")
+            self.assertEqual((400, "ValueError"), (respuesta.status_code, respuesta.get_json()["error"]))
+
+    def test_cotizaciones_sobre_el_limite(self):
+        respuesta = self.cliente.post("/api/cotizaciones", json=[{}] * (vista_usuarios.MAXIMO_COTIZACIONES + 1))
+        self.assertEqual(413, respuesta.status_code)
+        self.assertIn(str(vista_usuarios.MAXIMO_COTIZACIONES), respuesta.get_json()["message"])
+
+    def test_cotizaciones(self):
+        solicitudes = [
+            self.SOLICITUD,
+            {**self.SOLICITUD, "age": 60},
+            "no es una solicitud",
+            {**self.SOLICITUD, "fee_time": None},
+            {**self.SOLICITUD, "total_amount": 500000000, "age": 67, "expected_life": 80, "property_percentage": 2},
+        ]
+        respuesta = self.cliente.post("/api/cotizaciones", json=solicitudes)
+
+        self.assertEqual(200, respuesta.status_code)
+        cuerpo = respuesta.get_json()
+        self.assertEqual([None, "InvalidAge", "ValueError", "ValueError", None],
+                         [resultado["error"] for resultado in cuerpo["results"]])
+        self.assertAlmostEqual(58035.71428571428, cuerpo["results"][0]["monthly_fee"], 2)
+        self.assertAlmostEqual(64102.5641025641, cuerpo["results"][4]["monthly_fee"], 2)
+        self.assertEqual([None] * 3, [resultado["monthly_fee"] for resultado in cuerpo["results"][1:4]])
+        self.assertEqual((2, 3), (cuerpo["quoted"], cuerpo["rejected"]))
+
+@SOLO_POSTGRES
+class PoolConexionesTest(unittest.TestCase):
+    def test_tiempo_espera_agotado(self):
+        pool = PoolConexiones(minimo=0, maximo=1, tiempo_espera=0.05)
+        with pool.conexion():
+            with self.assertRaises(PoolAgotado):
+                pool.obtener()
+        with pool.conexion():
+            pass
+        estadisticas = pool.estadisticas()
+        self.assertEqual(1, estadisticas["creadas"])
+        self.assertEqual(1, estadisticas["agotado"])
+        self.assertEqual(1, estadisticas["libres"])
+        pool.cerrar()
+
+    def test_descarta_conexiones_cerradas(self):
+        pool = PoolConexiones(minimo=1, maximo=2, verificar_despues=0)
+        with pool.conexion() as conexion:
+            conexion.close()
+        with pool.conexion() as conexion, conexion.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            self.assertEqual(1, cursor.fetchone()[0])
+        self.assertEqual(1, pool.estadisticas()["descartadas"])
+        pool.cerrar()
+
+    def test_deshace_transacciones_abiertas(self):
+        pool = PoolConexiones(minimo=0, maximo=1)
+        with pool.conexion() as conexion, conexion.cursor() as cursor:
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT 1")
+        with pool.conexion() as conexion:
+            self.assertEqual(extensions.TRANSACTION_STATUS_IDLE, conexion.get_transaction_status())
+        pool.cerrar()
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -1,9 +1,22 @@
-
 import sys
 sys.path.append( "src" )
 sys.path.append( "." )
-from src.model.calculator import *
+from model.calculator import *
+from model.quote_cache import QuoteCache
+import model.calculator
+from model.schedule import *
+from model.rate_table import RateTable
+from model import life_table
+from model.life_table import LifeTable, InvalidSex, MissingLifeTable, default_life_table
+from model.quote_chunks import quote_chunk
+from view.console.batch_quotes import run_pipeline, read_csv_chunks, read_ndjson_chunks, READERS
+import json
+import os
+import tempfile
+from datetime import date
 import unittest
+from unittest import mock
+import numpy as np
 
 
 
@@ -229,5 +242,455 @@ class CalculatorTests(unittest.TestCase):
                           expected_life, fee_time, property_percentage, mortgage_type)
 
 
+class BatchCalculatorTests(unittest.TestCase):
+    def test_batch_matches_scalar(self):
+        rows = [
+            (650000000, 71, 85, 1, 1.5, 1),
+            (500000000, 67, 80, 1, 2, 1),
+            (845000000, 77, 80, 5, 2.1, 2),
+            (923000000, 80, 95, 10, 1.9, 2),
+            (900000000, 70, 80, 1, 1.2, 3),
+            (230000000, 65, 70, 1, 1.8, 3),
+        ]
+        columns = [list(column) for column in zip(*rows)]
+
+        fees, errors = Calculator.calculate_monthly_fees(*columns)
+
+        self.assertTrue((errors == ErrorCode.VALID).all())
+        for row, fee in zip(rows, fees):
+            self.assertAlmostEqual(Calculator(*row).calculate_monthly_fee(), fee, 2)
+
+    def test_batch_error_codes(self):
+        rows = [
+            (0, 65, 70, 1, 5, 3),
+            (250000000, 60, 1, 1, 5, 1),
+            (300000000, 65, 0, 1, 5, 3),
+            (280000000, 78, 90, 0, 5, 3),
+            (130000000, 65, 70, 1, 0, 3),
+            (500000000, 69, 80, 1, 1.5, 0),
+            (500000000, 69, 69, 1, 1.5, 1),
+            (500000000, 69, 80, 1, 1.5, 1),
+        ]
+        columns = [list(column) for column in zip(*rows)]
+
+        fees, errors = Calculator.calculate_monthly_fees(*columns)
+
+        expected = [ErrorCode.INVALID_AMOUNT, ErrorCode.INVALID_AGE, ErrorCode.INVALID_EXPECTED_LIFE,
+                    ErrorCode.INVALID_FEE_TIME, ErrorCode.INVALID_PROPERTY_PERCENTAGE, ErrorCode.INVALID_OPTION,
+                    ErrorCode.EXPECTED_LIFE_EQUAL_TO_AGE, ErrorCode.VALID]
+        self.assertEqual(expected, errors.tolist())
+        for row, code in zip(rows[:-1], errors[:-1]):
+            self.assertRaises(ERROR_EXCEPTIONS[code], Calculator, *row)
+        self.assertTrue(all(fee != fee for fee in fees[:-1]))
+        self.assertAlmostEqual(Calculator(*rows[-1]).calculate_monthly_fee(), fees[-1], 2)
+
+    def test_batch_broadcasts_scalars(self):
+        fees, errors = Calculator.calculate_monthly_fees([100000000, 200000000], 70, 80, 1, 1.2, 3)
+
+        self.assertEqual([1200000.0, 2400000.0], fees.tolist())
+        self.assertEqual([ErrorCode.VALID, ErrorCode.VALID], errors.tolist())
+
+
+class ValidationResultTests(unittest.TestCase):
+    def test_valid_inputs(self):
+        result = Calculator.validate(650000000, 71, 85, 1, 1.5, 1)
+
+        self.assertTrue(result)
+        self.assertEqual(ErrorCode.VALID, result.code)
+        self.assertEqual('', result.message)
+        self.assertIsNone(result.exception())
+
+    def test_invalid_inputs_do_not_raise(self):
+        result = Calculator.validate(250000000, 60, 80, 1, 5, 1)
+
+        self.assertFalse(result)
+        self.assertEqual(ErrorCode.INVALID_AGE, result.code)
+        self.assertEqual(str(InvalidAge()), result.message)
+        self.assertRaises(InvalidAge, result.raise_for_error)
+
+    def test_same_order_as_exceptions(self):
+        result = Calculator.validate(0, 60, 0, 0, 0, 0)
+
+        self.assertEqual(ErrorCode.INVALID_AMOUNT, result.code)
+        self.assertRaises(InvalidAmount, Calculator, 0, 60, 0, 0, 0, 0)
+
+    def test_try_create(self):
+        calc, result = Calculator.try_create(845000000, 77, 80, 5, 2.1, 2)
+
+        self.assertTrue(result)
+        self.assertAlmostEqual(295750.0, calc.calculate_monthly_fee(), 2)
+
+        calc, result = Calculator.try_create(845000000, 77, 77, 5, 2.1, 1)
+
+        self.assertIsNone(calc)
+        self.assertEqual(ErrorCode.EXPECTED_LIFE_EQUAL_TO_AGE, result.code)
+
+
+class QuoteCacheTests(unittest.TestCase):
+    def test_hits_and_misses(self):
+        cache = QuoteCache()
+
+        first = cache.monthly_fee(650000000, 71, 85, 1, 1.5, 1)
+        second = cache.monthly_fee(650000000, 71, 85, 1, 1.5, 1)
+
+        self.assertAlmostEqual(58035.71428571428, first, 2)
+        self.assertEqual(first, second)
+        self.assertEqual(1, cache.stats()['hits'])
+        self.assertEqual(1, cache.stats()['misses'])
+
+    def test_normalized_key(self):
+        cache = QuoteCache()
+
+        cache.monthly_fee(650000000, 71, 85, 1, 1.5, 1)
+        fee = cache.monthly_fee(650000000.0, 66, 80, 7, 1.5, 1)
+
+        self.assertAlmostEqual(58035.71428571428, fee, 2)
+        self.assertEqual(1, cache.stats()['hits'])
+
+    def test_lru_eviction(self):
+        cache = QuoteCache(max_size=2)
+
+        cache.monthly_fee(100000000, 70, 80, 1, 1, 3)
+        cache.monthly_fee(200000000, 70, 80, 1, 1, 3)
+        cache.monthly_fee(100000000, 70, 80, 1, 1, 3)
+        cache.monthly_fee(300000000, 70, 80, 1, 1, 3)
+        cache.monthly_fee(100000000, 70, 80, 1, 1, 3)
+
+        stats = cache.stats()
+        self.assertEqual(1, stats['evictions'])
+        self.assertEqual(2, stats['size'])
+        self.assertEqual(2, stats['hits'])
+
+    def test_ttl(self):
+        now = [0.0]
+        cache = QuoteCache(ttl=10, clock=lambda: now[0])
+
+        cache.monthly_fee(100000000, 70, 80, 1, 1, 3)
+        now[0] = 11
+        cache.monthly_fee(100000000, 70, 80, 1, 1, 3)
+
+        self.assertEqual(0, cache.stats()['hits'])
+        self.assertEqual(1, cache.stats()['expirations'])
+
+    def test_configure(self):
+        cache = QuoteCache(max_size=3, ttl=10)
+
+        cache.configure(max_size=2)
+        self.assertEqual((2, 10), (cache.max_size, cache.ttl))
+        cache.configure(ttl=None)
+        self.assertEqual((2, None), (cache.max_size, cache.ttl))
+
+    def test_rate_table(self):
+        table = RateTable.sweep(ages=range(65, 90), expected_lives=range(66, 100), fee_times=range(1, 11),
+                                property_percentages=(1.5, 2.1))
+        cache = QuoteCache(rate_table=table)
+
+        fee = cache.monthly_fee(650000000, 71, 85, 1, 1.5, 1)
+        outside = cache.monthly_fee(650000000, 71, 85, 1, 1.7, 1)
+
+        self.assertAlmostEqual(Calculator(650000000, 71, 85, 1, 1.5, 1).calculate_monthly_fee(), fee, 2)
+        self.assertAlmostEqual(Calculator(650000000, 71, 85, 1, 1.7, 1).calculate_monthly_fee(), outside, 2)
+        self.assertEqual(1, cache.stats()['table_hits'])
+
+        cache.configure(rate_table=None)
+        cache.monthly_fee(845000000, 77, 80, 5, 2.1, 2)
+        self.assertEqual(1, cache.stats()['table_hits'])
+
+    def test_invalid_inputs(self):
+        cache = QuoteCache()
+
+        fee, result = cache.try_monthly_fee(250000000, 60, 80, 1, 5, 1)
+
+        self.assertIsNone(fee)
+        self.assertEqual(ErrorCode.INVALID_AGE, result.code)
+        self.assertRaises(model.calculator.InvalidAge, cache.monthly_fee, 250000000, 60, 80, 1, 5, 1)
+        self.assertEqual(0, cache.stats()['size'])
+
+
+class ScheduleTests(unittest.TestCase):
+    def test_life_mortgage_schedule(self):
+        calc = Calculator(650000000, 71, 85, 1, 1.5, 1)
+
+        rows = list(payout_schedule(calc, date(2024, 1, 31)))
+
+        self.assertEqual(14 * 12, len(rows))
+        self.assertEqual(date(2024, 2, 29), rows[1].date)
+        self.assertAlmostEqual(650000000 * 0.015, rows[-1].running_total, 2)
+
+    def test_partial_and_total_mortgage_schedule(self):
+        partial = Calculator(845000000, 77, 80, 5, 2.1, 2)
+        total = Calculator(900000000, 70, 80, 1, 1.2, 3)
+
+        self.assertEqual(60, sum(1 for _ in payout_schedule(partial, date(2024, 1, 1))))
+        self.assertEqual([ScheduleRow(1, date(2024, 1, 1), 10800000.0, 10800000.0)],
+                         list(payout_schedule(total, date(2024, 1, 1))))
+
+    def test_seek_to_month(self):
+        calc = Calculator(845000000, 77, 80, 5, 2.1, 2)
+        rows = list(payout_schedule(calc, date(2024, 1, 15)))
+
+        self.assertEqual(rows[24], schedule_row(calc, date(2024, 1, 15), 25))
+        self.assertEqual(rows[24:], list(payout_schedule(calc, date(2024, 1, 15), start_month=25)))
+        self.assertRaises(ValueError, schedule_row, calc, date(2024, 1, 15), 61)
+
+    def test_window_total(self):
+        calc = Calculator(845000000, 77, 80, 5, 2.1, 2)
+        start = date(2024, 1, 15)
+        desde, hasta = date(2024, 3, 20), date(2025, 2, 10)
+
+        expected = [row for row in payout_schedule(calc, start) if desde <= row.date <= hasta]
+        payments, amount = window_total(calc, start, desde, hasta)
+
+        self.assertEqual(len(expected), payments)
+        self.assertAlmostEqual(sum(row.amount for row in expected), amount, 2)
+        self.assertEqual((0, 0.0), window_total(calc, start, date(2020, 1, 1), date(2023, 1, 1)))
+
+        payments, amount = portfolio_window_total([(calc, start), (calc, start)], desde, hasta)
+        self.assertEqual(2 * len(expected), payments)
+
+
+class RateTableTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.table = RateTable.sweep(ages=range(65, 90), expected_lives=range(66, 100), fee_times=range(1, 11),
+                                    property_percentages=(1.2, 1.5, 1.8, 2.1))
+
+    def test_lookup_matches_calculator(self):
+        rows = [
+            (650000000, 71, 85, 1, 1.5, 1),
+            (845000000, 77, 80, 5, 2.1, 2),
+            (230000000, 65, 70, 1, 1.8, 3),
+        ]
+        for row in rows:
+            fee, result = self.table.try_monthly_fee(*row)
+            self.assertTrue(result)
+            self.assertAlmostEqual(Calculator(*row).calculate_monthly_fee(), fee, 2)
+
+    def test_outside_grid_falls_back_to_calculator(self):
+        self.assertIsNone(self.table.factor(71, 85, 1, 1.7, 1))
+
+        fee, result = self.table.try_monthly_fee(650000000, 71, 85, 1, 1.7, 1)
+
+        self.assertAlmostEqual(Calculator(650000000, 71, 85, 1, 1.7, 1).calculate_monthly_fee(), fee, 2)
+
+    def test_invalid_combinations(self):
+        self.assertIsNone(self.table.factor(80, 75, 1, 1.5, 1))
+
+        fee, result = self.table.try_monthly_fee(650000000, 80, 75, 1, 1.5, 1)
+
+        self.assertIsNone(fee)
+        self.assertEqual(ErrorCode.EXPECTED_LIFE_EQUAL_TO_AGE, result.code)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tabla')
+            self.table.save(path)
+            loaded = RateTable.load(path)
+
+            self.assertEqual(self.table.factor(71, 85, 1, 1.5, 1), loaded.factor(71, 85, 1, 1.5, 1))
+            self.assertEqual((25, 34), loaded.rate_sheet(1, 1.5).shape)
+            del loaded
+
+    def test_compact_factors(self):
+        # Tipo de hipoteca x años de pago (hasta 99 - 65) x porcentaje
+        self.assertEqual((3, 34, 4), self.table.factors.shape)
+
+    def test_rate_sheet(self):
+        sheet = self.table.rate_sheet(1, 1.5)
+
+        self.assertAlmostEqual(self.table.factor(71, 85, 1, 1.5, 1), sheet[71 - 65, 85 - 66])
+        self.assertTrue(np.isnan(sheet[80 - 65, 75 - 66]))
+        self.assertAlmostEqual(self.table.factor(71, 85, 5, 1.5, 2), self.table.rate_sheet(2, 1.5, 5)[71 - 65, 85 - 66])
+        self.assertRaises(ValueError, self.table.rate_sheet, 2, 1.5)
+        self.assertRaises(ValueError, self.table.rate_sheet, 2, 1.5, 11)
+
+
+class LifeTableTests(unittest.TestCase):
+    def setUp(self):
+        self.table = LifeTable(np.array([[65, 66, 67], [20, 19, 18.5], [17, 16, 15]], dtype=float))
+
+    def test_expected_life(self):
+        self.assertEqual(85, self.table.expected_life(65, 'F'))
+        self.assertEqual(82, self.table.expected_life(65, 'm'))
+        self.assertAlmostEqual(65.5 + 19.5, self.table.expected_life(65.5, 'F'))
+        self.assertEqual(70 + 18.5, self.table.expected_life(70, 'F'))
+        self.assertRaises(InvalidSex, self.table.expected_life, 65, 'X')
+
+    def test_expected_lives(self):
+        lives = self.table.expected_lives([65, 65.5, 67, 66], ['F', 'F', 'M', 'X'])
+
+        self.assertEqual([85, 85, 82], lives[:3].tolist())
+        self.assertTrue(np.isnan(lives[3]))
+
+        self.assertTrue(np.isnan(self.table.expected_lives([np.nan], ['F'])[0]))
+
+    def test_expected_lives_normalizes_sex(self):
+        lives = self.table.expected_lives([65, 65, 65, 65], [' F', 'm ', None, np.nan])
+
+        self.assertEqual([self.table.expected_life(65, ' F'), self.table.expected_life(65, 'm ')], lives[:2].tolist())
+        self.assertTrue(np.isnan(lives[2:]).all())
+
+    def test_single_age(self):
+        table = LifeTable(np.array([[70], [17], [14]], dtype=float))
+
+        self.assertEqual(70 + 17, table.expected_life(70, 'F'))
+        self.assertEqual(75 + 14, table.expected_life(75, 'M'))
+        self.assertEqual([87, 89], table.expected_lives([70, 75], ['F', 'M']).tolist())
+
+    def test_invalid_tables(self):
+        self.assertRaises(ValueError, LifeTable, np.empty((3, 0)))
+        self.assertRaises(ValueError, LifeTable, np.array([[65, 67], [20, 19], [17, 16]], dtype=float))
+        self.assertRaises(ValueError, LifeTable, np.array([[65, 66], [20, np.nan], [17, 16]], dtype=float))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tabla_vida.csv')
+            for rows in ['', '70,F,17\n70,M,14\n71,F,16.5\n', '70,F,17\n70,X,14\n']:
+                with open(path, 'w', encoding='utf-8') as file:
+                    file.write('edad,sexo,esperanza_vida\n' + rows)
+
+                self.assertRaises(ValueError, LifeTable.from_csv, path)
+
+    def test_default_table(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tabla_vida.csv')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write('edad,sexo,esperanza_vida\n')
+                file.writelines(f'{age},{sex},{remaining}\n'
+                                for age, female, male in [(70, 17, 14), (71, 16.5, 13.5), (72, 16, 13)]
+                                for sex, remaining in (('F', female), ('M', male)))
+
+            with mock.patch.object(life_table, 'CACHE_DIRECTORY', os.path.join(directory, 'cache')), \
+                    mock.patch.dict(os.environ, {'TABLA_VIDA': path}):
+                table = default_life_table()
+                calc = Calculator.from_life_table(650000000, 71, 'F', 1, 1.5, 1)
+
+                self.assertEqual(71 + 16.5, table.expected_life(71, 'F'))
+                self.assertAlmostEqual(table.expected_life(71, 'F'), calc.expected_life)
+                self.assertIs(table, default_life_table(path))
+                # El caché se escribe en el directorio de caché del usuario, no junto a la tabla
+                self.assertEqual(['cache', 'tabla_vida.csv'], sorted(os.listdir(directory)))
+                self.assertEqual(1, len(os.listdir(os.path.join(directory, 'cache'))))
+                self.assertEqual(table.table.tolist(), LifeTable.load(path).table.tolist())
+
+    def test_missing_table(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('TABLA_VIDA', None)
+
+            self.assertRaises(MissingLifeTable, default_life_table)
+            self.assertRaises(MissingLifeTable, Calculator.from_life_table, 650000000, 71, 'F', 1, 1.5, 1)
+
+
+class BatchQuotesTests(unittest.TestCase):
+    # Dos filas válidas, una con la edad fuera de rango, una con monto negativo y una que no es numérica
+    ROWS = [
+        {"total_amount": 650000000, "age": 71, "expected_life": 85, "fee_time": 1, "property_percentage": 1.5,
+         "mortgage_type": 1},
+        {"total_amount": 650000000, "age": 40, "expected_life": 85, "fee_time": 1, "property_percentage": 1.5,
+         "mortgage_type": 1},
+        {"total_amount": -5, "age": 71, "expected_life": 85, "fee_time": 1, "property_percentage": 1.5,
+         "mortgage_type": 1},
+        {"total_amount": "abc", "age": 71, "expected_life": 85, "fee_time": 1, "property_percentage": 1.5,
+         "mortgage_type": 1},
+        {"total_amount": 800000000, "age": 80, "expected_life": 90, "fee_time": 1, "property_percentage": 1.5,
+         "mortgage_type": 1},
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.expected = [Calculator(650000000, 71, 85, 1, 1.5, 1).calculate_monthly_fee(), None, None, None,
+                         Calculator(800000000, 80, 90, 1, 1.5, 1).calculate_monthly_fee()]
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def write_csv(self, name, rows):
+        with open(self.path(name), "w", encoding="utf-8") as file:
+            file.write(",".join(rows[0]) + "\n")
+            for row in rows:
+                file.write(",".join(str(value) for value in row.values()) + "\n")
+        return self.path(name)
+
+    def write_ndjson(self, name, rows):
+        with open(self.path(name), "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(row) + "\n" for row in rows)
+        return self.path(name)
+
+    def read_output(self, path, output_format):
+        output = {}
+        for chunk in READERS[output_format](path, 2):
+            for column, values in chunk.items():
+                output.setdefault(column, []).extend(values)
+        return output
+
+    def assert_fees(self, fees):
+        for expected, fee in zip(self.expected, fees):
+            if expected is None:
+                # Sin cuota: vacío en CSV, null en NDJSON y NaN al leer Parquet o Arrow
+                self.assertTrue(fee in (None, "") or np.isnan(fee))
+            else:
+                self.assertAlmostEqual(expected, float(fee))
+
+    def test_csv_round_trip(self):
+        summary = run_pipeline(self.write_csv("input.csv", self.ROWS), self.path("output.csv"), chunk_size=2)
+        output = self.read_output(self.path("output.csv"), "csv")
+
+        self.assertEqual(["650000000", "650000000", "-5", "abc", "800000000"], output["total_amount"])
+        self.assert_fees(output["monthly_fee"])
+        self.assertEqual(["", "InvalidAge", "InvalidAmount", "ValueError", ""], output["error"])
+        self.assertEqual(5, summary["rows"])
+
+    def test_ndjson_round_trip(self):
+        run_pipeline(self.write_ndjson("input.ndjson", self.ROWS), self.path("output.ndjson"), chunk_size=2)
+        output = self.read_output(self.path("output.ndjson"), "ndjson")
+
+        self.assertEqual([row["total_amount"] for row in self.ROWS], output["total_amount"])
+        self.assert_fees(output["monthly_fee"])
+        self.assertEqual(["", "InvalidAge", "InvalidAmount", "ValueError", ""], output["error"])
+
+    def test_rejection_summary(self):
+        summary = run_pipeline(self.write_ndjson("input.ndjson", self.ROWS), self.path("output.csv"))
+
+        self.assertEqual(5, summary["rows"])
+        self.assertEqual(2, summary["quoted"])
+        self.assertEqual({"InvalidAge": 1, "InvalidAmount": 1, "ValueError": 1}, summary["rejected"])
+
+    def test_chunk_with_only_invalid_rows(self):
+        # Con bloques de 1 fila el segundo, tercer y cuarto bloque no tienen ninguna cuota
+        input_path = self.write_ndjson("input.ndjson", self.ROWS)
+        formats = ["csv", "ndjson"]
+        try:
+            import pyarrow
+            formats += ["parquet", "arrow"]
+        except ImportError:
+            pass
+
+        for output_format in formats:
+            with self.subTest(output_format=output_format):
+                output_path = self.path(f"output.{output_format}")
+                summary = run_pipeline(input_path, output_path, chunk_size=1)
+                output = self.read_output(output_path, output_format)
+
+                self.assertEqual(2, summary["quoted"])
+                self.assert_fees(output["monthly_fee"])
+                self.assertEqual(["", "InvalidAge", "InvalidAmount", "ValueError", ""], list(output["error"]))
+
+    def test_unknown_sex(self):
+        # Sin esperanza de vida, un sexo que falta o no está en la tabla es InvalidSex y no un error de conversión
+        path = self.path("tabla_vida.npy")
+        LifeTable(np.array([[70, 71, 72], [17, 16.5, 16], [14, 13.5, 13]], dtype=np.float64)).save(path)
+        chunk = {"total_amount": [650000000] * 5, "age": [71, 71, 71, "abc", 71],
+                 "expected_life": [None, None, None, None, 85], "fee_time": [1] * 5,
+                 "property_percentage": [1.5] * 5, "mortgage_type": [1] * 5, "sex": ["F", "X", None, "F", "X"]}
+
+        quoted, errors, parse_errors, sex_errors = quote_chunk(chunk, life_table_path=path)
+
+        self.assertEqual(["", "InvalidSex", "InvalidSex", "ValueError", ""], list(quoted["error"]))
+        self.assertEqual([False, True, True, False, False], sex_errors.tolist())
+        self.assertEqual([False, False, False, True, False], parse_errors.tolist())
+        self.assertAlmostEqual(Calculator(650000000, 71, 71 + 16.5, 1, 1.5, 1).calculate_monthly_fee(),
+                               quoted["monthly_fee"][0])
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)